@@ -0,0 +1,244 @@
+import atexit
+import fnmatch
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+import akshare as _akshare
+from config import CACHE_DIR, AK_CACHE_CONFIG
+from rate_limiter import limiter, host_for_endpoint
+
+# 默认有效期策略（秒），按接口名通配匹配，先匹配先生效
+DEFAULT_TTL_POLICY = [
+    # 盘中实时数据
+    ('stock_zh_a_spot*', 60),
+    ('*fund_flow*', 120),
+    ('stock_hsgt_*', 300),
+    ('stock_dzjy_*', 300),
+    ('stock_margin_*', 3600),
+    # 日线历史数据（截止日期在今天之前的不会再变化）
+    ('stock_zh_a_hist', 1800),
+    ('stock_zh_a_daily', 1800),
+    ('stock_zh_index_daily*', 1800),
+    # 基础信息与财务数据
+    ('stock_info_a_code_name', 86400),
+    ('stock_individual_info_em', 86400),
+    ('stock_board_industry_*', 86400),
+    ('stock_sector_detail', 86400),
+    ('stock_financial_*', 86400),
+    ('tool_trade_date_hist_sina', 86400),
+]
+DEFAULT_TTL = 600
+HISTORY_TTL = 7 * 86400
+
+
+class CachedAkshare:
+    """akshare的透明缓存代理
+
+    调用结果按 (接口名, 参数) 缓存到磁盘，按接口设置有效期，
+    超过容量上限时淘汰最久未使用的条目，并统计命中/未命中次数。
+    未命中的请求经过全局限流器发出。
+    """
+
+    def __init__(self, module, cache_dir, max_bytes, ttl_overrides=None, enabled=True):
+        self._module = module
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._enabled = enabled
+        self._policy = list((ttl_overrides or {}).items()) + DEFAULT_TTL_POLICY
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._index = None
+        self._total_bytes = 0
+        self._dirty = 0
+        self._saved_at = 0.0
+        self._wrappers = {}
+        self.stats = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            wrapper = self._make_wrapper(name, attr)
+            self._wrappers[name] = wrapper
+        return wrapper
+
+    def _make_wrapper(self, name, func):
+        host = host_for_endpoint(name)
+
+        def wrapper(*args, **kwargs):
+            ttl = self.get_ttl(name, kwargs) if self._enabled else 0
+            if ttl <= 0:
+                return limiter.call(host, func, *args, **kwargs)
+
+            key = self._make_key(name, args, kwargs)
+            found, value = self._get(key)
+            if found:
+                self._count(name, 'hits')
+                return value
+
+            self._count(name, 'misses')
+            value = limiter.call(host, func, *args, **kwargs)
+            self._put(key, name, value, ttl)
+            return value
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def get_ttl(self, name, kwargs):
+        """按接口名和参数确定有效期"""
+        end_date = kwargs.get('end_date')
+        if end_date and str(end_date).replace('-', '') < datetime.now().strftime('%Y%m%d'):
+            return HISTORY_TTL
+        for pattern, ttl in self._policy:
+            if fnmatch.fnmatch(name, pattern):
+                return ttl
+        return DEFAULT_TTL
+
+    def _make_key(self, name, args, kwargs):
+        raw = repr((name, args, sorted(kwargs.items())))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _count(self, name, field):
+        with self._lock:
+            entry = self.stats.setdefault(name, {'hits': 0, 'misses': 0})
+            entry[field] += 1
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self._index_path):
+                try:
+                    with open(self._index_path, 'r', encoding='utf-8') as f:
+                        self._index = json.load(f)
+                except Exception as e:
+                    print(f"读取接口缓存索引失败: {e}")
+            self._total_bytes = sum(entry['size'] for entry in self._index.values())
+        return self._index
+
+    def _save_index(self, force=False):
+        """写入索引；批量写入时按次数和时间节流，退出时强制写入"""
+        self._dirty += 1
+        if not force and self._dirty < 50 and time.time() - self._saved_at < 5:
+            return
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+        self._dirty = 0
+        self._saved_at = time.time()
+
+    def flush(self):
+        """将未写入的索引变更写入磁盘"""
+        with self._lock:
+            if self._index is not None and self._dirty and os.path.exists(self._cache_dir):
+                self._save_index(force=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self._cache_dir, f"{key}.pkl")
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry is None:
+                return False, None
+            if entry['expires'] < time.time():
+                self._remove(key)
+                return False, None
+            entry['last_access'] = time.time()
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                return True, pickle.load(f)
+        except Exception:
+            with self._lock:
+                self._remove(key)
+            return False, None
+
+    def _put(self, key, name, value, ttl):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        with self._lock:
+            if not os.path.exists(self._cache_dir):
+                os.makedirs(self._cache_dir)
+            tmp_path = self._entry_path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._entry_path(key))
+
+            now = time.time()
+            index = self._load_index()
+            if key in index:
+                self._total_bytes -= index[key]['size']
+            self._total_bytes += len(payload)
+            index[key] = {
+                'name': name,
+                'expires': now + ttl,
+                'size': len(payload),
+                'last_access': now
+            }
+            self._evict()
+            self._save_index()
+
+    def _remove(self, key):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry['size']
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """超过容量上限时先删除过期条目，再按最近访问时间淘汰"""
+        if self._total_bytes <= self._max_bytes:
+            return
+        now = time.time()
+        for key in [k for k, entry in self._index.items() if entry['expires'] < now]:
+            self._remove(key)
+
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if self._total_bytes <= self._max_bytes:
+                break
+            self._remove(key)
+
+    def clear(self):
+        """清空接口缓存"""
+        with self._lock:
+            for key in list(self._load_index().keys()):
+                self._remove(key)
+            if os.path.exists(self._cache_dir):
+                self._save_index(force=True)
+
+
+ak = CachedAkshare(
+    _akshare,
+    cache_dir=os.path.join(CACHE_DIR, 'ak_cache'),
+    max_bytes=int(AK_CACHE_CONFIG['max_mb'] * 1024 * 1024),
+    ttl_overrides=AK_CACHE_CONFIG['ttl'],
+    enabled=AK_CACHE_CONFIG['enabled']
+)
+atexit.register(ak.flush)
+
+
+def get_cache_stats():
+    """返回各接口的缓存命中统计 {接口名: {'hits': n, 'misses': n}}"""
+    return {name: dict(counts) for name, counts in ak.stats.items()}
+
+
+def format_cache_stats():
+    """生成缓存命中统计摘要"""
+    stats = get_cache_stats()
+    hits = sum(entry['hits'] for entry in stats.values())
+    misses = sum(entry['misses'] for entry in stats.values())
+    total = hits + misses
+    if total == 0:
+        return "接口缓存: 暂无调用"
+    return f"接口缓存: 命中 {hits}，未命中 {misses}，命中率 {hits / total:.1%}"
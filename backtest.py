@@ -0,0 +1,299 @@
+"""向量化回测
+
+把面板数据铺成 股票×交易日 的二维矩阵，在矩阵上一次性完成买卖点搜索、持仓、
+收益、换手和回撤的计算：
+
+- 第 t 日收盘产生的买入信号在下一个有成交的交易日以开盘价买入；
+- 持仓期间每日用最低价/最高价检查止损（买入价 × stop_loss）和止盈
+  （买入价 × take_profit），触发时按触发价成交（开盘即越过时按开盘价），
+  同一天两者都触发时按止损处理；
+- 第 t 日收盘产生的卖出信号在下一个有成交的交易日以开盘价卖出；
+- 卖出后才会寻找下一次买入信号，回测结束时仍持有的按最后收盘价平仓。
+
+每只股票的第 k 笔交易在同一轮中批量确定（所有股票一起向前搜索），循环次数等于
+单只股票的最多交易笔数，而不是交易日数。组合为全部持仓股票等权、每日再平衡。
+"""
+import numpy as np
+import pandas as pd
+from config import STRATEGY_CONFIG, QUANT_CONFIG
+
+EXIT_REASONS = ['止损', '止盈', '卖出信号', '期末']
+STOP_LOSS, TAKE_PROFIT, SELL_SIGNAL, END_OF_DATA = range(len(EXIT_REASONS))
+
+TRADING_DAYS = 252
+
+
+class MarketGrid:
+    """按股票代码和交易日期把行数据排列为 股票×交易日 矩阵（缺失的交易日为NaN）"""
+
+    def __init__(self, codes, dates):
+        self.code_keys, self.codes = pd.factorize(pd.Series(codes).astype(str), sort=True)
+        self.date_keys, self.dates = pd.factorize(pd.to_datetime(pd.Series(dates)), sort=True)
+        self.shape = (len(self.codes), len(self.dates))
+
+    def to_matrix(self, values, rows=None, cols=None, fill=np.nan):
+        """一维数组 -> 矩阵，rows/cols 为空时使用创建网格的数据的行列位置"""
+        rows = self.code_keys if rows is None else rows
+        cols = self.date_keys if cols is None else cols
+        values = np.asarray(values, dtype=np.float64)
+        matrix = np.full(self.shape, fill, dtype=np.float64)
+        matrix[rows, cols] = values
+        return matrix
+
+    def locate(self, codes, dates):
+        """其他数据（如信号）在网格中的行列位置，不在网格内的为 -1"""
+        rows = pd.Index(self.codes).get_indexer(pd.Series(codes).astype(str))
+        cols = pd.Index(self.dates).get_indexer(pd.to_datetime(pd.Series(dates)))
+        return rows, cols
+
+
+def _next_index(mask):
+    """每个位置起（含当前位置）下一个为 True 的列号，不存在时为列数
+
+    返回的矩阵多一列（值为列数），便于用越界后的位置直接取值
+    """
+    width = mask.shape[1]
+    index = np.where(mask, np.arange(width, dtype=np.int32), np.int32(width))
+    index = np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1]
+    return np.hstack([index, np.full((mask.shape[0], 1), width, dtype=np.int32)])
+
+
+def _forward_fill(matrix):
+    """按行向后填充缺失值（停牌日沿用上一个收盘价）"""
+    index = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return np.take_along_axis(matrix, index, axis=1)
+
+
+def _price(data, col, fallback):
+    if col not in data.columns:
+        return fallback
+    values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(values), fallback, values)
+
+
+class VectorBacktester:
+    def __init__(self, config=None, take_profit=None, stop_loss=None,
+                 commission=None, stamp_tax=None, window=32):
+        config = config or STRATEGY_CONFIG
+        self.take_profit = take_profit or config['take_profit']
+        self.stop_loss = stop_loss or config['stop_loss']
+        self.commission = QUANT_CONFIG['commission'] if commission is None else commission
+        self.stamp_tax = QUANT_CONFIG['stamp_tax'] if stamp_tax is None else stamp_tax
+        self.window = window  # 每次向前搜索卖点的交易日数
+
+    def run(self, prices, signals=None):
+        """运行回测
+
+        prices 为按 (股票代码, 交易日期) 排列的日线（DataFrame 或 StockPanel），需要收盘价，
+        有开盘价、最高价、最低价时用于成交价和止盈止损判断；signals 为包含股票代码、
+        交易日期、buy_signal、sell_signal 列的信号（如 BasicStrategy.analyze 的结果），
+        没有信号的行视为无信号，为空时从 prices 中读取信号列。
+
+        返回 {'daily': 每日组合表现, 'trades': 逐笔交易, 'summary': 汇总指标}
+        """
+        grid = self._load(prices, signals)
+        self.next_buy = _next_index(self.buy)
+        self.next_valid = _next_index(self.valid)
+        trades = self._trades(grid.shape)
+        daily = self._portfolio(grid, trades)
+
+        trade_frame = pd.DataFrame({
+            '股票代码': grid.codes[trades['row']],
+            '买入日期': grid.dates[trades['entry']],
+            '买入价': trades['entry_price'],
+            '卖出日期': grid.dates[trades['exit']],
+            '卖出价': trades['exit_price'],
+            '收益率': trades['return'],
+            '持有天数': trades['exit'] - trades['entry'] + 1,
+            '退出原因': np.asarray(EXIT_REASONS, dtype=object)[trades['reason']]
+        })
+        return {'daily': daily, 'trades': trade_frame, 'summary': summarize(daily, trade_frame)}
+
+    def _load(self, prices, signals):
+        """把日线和信号铺成矩阵（self.open/high/low/close/last_close/valid/buy/sell），返回网格"""
+        prices = getattr(prices, 'frame', prices)
+        signals = prices if signals is None else signals
+        grid = MarketGrid(prices['股票代码'], prices['交易日期'])
+
+        close = _price(prices, '收盘价', np.nan)
+        self.close = grid.to_matrix(close)
+        self.open = grid.to_matrix(_price(prices, '开盘价', close))
+        self.high = grid.to_matrix(_price(prices, '最高价', close))
+        self.low = grid.to_matrix(_price(prices, '最低价', close))
+        self.valid = ~np.isnan(self.close)
+        if '成交量' in prices.columns:
+            # 成交量为0的行视为停牌
+            self.valid &= grid.to_matrix(_price(prices, '成交量', np.nan)) != 0
+        # 截至每个交易日最近一个有成交日的收盘价
+        self.last_close = _forward_fill(np.where(self.valid, self.close, np.nan))
+
+        rows, cols = grid.locate(signals['股票代码'], signals['交易日期'])
+        known = (rows >= 0) & (cols >= 0)
+        self.buy = np.zeros(grid.shape, dtype=bool)
+        self.sell = np.zeros(grid.shape, dtype=bool)
+        self.buy[rows[known], cols[known]] = signals['buy_signal'].to_numpy()[known] == 1
+        self.sell[rows[known], cols[known]] = signals['sell_signal'].to_numpy()[known] == 1
+        self.buy &= self.valid
+        self.sell &= self.valid
+        return grid
+
+    def _trades(self, shape):
+        """逐轮确定每只股票的下一笔交易（每轮所有股票一起处理）"""
+        n_stocks, n_days = shape
+        start = np.zeros(n_stocks, dtype=np.int64)  # 从该交易日起寻找买入信号
+        active = np.arange(n_stocks)
+        parts = []
+        while active.size:
+            signal_day = self.next_buy[active, start[active]]
+            entry = self.next_valid[active, np.minimum(signal_day + 1, n_days)].astype(np.int64)
+            has_entry = entry < n_days
+            active, entry = active[has_entry], entry[has_entry]
+            if not active.size:
+                break
+            entry_price = self.open[active, entry]
+            exit_day, exit_price, reason = self._exits(active, entry, entry_price)
+            parts.append((active, entry, entry_price, exit_day, exit_price, reason))
+            start[active] = exit_day
+
+        keys = ['row', 'entry', 'entry_price', 'exit', 'exit_price', 'reason']
+        if not parts:
+            empty = [np.zeros(0, dtype=np.int64)] * 2 + [np.zeros(0)] + \
+                    [np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64)]
+            trades = dict(zip(keys, empty))
+        else:
+            trades = {key: np.concatenate([part[i] for part in parts]) for i, key in enumerate(keys)}
+        cost = 2 * self.commission + self.stamp_tax
+        trades['return'] = trades['exit_price'] / trades['entry_price'] - 1 - cost
+        return trades
+
+    def _exits(self, rows, entry, entry_price):
+        """从买入日起向前搜索第一个止损、止盈或卖出信号，每次搜索 window 个交易日"""
+        n_days = self.close.shape[1]
+        exit_day = np.empty(len(rows), dtype=np.int64)
+        exit_price = np.empty(len(rows))
+        reason = np.empty(len(rows), dtype=np.int64)
+        stop_level = entry_price * self.stop_loss
+        take_level = entry_price * self.take_profit
+
+        pending = np.arange(len(rows))
+        offset = 0
+        while pending.size:
+            days = entry[pending, None] + offset + np.arange(self.window)
+            inside = days < n_days
+            days = np.minimum(days, n_days - 1)
+            r = rows[pending, None]
+            tradable = inside & self.valid[r, days]
+            hit_stop = tradable & (self.low[r, days] <= stop_level[pending, None])
+            hit_take = tradable & (self.high[r, days] >= take_level[pending, None])
+            hit_sell = tradable & self.sell[r, days]
+            hit = hit_stop | hit_take | hit_sell
+
+            found = hit.any(axis=1)
+            first = hit.argmax(axis=1)
+            idx = pending[found]
+            day = days[found, first[found]]
+            stock = rows[idx]
+            is_stop = hit_stop[found, first[found]]
+            is_take = hit_take[found, first[found]] & ~is_stop
+
+            # 卖出信号在下一个有成交的交易日开盘卖出，之后没有成交日时按当日收盘平仓
+            sell_day = self.next_valid[stock, np.minimum(day + 1, n_days)]
+            no_next = sell_day >= n_days
+            exit_day[idx] = np.where(is_stop | is_take | no_next, day, sell_day)
+            day_open = self.open[stock, np.minimum(sell_day, n_days - 1)]
+            exit_price[idx] = np.select(
+                [is_stop, is_take, no_next],
+                [np.minimum(self.open[stock, day], stop_level[idx]),
+                 np.maximum(self.open[stock, day], take_level[idx]),
+                 self.close[stock, day]],
+                day_open)
+            reason[idx] = np.select([is_stop, is_take, no_next],
+                                    [STOP_LOSS, TAKE_PROFIT, END_OF_DATA], SELL_SIGNAL)
+
+            # 到数据末尾仍未卖出：按最后一个有成交日的收盘价平仓
+            exhausted = ~found & ~inside[:, -1]
+            idx = pending[exhausted]
+            stock = rows[idx]
+            last = n_days - 1 - np.argmax(self.valid[stock, ::-1], axis=1)
+            exit_day[idx] = last
+            exit_price[idx] = self.close[stock, last]
+            reason[idx] = END_OF_DATA
+
+            pending = pending[~found & ~exhausted]
+            offset += self.window
+        return exit_day, exit_price, reason
+
+    def _portfolio(self, grid, trades):
+        """由逐笔交易得到持仓矩阵和每日收益，计算组合净值、回撤和换手"""
+        n_stocks, n_days = grid.shape
+        row, entry, exit_day = trades['row'], trades['entry'], trades['exit']
+
+        # 持仓区间 [entry, exit]：在差分矩阵上标记后按行累加
+        change = np.zeros((n_stocks, n_days + 1), dtype=np.int32)
+        np.add.at(change, (row, entry), 1)
+        np.add.at(change, (row, exit_day + 1), -1)
+        held = np.cumsum(change[:, :-1], axis=1, dtype=np.int32) > 0
+
+        # 持仓日收益：中间日为收盘价涨跌（停牌日为0），买入日和卖出日按成交价计算并扣除费用
+        filled = self.last_close
+        previous = np.empty_like(filled)
+        previous[:, 0] = np.nan
+        previous[:, 1:] = filled[:, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.nan_to_num(filled / previous - 1)
+        same_day = exit_day == entry
+        later = ~same_day
+        returns[row[later], entry[later]] = \
+            self.close[row[later], entry[later]] / trades['entry_price'][later] - 1 - self.commission
+        returns[row[later], exit_day[later]] = \
+            trades['exit_price'][later] / previous[row[later], exit_day[later]] - 1 \
+            - self.commission - self.stamp_tax
+        returns[row[same_day], entry[same_day]] = trades['return'][same_day]
+
+        positions = held.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_return = np.where(positions > 0,
+                                    np.where(held, returns, 0).sum(axis=0) / positions, 0.0)
+            trades_per_day = np.bincount(entry, minlength=n_days) + np.bincount(exit_day, minlength=n_days)
+            turnover = np.where(positions > 0, trades_per_day / (2 * positions), 0.0)
+
+        equity = np.cumprod(1 + daily_return)
+        drawdown = equity / np.maximum.accumulate(equity) - 1
+        return pd.DataFrame({
+            '交易日期': grid.dates,
+            '持仓数': positions,
+            '日收益率': daily_return,
+            '换手率': turnover,
+            '净值': equity,
+            '回撤': drawdown
+        })
+
+
+def summarize(daily, trades):
+    """汇总回测指标"""
+    days = len(daily)
+    returns = daily['日收益率'].to_numpy()
+    final = daily['净值'].iloc[-1] if days else 1.0
+    volatility = returns.std() * np.sqrt(TRADING_DAYS) if days else 0.0
+    return {
+        '开始日期': daily['交易日期'].iloc[0] if days else None,
+        '结束日期': daily['交易日期'].iloc[-1] if days else None,
+        '累计收益率': final - 1,
+        '年化收益率': final ** (TRADING_DAYS / days) - 1 if days else 0.0,
+        '年化波动率': volatility,
+        '夏普比率': returns.mean() * TRADING_DAYS / volatility if volatility > 0 else 0.0,
+        '最大回撤': daily['回撤'].min() if days else 0.0,
+        '平均持仓数': daily['持仓数'].mean() if days else 0.0,
+        '平均换手率': daily['换手率'].mean() if days else 0.0,
+        '交易次数': len(trades),
+        '胜率': (trades['收益率'] > 0).mean() if len(trades) else 0.0,
+        '平均每笔收益率': trades['收益率'].mean() if len(trades) else 0.0,
+        '平均持有天数': trades['持有天数'].mean() if len(trades) else 0.0,
+        **{f'{reason}次数': int((trades['退出原因'] == reason).sum()) for reason in EXIT_REASONS}
+    }
+
+
+def run_backtest(prices, signals=None, config=None):
+    """用默认参数运行向量化回测，参数含义见 VectorBacktester.run"""
+    return VectorBacktester(config).run(prices, signals)
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import pandas as pd
+from datetime import datetime
+from config import CACHE_DIR
+from cache_io import write_frame, read_frame, get_cache_format, FORMAT_EXTENSIONS
+
+# 日线存储的标准列
+BAR_COLUMNS = ['股票代码', '交易日期', '开盘价', '收盘价', '最高价', '最低价',
+               '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+
+
+class DailyBarStore:
+    """按段追加的日线存储
+
+    每次写入生成一个新的段文件，manifest.json 记录各段的日期范围以及每只股票
+    的存储区间和最后一根K线的收盘价，从而只需补齐缺失的交易日。
+    同一 (股票代码, 交易日期) 出现多次时，以最后写入的段为准。
+    manifest 的读写都在同一把锁内进行，可以在后台线程查询的同时由其他线程追加。
+    """
+
+    def __init__(self, root=None, max_segments=64):
+        self.root = root or os.path.join(CACHE_DIR, 'bars')
+        self.max_segments = max_segments
+        self.manifest_path = os.path.join(self.root, 'manifest.json')
+        self.manifest = self._load_manifest()
+        self._lock = threading.RLock()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'symbols': {}, 'segments': [], 'next_id': 1}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def last_bar(self, code):
+        """返回股票最后一根已存K线
+
+        格式为 {'date': 'YYYYMMDD', 'close': float, 'first': 'YYYYMMDD'}，
+        其中 first 为该股票数据完整覆盖的起始日期；由Tushare补数写入的股票还有
+        adj_base（前复权基准复权因子）；不存在时返回 None
+        """
+        with self._lock:
+            entry = self.manifest['symbols'].get(code)
+            if entry is None:
+                return None
+            return dict(entry)
+
+    def has_market_date(self, date_str):
+        """是否已存储某交易日的全市场数据"""
+        with self._lock:
+            return date_str in self.manifest.get('market_dates', [])
+
+    def market_dates(self):
+        """返回已存储全市场数据的交易日列表（YYYYMMDD，升序）"""
+        with self._lock:
+            return list(self.manifest.get('market_dates', []))
+
+    def date_range(self):
+        """返回已存储K线的 (最早日期, 最晚日期)（YYYYMMDD），没有数据时返回 None"""
+        with self._lock:
+            segments = self.manifest['segments']
+            if not segments:
+                return None
+            return min(seg['start'] for seg in segments), max(seg['end'] for seg in segments)
+
+    def last_date(self, code):
+        """返回股票最后存储的交易日期（YYYYMMDD）"""
+        bar = self.last_bar(code)
+        return bar['date'] if bar else None
+
+    def _write_segment(self, data, segment_id, fmt=None):
+        """写入段文件，返回文件名"""
+        base_path = os.path.join(self.root, f"segment_{segment_id:06d}")
+        return os.path.basename(write_frame(data, base_path, fmt))
+
+    def append(self, bars, coverage=None, market_dates=None, adj_base=None):
+        """追加一批日线数据（可包含多只股票），返回写入的行数
+
+        coverage: {股票代码: 'YYYYMMDD'}，表示该股票从此日期起的数据已完整获取
+                  （起始日可能是非交易日），未提供时以本批最早的K线日期为准
+        market_dates: 本批包含全市场数据的交易日列表，用于按日期补数时跳过已有日期
+        adj_base: {股票代码: 复权因子}，本批前复权价格所用的基准复权因子（Tushare补数时记录）；
+                  未提供但给出 coverage 的股票（如重新下载了整个区间）会清除原有记录
+        """
+        if bars is None or bars.empty:
+            return 0
+
+        data = bars[[col for col in BAR_COLUMNS if col in bars.columns]].copy()
+        data['股票代码'] = data['股票代码'].astype(str).str.zfill(6)
+        data['交易日期'] = pd.to_datetime(data['交易日期'])
+        data = data.sort_values(['股票代码', '交易日期'])
+
+        with self._lock:
+            if not os.path.exists(self.root):
+                os.makedirs(self.root)
+            segment_id = self.manifest['next_id']
+            file_name = self._write_segment(data, segment_id)
+
+            self.manifest['segments'].append({
+                'file': file_name,
+                'start': data['交易日期'].min().strftime('%Y%m%d'),
+                'end': data['交易日期'].max().strftime('%Y%m%d'),
+                'rows': len(data)
+            })
+            self.manifest['next_id'] = segment_id + 1
+
+            # 更新每只股票的存储区间和最后一根K线
+            grouped = data.groupby('股票代码')
+            first_dates = grouped['交易日期'].min()
+            latest = grouped.tail(1)
+            symbols = self.manifest['symbols']
+            for code, date, close in zip(latest['股票代码'], latest['交易日期'], latest['收盘价']):
+                date_str = date.strftime('%Y%m%d')
+                first_str = first_dates[code].strftime('%Y%m%d')
+                if coverage and code in coverage:
+                    first_str = min(first_str, coverage[code])
+                entry = symbols.setdefault(code, {'date': date_str, 'close': None, 'first': first_str})
+                entry['first'] = min(entry['first'], first_str)
+                if adj_base and code in adj_base:
+                    entry['adj_base'] = float(adj_base[code])
+                elif coverage and code in coverage:
+                    entry.pop('adj_base', None)
+                if date_str >= entry['date']:
+                    entry['date'] = date_str
+                    entry['close'] = None if pd.isna(close) else float(close)
+
+            if market_dates:
+                filled = set(self.manifest.get('market_dates', []))
+                filled.update(market_dates)
+                self.manifest['market_dates'] = sorted(filled)
+
+            self._save_manifest()
+
+            if len(self.manifest['segments']) > self.max_segments:
+                self.compact()
+            return len(data)
+
+    def load(self, start_date=None, end_date=None, codes=None, columns=None):
+        """读取区间内的日线数据，按股票代码和交易日期排序
+
+        columns 用于只读取部分列（股票代码和交易日期总会读取）；
+        日期区间和 codes 作为过滤条件下推到段文件的读取
+        """
+        if columns is not None:
+            columns = ['股票代码', '交易日期'] + [col for col in columns
+                                            if col not in ('股票代码', '交易日期')]
+        start = pd.to_datetime(start_date) if start_date else None
+        end = pd.to_datetime(end_date) if end_date else None
+
+        filters = []
+        if start is not None:
+            filters.append(('交易日期', '>=', start))
+        if end is not None:
+            filters.append(('交易日期', '<=', end))
+        if codes is not None:
+            codes = set(codes)
+            filters.append(('股票代码', 'in', codes))
+
+        with self._lock:
+            frames = []
+            for segment in self.manifest['segments']:
+                if start is not None and pd.to_datetime(segment['end']) < start:
+                    continue
+                if end is not None and pd.to_datetime(segment['start']) > end:
+                    continue
+                frames.append(read_frame(os.path.join(self.root, segment['file']), columns=columns,
+                                         filters=filters))
+
+        if not frames:
+            return pd.DataFrame(columns=columns or BAR_COLUMNS)
+
+        data = pd.concat(frames, ignore_index=True)
+
+        # 后写入的段覆盖先写入的段
+        data = data.drop_duplicates(['股票代码', '交易日期'], keep='last')
+        return data.sort_values(['股票代码', '交易日期']).reset_index(drop=True)
+
+    def compact(self):
+        """将所有段合并为一个段，去除被覆盖的重复行"""
+        with self._lock:
+            if len(self.manifest['segments']) <= 1:
+                return
+            old_files = [segment['file'] for segment in self.manifest['segments']]
+            data = self.load()
+
+            segment_id = self.manifest['next_id']
+            file_name = self._write_segment(data, segment_id)
+            self.manifest['segments'] = [{
+                'file': file_name,
+                'start': data['交易日期'].min().strftime('%Y%m%d'),
+                'end': data['交易日期'].max().strftime('%Y%m%d'),
+                'rows': len(data)
+            }]
+            self.manifest['next_id'] = segment_id + 1
+            self._save_manifest()
+
+            for old_file in old_files:
+                try:
+                    os.remove(os.path.join(self.root, old_file))
+                except OSError:
+                    pass
+            print(f"日线存储已合并: {len(old_files)} 个段 -> 1 个段（{len(data)} 行）")
+
+    def migrate_segments(self, fmt=None, remove_old=False):
+        """将段文件转换为当前缓存格式，返回转换的段数"""
+        with self._lock:
+            fmt = fmt or get_cache_format()
+            converted = 0
+            for segment in self.manifest['segments']:
+                if segment['file'].endswith(FORMAT_EXTENSIONS[fmt]):
+                    continue
+                old_path = os.path.join(self.root, segment['file'])
+                segment_id = self.manifest['next_id']
+                segment['file'] = self._write_segment(read_frame(old_path), segment_id, fmt)
+                self.manifest['next_id'] = segment_id + 1
+                self._save_manifest()
+                converted += 1
+                print(f"已转换: {old_path} -> {segment['file']}")
+                if remove_old:
+                    os.remove(old_path)
+            return converted
+
+
+def is_provisional_date(date_str):
+    """当天的K线在收盘前可能仍在变化"""
+    return date_str >= datetime.now().strftime('%Y%m%d')
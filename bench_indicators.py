@@ -0,0 +1,82 @@
+"""技术指标计算性能测试
+
+生成 5000 只股票 × 250 个交易日的模拟面板，对比：
+  1. 原实现：整个面板直接 rolling/ewm（跨股票边界，结果不正确）
+  2. pandas groupby 按股票计算
+  3. indicators 模块的分组矩阵计算
+并检查 2、3 的结果是否一致。
+
+用法: python bench_indicators.py [--stocks 5000] [--days 250]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from indicators import calculate_basic_indicators
+
+INDICATOR_COLUMNS = ['MA5', 'MA10', 'MA20', 'MACD', 'SIGNAL', 'RSI']
+
+
+def make_panel(stocks, days, seed=0):
+    """生成按股票代码、交易日期排序的模拟日线面板"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.02, size=(stocks, days))
+    close = 10 * np.exp(np.cumsum(returns, axis=1))
+    return pd.DataFrame({
+        '股票代码': np.repeat([f"{i:06d}" for i in range(stocks)], days),
+        '交易日期': np.tile(pd.bdate_range('2023-01-02', periods=days), stocks),
+        '收盘价': close.ravel()
+    })
+
+
+def pandas_indicators(close):
+    """原 BasicStrategy.calculate_technical_indicators 的计算方式"""
+    result = pd.DataFrame(index=close.index)
+    result['MA5'] = close.rolling(window=5).mean()
+    result['MA10'] = close.rolling(window=10).mean()
+    result['MA20'] = close.rolling(window=20).mean()
+    exp12 = close.ewm(span=12, adjust=False).mean()
+    exp26 = close.ewm(span=26, adjust=False).mean()
+    result['MACD'] = exp12 - exp26
+    result['SIGNAL'] = result['MACD'].ewm(span=9, adjust=False).mean()
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    result['RSI'] = 100 - (100 / (1 + gain / loss))
+    return result
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技术指标计算性能测试')
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=250)
+    args = parser.parse_args()
+
+    panel = make_panel(args.stocks, args.days)
+    print(f"面板: {args.stocks} 只股票 × {args.days} 个交易日 = {len(panel)} 行")
+
+    _, whole_time = timed(lambda: pandas_indicators(panel['收盘价']))
+    grouped, grouped_time = timed(
+        lambda: panel.groupby('股票代码', sort=False)['收盘价'].apply(pandas_indicators))
+    engine, engine_time = timed(lambda: calculate_basic_indicators(panel.copy()))
+
+    print(f"整面板 rolling/ewm（跨股票）: {whole_time:.3f} 秒")
+    print(f"pandas groupby 按股票计算:   {grouped_time:.3f} 秒")
+    print(f"分组矩阵计算:                {engine_time:.3f} 秒"
+          f"（比 groupby 快 {grouped_time / engine_time:.1f} 倍）")
+
+    expected = grouped.reset_index(level=0, drop=True).sort_index()
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(engine[col].to_numpy(), expected[col].to_numpy(),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True)
+    print("结果与 pandas groupby 一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import glob
+import os
+import pandas as pd
+from config import CACHE_DIR, CACHE_FORMAT, COMPACT_DTYPES
+
+try:
+    import pyarrow  # noqa: F401  列式缓存依赖pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 缓存文件扩展名
+FORMAT_EXTENSIONS = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'csv': '.csv'
+}
+
+# 缓存数据的固定类型
+CACHE_SCHEMA = {
+    '股票代码': 'code',
+    '股票名称': 'str',
+    '所属行业': 'str',
+    '交易日期': 'datetime',
+    '开盘价': 'float',
+    '收盘价': 'float',
+    '最高价': 'float',
+    '最低价': 'float',
+    '成交量': 'float',
+    '成交额': 'float',
+    '振幅': 'float',
+    '涨跌幅': 'float',
+    '涨跌额': 'float',
+    '换手率': 'float',
+    '市盈率-动态': 'float',
+    '归母净利润增长率': 'float'
+}
+
+# 内存中面板数据的紧凑类型：重复的字符串列使用分类类型，价格和百分比列使用float32
+# （成交量和成交额数值较大，保留float64以免损失精度）
+COMPACT_SCHEMA = {
+    '股票代码': 'category',
+    '股票名称': 'category',
+    '所属行业': 'category',
+    '开盘价': 'float32',
+    '收盘价': 'float32',
+    '最高价': 'float32',
+    '最低价': 'float32',
+    '振幅': 'float32',
+    '涨跌幅': 'float32',
+    '涨跌额': 'float32',
+    '换手率': 'float32'
+}
+
+
+def get_cache_format():
+    """返回实际使用的缓存格式，未安装pyarrow时回退到CSV"""
+    if CACHE_FORMAT in ('parquet', 'feather') and not HAS_PYARROW:
+        return 'csv'
+    return CACHE_FORMAT if CACHE_FORMAT in FORMAT_EXTENSIONS else 'csv'
+
+
+def apply_schema(data):
+    """按固定类型转换数据列"""
+    for col, kind in CACHE_SCHEMA.items():
+        if col not in data.columns:
+            continue
+        if kind == 'code':
+            data[col] = data[col].astype(str).str.zfill(6)
+        elif kind == 'str':
+            data[col] = data[col].where(data[col].isna(), data[col].astype(str))
+        elif kind == 'datetime':
+            data[col] = pd.to_datetime(data[col])
+        elif kind == 'float':
+            data[col] = pd.to_numeric(data[col], errors='coerce').astype('float64')
+    return data
+
+
+def compact_frame(data):
+    """将面板数据转换为紧凑类型，未启用compact_dtypes时原样返回"""
+    if not COMPACT_DTYPES:
+        return data
+    for col, dtype in COMPACT_SCHEMA.items():
+        if col in data.columns and data[col].dtype != dtype:
+            if dtype == 'float32':
+                data[col] = pd.to_numeric(data[col], errors='coerce').astype('float32')
+            else:
+                data[col] = data[col].astype(dtype)
+    return data
+
+
+def memory_report(data):
+    """各列的类型和内存占用（MB），按占用从大到小排序"""
+    usage = data.memory_usage(deep=True, index=False) / 1024 / 1024
+    report = pd.DataFrame({'类型': data.dtypes.astype(str), '内存(MB)': usage.round(2)})
+    return report.sort_values('内存(MB)', ascending=False)
+
+
+def memory_mb(data):
+    """数据的总内存占用（MB）"""
+    return data.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def find_cache_file(base_path):
+    """查找已存在的缓存文件，优先列式格式，其次CSV"""
+    candidates = [get_cache_format(), 'parquet', 'feather', 'csv']
+    for fmt in dict.fromkeys(candidates):
+        if fmt != 'csv' and not HAS_PYARROW:
+            continue
+        path = base_path + FORMAT_EXTENSIONS[fmt]
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_frame(data, base_path, fmt=None):
+    """按缓存格式写入数据，base_path不含扩展名，返回实际写入的文件路径"""
+    fmt = fmt or get_cache_format()
+    directory = os.path.dirname(base_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    data = apply_schema(data.copy())
+    path = base_path + FORMAT_EXTENSIONS[fmt]
+    if fmt == 'parquet':
+        data.to_parquet(path, index=False)
+    elif fmt == 'feather':
+        data.reset_index(drop=True).to_feather(path)
+    else:
+        data.to_csv(path, index=False, encoding='utf-8')
+    return path
+
+
+def read_frame(path, columns=None, filters=None):
+    """读取缓存文件，支持列投影（文件中不存在的列会被忽略）和行过滤
+
+    filters 为 [(列名, 运算符, 值), ...]（如 [('股票代码', 'in', codes)]），parquet 文件
+    在读取时按条件跳过不满足的行组和行，其他格式读取后过滤。
+    CSV文件在读取后按固定类型转换
+    """
+    wanted = set(columns) if columns is not None else None
+    if path.endswith('.parquet'):
+        if wanted is not None:
+            import pyarrow.parquet as pq
+            columns = [col for col in pq.read_schema(path).names if col in wanted]
+        if filters:
+            filters = [(col, op, list(value) if op in ('in', 'not in') else value)
+                       for col, op, value in filters]
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    # 过滤条件用到的列需要先读入
+    needed = wanted | {col for col, _, _ in filters or []} if wanted is not None else None
+    if path.endswith('.feather'):
+        data = pd.read_feather(path)
+    else:
+        usecols = (lambda col: col in needed) if needed is not None else None
+        data = apply_schema(pd.read_csv(path, encoding='utf-8', usecols=usecols, dtype={'股票代码': str}))
+    if filters:
+        from universe import evaluate
+        data = data[evaluate(data, filters, keep_missing=False)]
+    return data[[col for col in data.columns if col in wanted]] if wanted is not None else data
+
+
+def migrate_csv_cache(directory=None, fmt=None, remove_csv=False):
+    """将缓存目录中的CSV文件转换为列式格式，返回转换的文件数"""
+    directory = directory or CACHE_DIR
+    fmt = fmt or get_cache_format()
+    if fmt == 'csv':
+        print("当前缓存格式为CSV（或未安装pyarrow），无需迁移")
+        return 0
+
+    converted = 0
+    for csv_path in sorted(glob.glob(os.path.join(directory, '*.csv'))):
+        base_path = csv_path[:-len('.csv')]
+        try:
+            target = write_frame(read_frame(csv_path), base_path, fmt)
+            converted += 1
+            print(f"已转换: {csv_path} -> {target}")
+            if remove_csv:
+                os.remove(csv_path)
+        except Exception as e:
+            print(f"转换 {csv_path} 失败: {e}")
+    return converted
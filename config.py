@@ -3,6 +3,9 @@ import yaml
 
 def load_config():
     config_path = os.path.join(os.path.dirname(__file__), 'config.yml')
+    if not os.path.exists(config_path):
+        # 尚未创建 config.yml 时（如在新检出的仓库中运行测试）使用示例配置
+        config_path = os.path.join(os.path.dirname(__file__), 'config.example.yml')
     with open(config_path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
@@ -17,21 +20,116 @@ DEEPSEEK_API_ENDPOINT = _config['api']['deepseek']['endpoint']
 # 数据缓存配置
 CACHE_DIR = _config['cache']['directory']
 USE_CACHE = _config['cache']['use_cache']
+CACHE_FORMAT = _config['cache'].get('format', 'parquet')  # parquet / feather / csv
+INDUSTRY_REFRESH_DAYS = _config['cache'].get('industry_refresh_days', 7)  # 行业成分映射刷新间隔（天）
+COMPACT_DTYPES = _config['cache'].get('compact_dtypes', True)  # 内存中的面板数据使用紧凑类型
+
+# 数据获取配置（并发下载引擎）
+_fetch_config = _config.get('fetch') or {}
+FETCH_CONFIG = {
+    'max_workers': _fetch_config.get('max_workers', 8),    # 并发线程数
+    'retries': _fetch_config.get('retries', 2),            # 单只股票失败重试次数
+    'retry_delay': _fetch_config.get('retry_delay', 1.0),  # 重试间隔（秒）
+    'baostock_workers': _fetch_config.get('baostock_workers', 4),  # Baostock批量获取进程数
+    'snapshot_ttl': _fetch_config.get('snapshot_ttl', 300),  # 全市场实时行情快照有效期（秒）
+    'checkpoint_every': _fetch_config.get('checkpoint_every', 200),  # 每完成多少只股票保存一次断点
+    'resume': _fetch_config.get('resume', True),            # 重新运行时是否从断点继续
+    'checkpoint_max_age': _fetch_config.get('checkpoint_max_age', 6 * 3600)  # 断点有效期（秒）
+}
+
+# akshare接口缓存配置
+_ak_cache_config = _config.get('ak_cache') or {}
+AK_CACHE_CONFIG = {
+    'enabled': _ak_cache_config.get('enabled', True),
+    'max_mb': _ak_cache_config.get('max_mb', 512),     # 磁盘缓存容量上限（MB）
+    'ttl': _ak_cache_config.get('ttl') or {}           # 按接口名通配覆盖默认有效期（秒）
+}
+
+# 技术指标配置
+_indicator_config = _config.get('indicators') or {}
+INDICATOR_CONFIG = {
+    'cache_size': _indicator_config.get('cache_size', 512),  # 指标结果缓存条数（按股票和参数）
+    'panel_cache_size': _indicator_config.get('panel_cache_size', 2),  # 整个面板的指标结果缓存份数
+    'backend': _indicator_config.get('backend', 'numpy')    # 计算后端：numpy / pandas / talib / auto
+}
+
+# 多因子选股配置
+_factor_config = _config.get('factors') or {}
+FACTOR_CONFIG = {
+    'momentum_window': _factor_config.get('momentum_window', 20),      # 动量：N日收益率
+    'volatility_window': _factor_config.get('volatility_window', 20),  # 波动率：N日收益率标准差
+    'turnover_window': _factor_config.get('turnover_window', 20),      # 换手率：N日平均
+    'zscore_clip': _factor_config.get('zscore_clip', 3.0),            # 标准分截断范围
+    'industry_neutral': _factor_config.get('industry_neutral', True),  # 综合得分使用行业内标准分
+    'min_industry_size': _factor_config.get('min_industry_size', 5),  # 行业内股票数少于该值时使用全市场标准分
+    'weights': {                   # 综合得分权重（负值表示因子越小越好）
+        'momentum': 0.3,
+        'volatility': -0.2,
+        'turnover': 0.1,
+        'value': 0.2,
+        'growth': 0.0,             # 成长：需先接入季度财报的净利润同比增长率，目前不可用
+        **(_factor_config.get('weights') or {})
+    },
+    'top_n': _factor_config.get('top_n', 20)   # 增强策略输出的股票数量
+}
+
+# 出站请求限流配置（按数据源主机的令牌桶、熔断和退避）
+_rate_limit_config = _config.get('rate_limit') or {}
+RATE_LIMIT_CONFIG = {
+    'hosts': {
+        'default': {'rate': 5, 'burst': 10},      # 每秒请求数 / 突发上限
+        'eastmoney': {'rate': 8, 'burst': 16},
+        'sina': {'rate': 2, 'burst': 5},
+        'tushare': {'rate': 3, 'burst': 5},
+        **(_rate_limit_config.get('hosts') or {})
+    },
+    'circuit': {
+        'window': 20,          # 统计最近多少次请求
+        'error_rate': 0.5,     # 错误率达到该值时熔断
+        'cooldown': 30,        # 熔断暂停时间（秒）
+        **(_rate_limit_config.get('circuit') or {})
+    },
+    'backoff_base': _rate_limit_config.get('backoff_base', 1.0),   # 退避基础间隔（秒）
+    'backoff_cap': _rate_limit_config.get('backoff_cap', 30.0),    # 退避最大间隔（秒）
+    'requeue_rounds': _rate_limit_config.get('requeue_rounds', 1), # 失败任务重新排队轮数
+    'requeue_delay': _rate_limit_config.get('requeue_delay', 10)   # 重新排队前等待（秒）
+}
 
 # 策略参数配置
 STRATEGY_CONFIG = {
     'min_price': _config['strategy']['min_price'],
     'max_price': _config['strategy']['max_price'],
     'min_turnover': _config['strategy']['min_turnover'],
-    'min_market_cap': _config['strategy']['min_market_cap'],
+    'min_market_cap': float(_config['strategy']['min_market_cap']),  # YAML 会把 1.0e9 这类写法读成字符串
     'max_pe': _config['strategy']['max_pe'],
     'min_return': _config['strategy']['min_return'],
-    'min_volume': _config['strategy']['min_volume'],
+    'min_volume': float(_config['strategy']['min_volume']),  # YAML 会把 1.0e9 这类写法读成字符串
+    'prefilter': _config['strategy'].get('prefilter', True),  # 按以上条件在行情快照上预筛选股票池，不满足的股票不下载也不读取
+    'min_industry_rank': _config['strategy'].get('min_industry_rank', 0),  # 买入信号要求的行业内综合得分百分位（0为不限制）
     'take_profit': 1.1,  # 止盈比例，默认为1.1（10%收益）
     'stop_loss': 0.95    # 止损比例，默认为0.95（5%损失）
 }
 
 # 市场分析配置
+# 信号规则（表达式语法见 rules.py，可引用面板列和 IndicatorGraph 中的任意指标）
+_rules_config = _config.get('rules') or {}
+SIGNAL_RULES = {
+    # 基础策略买入/卖出信号
+    'buy': _rules_config.get('buy', "MACD > SIGNAL and RSI < 70 and 涨跌幅 > -3 and 换手率 > 1"),
+    'sell': _rules_config.get('sell', "MACD < SIGNAL or RSI > 80 or 涨跌幅 < -5"),
+    # 市场趋势分析器的选股条件
+    'qualify': _rules_config.get('qualify', "close > MA5 > MA10 > MA20 and MACD > SIGNAL and 30 < RSI < 70"),
+    # 个股技术面评分（各条规则命中时累加分值，总分限制在0-40）
+    'technical_score': _rules_config.get('technical_score') or [
+        {'rule': "MA5 > MA20", 'score': 10, 'reason': '处于上升趋势'},
+        {'rule': "MA5 > MA20 and EMA12 > EMA26", 'score': 5, 'reason': 'EMA金叉形成'},
+        {'rule': "30 < RSI < 70", 'score': 5, 'reason': 'RSI处于合理区间'},
+        {'rule': "RSI > 70", 'score': -5, 'reason': 'RSI超买'},
+        {'rule': "close > BB_upper", 'score': -3, 'reason': '突破布林带上轨'},
+        {'rule': "close < BB_lower", 'score': 5, 'reason': '触及布林带下轨'}
+    ]
+}
+
 MARKET_ANALYSIS_CONFIG = {
     'macro_factors': [
         '经济增长',
@@ -67,14 +165,18 @@ MARKET_ANALYSIS_CONFIG = {
 }
 
 # 幻方策略专用配置
+_backtest_config = _config.get('backtest') or {}
 QUANT_CONFIG = {
     'data_requirements': {
         'daily': ['开盘价', '收盘价', '最高价', '最低价', '成交量', '成交额', '换手率'],
         'fundamental': ['市盈率-动态', '归母净利润增长率'],
         'alternative': ['研报覆盖数']
     },
-    'backtest_range': ('20200101', '20241231')
+    'backtest_range': (str(_backtest_config.get('start', '20200101')),
+                       str(_backtest_config.get('end', '20241231'))),
+    'commission': _backtest_config.get('commission', 0.0003),  # 单边佣金费率
+    'stamp_tax': _backtest_config.get('stamp_tax', 0.0005)     # 卖出印花税率
 }
 
 # 确保变量在模块级别可用
-__all__ = ['TUSHARE_TOKEN', 'DEEPSEEK_API_KEY', 'DEEPSEEK_API_ENDPOINT', 'CACHE_DIR', 'USE_CACHE', 'STRATEGY_CONFIG', 'MARKET_ANALYSIS_CONFIG', 'QUANT_CONFIG']
+__all__ = ['TUSHARE_TOKEN', 'DEEPSEEK_API_KEY', 'DEEPSEEK_API_ENDPOINT', 'CACHE_DIR', 'USE_CACHE', 'CACHE_FORMAT', 'INDUSTRY_REFRESH_DAYS', 'COMPACT_DTYPES', 'FETCH_CONFIG', 'AK_CACHE_CONFIG', 'RATE_LIMIT_CONFIG', 'INDICATOR_CONFIG', 'FACTOR_CONFIG', 'STRATEGY_CONFIG', 'SIGNAL_RULES', 'MARKET_ANALYSIS_CONFIG', 'QUANT_CONFIG']
@@ -1,11 +1,21 @@
 import tushare as ts
-import akshare as ak
+from ak_cache import ak
 import baostock as bs
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import os
-from config import TUSHARE_TOKEN
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util as mp_util
+from config import TUSHARE_TOKEN, INDUSTRY_REFRESH_DAYS, FETCH_CONFIG, RATE_LIMIT_CONFIG, STRATEGY_CONFIG
+from fetch_engine import FetchEngine, FetchCheckpoint
+from rate_limiter import limiter
+from bar_store import DailyBarStore, is_provisional_date
+from universe import filter_universe
+from cache_io import (write_frame, read_frame, find_cache_file, migrate_csv_cache,
+                      compact_frame, memory_mb, memory_report)
 
 # 定义缓存目录
 CACHE_DIR = "data_cache"
@@ -26,8 +36,10 @@ COLUMN_MAPPING = {
     'pre_close': '昨收价',
     'change': '涨跌额',
     'turnover_rate': '换手率',
+    'trade_date': '交易日期',
     
     # Baostock列名映射
+    'date': '交易日期',
     'code': '股票代码',
     'turn': '换手率',
     'pctChg': '涨跌幅',
@@ -48,6 +60,21 @@ COLUMN_MAPPING = {
     '所属行业': '所属行业'
 }
 
+# AKShare日线历史数据列名映射
+HIST_COLUMN_MAPPING = {
+    '日期': '交易日期',
+    '开盘': '开盘价',
+    '收盘': '收盘价',
+    '最高': '最高价',
+    '最低': '最低价',
+    '成交量': '成交量',
+    '成交额': '成交额',
+    '振幅': '振幅',
+    '涨跌幅': '涨跌幅',
+    '涨跌额': '涨跌额',
+    '换手率': '换手率'
+}
+
 def standardize_columns(df):
     """统一数据列名"""
     for old_name, new_name in COLUMN_MAPPING.items():
@@ -55,52 +82,107 @@ def standardize_columns(df):
             df = df.rename(columns={old_name: new_name})
     return df
 
-def get_cache_file_path(trade_date):
-    """获取缓存文件路径"""
-    return os.path.join(CACHE_DIR, f"stock_data_{trade_date}.csv")
-
 def get_fundamental_cache_file_path(trade_date):
-    """获取基本面数据缓存文件路径"""
-    return os.path.join(CACHE_DIR, f"fundamental_data_{trade_date}.csv")
+    """获取基本面数据缓存文件路径（不含扩展名）"""
+    return os.path.join(CACHE_DIR, f"fundamental_data_{trade_date}")
+
+def get_industry_map_file_path():
+    """获取行业成分映射缓存文件路径（不含扩展名）"""
+    return os.path.join(CACHE_DIR, "industry_map")
+
+def fetch_industry_constituents(board_name):
+    """获取单个行业板块的成分股代码"""
+    stocks = ak.stock_board_industry_cons_em(symbol=board_name)
+    return stocks['代码'].astype(str).str.strip().str.zfill(6).tolist()
 
-def save_to_cache(data, trade_date):
-    """保存数据到缓存文件"""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-    cache_file = get_cache_file_path(trade_date)
+def refresh_industry_map(previous=None):
+    """并发获取所有行业板块成分股，返回 {股票代码: 行业名称}
     
-    # 确保数据类型正确
-    data['交易日期'] = pd.to_datetime(data['交易日期'])
-    data['股票代码'] = data['股票代码'].astype(str).str.zfill(6)
-    numeric_columns = ['开盘价', '收盘价', '最高价', '最低价', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
-    for col in numeric_columns:
-        if col in data.columns:
-            data[col] = pd.to_numeric(data[col], errors='coerce')
-    
-    # 保存数据
-    data.to_csv(cache_file, index=False, encoding='utf-8')
-    print(f"数据已缓存到: {cache_file}")
-
-def load_from_cache(trade_date):
-    """从缓存文件加载数据"""
-    cache_file = get_cache_file_path(trade_date)
-    if os.path.exists(cache_file):
+    个别板块获取失败时，沿用previous中该板块原有的成分股
+    """
+    industry_list = ak.stock_board_industry_name_em()
+    board_names = industry_list['板块名称'].tolist()
+    tasks = [(name, partial(fetch_industry_constituents, name)) for name in board_names]
+    report = FetchEngine().run(tasks, progress_every=20, label='个行业')
+    print(report.summary(label='个行业'))
+    if not report.results:
+        raise RuntimeError("所有行业成分股获取失败")
+    
+    industry_dict = {}
+    if previous and report.failures:
+        failed_boards = set(report.failures)
+        industry_dict.update({code: industry for code, industry in previous.items()
+                              if industry in failed_boards})
+    for board_name, codes in report.ordered_results:
+        for code in codes:
+            industry_dict[code] = board_name
+    return industry_dict
+
+def get_industry_map(refresh_days=None, force_refresh=False):
+    """获取股票代码到所属行业的映射
+    
+    映射持久化在缓存目录中，超过refresh_days天后重新获取；刷新失败时沿用旧映射
+    """
+    refresh_days = INDUSTRY_REFRESH_DAYS if refresh_days is None else refresh_days
+    base_path = get_industry_map_file_path()
+    cache_file = find_cache_file(base_path)
+    
+    previous = None
+    if cache_file is not None:
         try:
-            # 读取数据
-            data = pd.read_csv(cache_file, encoding='utf-8')
-            
-            # 转换数据类型
-            data['交易日期'] = pd.to_datetime(data['交易日期'])
-            data['股票代码'] = data['股票代码'].astype(str).str.zfill(6)
-            numeric_columns = ['开盘价', '收盘价', '最高价', '最低价', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
-            for col in numeric_columns:
-                if col in data.columns:
-                    data[col] = pd.to_numeric(data[col], errors='coerce')
-            
-            print(f"从缓存加载数据: {cache_file}")
-            return data
+            data = read_frame(cache_file)
+            previous = dict(zip(data['股票代码'], data['所属行业']))
+            age_days = (time.time() - os.path.getmtime(cache_file)) / 86400
+            if not force_refresh and age_days < refresh_days:
+                return previous
         except Exception as e:
-            print(f"读取缓存文件失败: {e}")
+            print(f"读取行业映射缓存失败: {e}")
+    
+    try:
+        print("正在刷新行业成分映射...")
+        industry_dict = refresh_industry_map(previous)
+        data = pd.DataFrame({'股票代码': list(industry_dict.keys()),
+                             '所属行业': list(industry_dict.values())})
+        cache_file = write_frame(data, base_path)
+        print(f"行业成分映射已缓存到: {cache_file}（{len(industry_dict)} 只股票）")
+        return industry_dict
+    except Exception as e:
+        print(f"获取行业信息失败: {e}")
+        return previous or {}
+
+# 全市场实时行情快照（同一轮分析中共享）
+_snapshot_lock = threading.Lock()
+_snapshot_state = {'data': None, 'fetched_at': 0.0}
+
+def get_market_snapshot(max_age=None, force_refresh=False):
+    """获取全市场实时行情快照（stock_zh_a_spot_em）
+    
+    在有效期内所有调用方共享同一份数据，索引为股票代码，可直接按代码查找。
+    返回的数据为共享对象，需要修改时请先copy()
+    """
+    max_age = FETCH_CONFIG['snapshot_ttl'] if max_age is None else max_age
+    with _snapshot_lock:
+        data = _snapshot_state['data']
+        if (force_refresh or data is None
+                or time.time() - _snapshot_state['fetched_at'] > max_age):
+            data = ak.stock_zh_a_spot_em()
+            data['代码'] = data['代码'].astype(str).str.zfill(6)
+            data.index = data['代码'].values
+            _snapshot_state['data'] = data
+            _snapshot_state['fetched_at'] = time.time()
+        return data
+
+def invalidate_market_snapshot():
+    """使行情快照失效，下次调用时重新获取（每轮监控开始时调用）"""
+    with _snapshot_lock:
+        _snapshot_state['data'] = None
+
+def get_spot_quote(stock_code):
+    """从行情快照中获取单只股票的实时行情，不存在时返回None"""
+    snapshot = get_market_snapshot()
+    stock_code = str(stock_code)[:6]
+    if stock_code in snapshot.index:
+        return snapshot.loc[stock_code]
     return None
 
 def fetch_stock_data_akshare(trade_date):
@@ -108,31 +190,12 @@ def fetch_stock_data_akshare(trade_date):
     try:
         print("正在使用AKShare获取数据...")
         # 获取A股所有股票列表
-        stock_list = ak.stock_zh_a_spot_em()
+        stock_list = get_market_snapshot().reset_index(drop=True)
         
         # 获取行业信息
-        try:
-            print("正在获取行业信息...")
-            industry_data = ak.stock_board_industry_name_em()
-            # 提取股票代码和所属行业
-            industry_dict = {}
-            for _, row in industry_data.iterrows():
-                try:
-                    # 获取行业成分股
-                    stocks = ak.stock_board_industry_cons_em(symbol=row['板块名称'])
-                    # 更新行业字典
-                    for _, stock in stocks.iterrows():
-                        industry_dict[stock['代码']] = row['板块名称']
-                except:
-                    continue
-            
-            # 添加行业信息到股票列表
-            stock_list['所属行业'] = stock_list['代码'].map(industry_dict)
-            stock_list['所属行业'].fillna('其他', inplace=True)
-            print("行业信息获取完成")
-        except Exception as e:
-            print(f"获取行业信息失败: {e}")
-            stock_list['所属行业'] = '其他'
+        print("正在获取行业信息...")
+        industry_dict = get_industry_map()
+        stock_list['所属行业'] = stock_list['代码'].map(industry_dict).fillna('其他')
         
         # 统一数据格式
         stock_list = standardize_columns(stock_list)
@@ -148,50 +211,197 @@ def fetch_stock_data_akshare(trade_date):
         print(f"AKShare获取数据失败: {e}")
         return None
 
-def fetch_stock_data_baostock(trade_date):
-    """使用Baostock获取股票数据"""
+# Baostock日线字段
+BAOSTOCK_FIELDS = "date,code,open,high,low,close,volume,amount,turn,pctChg"
+
+def get_symbol_directory_file_path():
+    """获取股票代码名称目录缓存文件路径（不含扩展名）"""
+    return os.path.join(CACHE_DIR, "symbols")
+
+def get_symbol_directory(refresh_days=1):
+    """获取A股代码名称目录（股票代码、股票名称），本地缓存超过refresh_days天后刷新"""
+    base_path = get_symbol_directory_file_path()
+    cache_file = find_cache_file(base_path)
+    
+    previous = None
+    if cache_file is not None:
+        try:
+            previous = read_frame(cache_file)
+            age_days = (time.time() - os.path.getmtime(cache_file)) / 86400
+            if age_days < refresh_days:
+                return previous
+        except Exception as e:
+            print(f"读取股票目录缓存失败: {e}")
+    
+    try:
+        stock_list = ak.stock_info_a_code_name()
+        stock_list = stock_list.rename(columns={'code': '股票代码', 'name': '股票名称'})
+        stock_list = stock_list[['股票代码', '股票名称']]
+        stock_list['股票代码'] = stock_list['股票代码'].astype(str).str.zfill(6)
+        write_frame(stock_list, base_path)
+        return stock_list
+    except Exception as e:
+        if previous is None:
+            raise
+        print(f"刷新股票目录失败，使用本地缓存: {e}")
+        return previous
+
+def _baostock_code(stock_code):
+    """六位代码转换为Baostock格式，如 600000 -> sh.600000"""
+    return f"sh.{stock_code}" if stock_code.startswith(('6', '9')) else f"sz.{stock_code}"
+
+# 每批股票数量：批次较小，结果可以随批次完成逐步汇总
+BAOSTOCK_CHUNK_SIZE = 50
+
+def _baostock_worker_init():
+    """工作进程初始化：每个进程只登录一次Baostock，进程退出时登出"""
+    bs.login()
+    # 工作进程退出时不会执行 atexit，使用 multiprocessing 的退出回调登出
+    mp_util.Finalize(None, bs.logout, exitpriority=10)
+
+def _fetch_baostock_chunk(bs_codes, start_date, end_date):
+    """在已登录的工作进程中获取一批股票的日线数据"""
+    frames = []
+    failed = []
+    for bs_code in bs_codes:
+        try:
+            rs = bs.query_history_k_data_plus(
+                bs_code, BAOSTOCK_FIELDS,
+                start_date=start_date, end_date=end_date,
+                frequency="d", adjustflag="3"
+            )
+            data = rs.get_data()
+            if not data.empty:
+                frames.append(data)
+        except Exception:
+            failed.append(bs_code)
+    return (pd.concat(frames, ignore_index=True) if frames else None), failed
+
+def _normalize_baostock_data(data, stock_names, industry_dict):
+    """统一Baostock数据的列名、代码格式和类型，并补充名称和行业"""
+    data = standardize_columns(data)
+    data['股票代码'] = data['股票代码'].str.split('.').str[-1]
+    data['交易日期'] = pd.to_datetime(data['交易日期'])
+    for col in ['开盘价', '最高价', '最低价', '收盘价', '成交量', '成交额', '换手率', '涨跌幅']:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    data['股票名称'] = data['股票代码'].map(stock_names).fillna('')
+    data['所属行业'] = data['股票代码'].map(industry_dict).fillna('其他')
+    return data
+
+def fetch_stock_data_baostock(trade_date, bulk=True, workers=None):
+    """使用Baostock获取股票数据
+    
+    bulk模式下将股票列表按 BAOSTOCK_CHUNK_SIZE 分批交给进程池，每个工作进程启动时
+    登录一次、退出时登出，各批结果按完成顺序逐批汇总；股票名称来自本地缓存的股票目录
+    """
+    print("正在使用Baostock获取数据...")
+    date_str = pd.to_datetime(trade_date).strftime('%Y-%m-%d')
+    try:
+        symbols = get_symbol_directory()
+        stock_names = dict(zip(symbols['股票代码'], symbols['股票名称']))
+    except Exception as e:
+        print(f"获取股票目录失败: {e}")
+        stock_names = {}
+    industry_dict = get_industry_map()
+    
+    if not bulk:
+        return _fetch_stock_data_baostock_serial(date_str, stock_names, industry_dict)
+    
+    try:
+        # 优先使用本地股票目录，避免额外的登录和指数代码
+        if stock_names:
+            # Baostock仅覆盖沪深两市
+            bs_codes = [_baostock_code(code) for code in stock_names
+                        if code.startswith(('0', '3', '6'))]
+        else:
+            bs.login()
+            try:
+                bs_codes = bs.query_all_stock(date_str).get_data()['code'].tolist()
+            finally:
+                bs.logout()
+        
+        workers = workers or FETCH_CONFIG['baostock_workers']
+        chunks = [bs_codes[i:i + BAOSTOCK_CHUNK_SIZE]
+                  for i in range(0, len(bs_codes), BAOSTOCK_CHUNK_SIZE)]
+        
+        start_time = time.time()
+        result_list = []
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_baostock_worker_init) as executor:
+            futures = [executor.submit(_fetch_baostock_chunk, chunk, date_str, date_str)
+                       for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    data, chunk_failed = future.result()
+                    failed.extend(chunk_failed)
+                    if data is not None:
+                        result_list.append(_normalize_baostock_data(data, stock_names, industry_dict))
+                except Exception as e:
+                    print(f"Baostock批次获取失败: {e}")
+                print(f"已完成 {done}/{len(chunks)} 批")
+        
+        # 失败的股票在单独的会话中重试一次
+        if failed:
+            print(f"重新获取 {len(failed)} 只失败的股票...")
+            time.sleep(RATE_LIMIT_CONFIG['requeue_delay'])
+            with ProcessPoolExecutor(max_workers=1, initializer=_baostock_worker_init) as executor:
+                data, failed = executor.submit(_fetch_baostock_chunk, failed, date_str, date_str).result()
+            if data is not None:
+                result_list.append(_normalize_baostock_data(data, stock_names, industry_dict))
+            if failed:
+                more = f" 等 {len(failed)} 只" if len(failed) > 10 else ''
+                print(f"仍获取失败: {', '.join(failed[:10])}{more}")
+        
+        elapsed = time.time() - start_time
+        print(f"Baostock共 {len(bs_codes)} 只股票，失败 {len(failed)}，耗时 {elapsed:.1f} 秒，"
+              f"吞吐量 {len(bs_codes) / max(elapsed, 1e-9):.2f} 个/秒")
+        
+        if result_list:
+            result_df = pd.concat(result_list, ignore_index=True)
+            return result_df.sort_values('股票代码').reset_index(drop=True)
+        return None
+    except Exception as e:
+        print(f"Baostock获取数据失败: {e}")
+        return None
+
+def _fetch_stock_data_baostock_serial(date_str, stock_names, industry_dict):
+    """单会话逐只获取Baostock数据"""
     try:
-        print("正在使用Baostock获取数据...")
         # 登录系统
         bs.login()
         
         # 获取股票列表
-        stock_rs = bs.query_all_stock(trade_date)
+        stock_rs = bs.query_all_stock(date_str)
         stock_df = stock_rs.get_data()
         
         result_list = []
+        skipped = []
         
         for _, row in stock_df.iterrows():
             try:
                 # 获取当日交易数据
                 rs = bs.query_history_k_data_plus(
                     row["code"],
-                    "date,code,open,high,low,close,volume,amount,turn,pctChg,industry",
-                    start_date=trade_date,
-                    end_date=trade_date,
+                    BAOSTOCK_FIELDS,
+                    start_date=date_str,
+                    end_date=date_str,
                     frequency="d",
                     adjustflag="3"
                 )
                 data = rs.get_data()
                 if not data.empty:
                     result_list.append(data)
-            except:
-                continue
+            except Exception as e:
+                skipped.append(f"{row['code']}: {e}")
+        
+        if skipped:
+            more = f" 等 {len(skipped)} 只" if len(skipped) > 10 else ''
+            print(f"Baostock跳过 {len(skipped)} 只股票: {'；'.join(skipped[:10])}{more}")
         
         if result_list:
             result_df = pd.concat(result_list)
-            # 统一数据格式
-            result_df = standardize_columns(result_df)
-            
-            # 补充股票名称
-            try:
-                stock_names = ak.stock_zh_a_spot_em()[['代码', '名称']]
-                stock_names = stock_names.rename(columns={'代码': '股票代码', '名称': '股票名称'})
-                result_df = pd.merge(result_df, stock_names, on='股票代码', how='left')
-            except:
-                result_df['股票名称'] = ''
-            
-            return result_df
+            # 统一数据格式并补充股票名称
+            return _normalize_baostock_data(result_df, stock_names, industry_dict)
             
         return None
     except Exception as e:
@@ -213,15 +423,328 @@ def get_start_date(trade_date):
         # 如果计算失败，往前推45天
         return (pd.to_datetime(trade_date) - pd.Timedelta(days=45)).strftime('%Y%m%d')
 
-def fetch_stock_data(trade_date, use_cache=True):
-    """获取指定日期的股票数据，包括必要的历史数据"""
+def fetch_stock_hist(stock_code, start_date, end_date):
+    """获取单只股票的日线历史数据（前复权），列名统一为标准日线列"""
+    hist_data = ak.stock_zh_a_hist(symbol=stock_code, period="daily",
+                                   start_date=start_date, end_date=end_date,
+                                   adjust="qfq")
+    if hist_data is None or hist_data.empty:
+        return hist_data
     
-    # 如果启用缓存，尝试从缓存加载
-    if use_cache:
-        cached_data = load_from_cache(trade_date)
-        if cached_data is not None:
-            cached_data['股票代码'] = cached_data['股票代码'].astype(str).str.zfill(6)
-            return cached_data
+    hist_data = hist_data.rename(columns=HIST_COLUMN_MAPPING)
+    hist_data['股票代码'] = stock_code
+    hist_data['交易日期'] = pd.to_datetime(hist_data['交易日期'])
+    return hist_data
+
+def _refetch_all_bars(stock_code, last_bar, start_date, end_date):
+    """重新下载该股票已存储的全部历史以及所需区间，返回 (K线数据, 完整覆盖的起始日期)
+    
+    下载的前复权价格使用同一（当前的）复权基准，写入后覆盖存储中该股票的所有K线
+    """
+    first = min(start_date, last_bar['first'])
+    return fetch_stock_hist(stock_code, first, max(end_date, last_bar['date'])), first
+
+def fetch_missing_bars(stock_code, last_bar, start_date, end_date):
+    """获取日线存储中缺失的K线，返回 (K线数据, 完整覆盖的起始日期或None)
+    
+    从最后一根已存K线当天开始重叠获取一根，若其收盘价与存储不一致，说明前复权
+    因子发生变化（除权除息），此时重新下载该股票已存储的全部历史（而不只是所需区间），
+    避免存储中同一只股票的序列混用新旧复权基准。已存储区间与所需区间不衔接
+    （如回测更早的区间）时同样整体重新下载。
+    """
+    if last_bar is None:
+        return fetch_stock_hist(stock_code, start_date, end_date), start_date
+    if last_bar['first'] > start_date or last_bar['date'] < start_date or last_bar['date'] > end_date:
+        return _refetch_all_bars(stock_code, last_bar, start_date, end_date)
+    
+    hist_data = fetch_stock_hist(stock_code, last_bar['date'], end_date)
+    if hist_data is None or hist_data.empty:
+        return hist_data, None
+    
+    last_date = pd.to_datetime(last_bar['date'])
+    overlap = hist_data[hist_data['交易日期'] == last_date]
+    if (not overlap.empty and last_bar['close'] is not None
+            and not is_provisional_date(last_bar['date'])
+            and abs(overlap['收盘价'].iloc[0] - last_bar['close']) > 1e-6):
+        return _refetch_all_bars(stock_code, last_bar, start_date, end_date)
+    
+    # 当天的K线在收盘前会变化，需要覆盖；历史K线已存储，无需重复写入
+    if is_provisional_date(last_bar['date']):
+        return hist_data, None
+    return hist_data[hist_data['交易日期'] > last_date], None
+
+def tushare_available():
+    """是否配置了有效的Tushare token"""
+    return bool(TUSHARE_TOKEN) and TUSHARE_TOKEN != '你的api key'
+
+def get_tushare_api():
+    """获取Tushare Pro接口"""
+    if not tushare_available():
+        raise ValueError("未配置Tushare token")
+    return ts.pro_api(TUSHARE_TOKEN)
+
+def get_trade_dates_tushare(start_date, end_date, pro=None):
+    """获取区间内的交易日列表（YYYYMMDD）"""
+    pro = pro or get_tushare_api()
+    cal = limiter.call('tushare', pro.trade_cal, exchange='SSE',
+                       start_date=start_date, end_date=end_date, is_open='1')
+    return sorted(cal['cal_date'].astype(str).tolist())
+
+def get_trade_dates(start_date, end_date):
+    """获取区间内的交易日列表（YYYYMMDD），优先使用Tushare交易日历，否则使用AKShare（新浪）交易日历"""
+    if tushare_available():
+        try:
+            return get_trade_dates_tushare(start_date, end_date)
+        except Exception as e:
+            print(f"Tushare获取交易日历失败，改用AKShare: {e}")
+    cal = ak.tool_trade_date_hist_sina()
+    dates = pd.to_datetime(cal['trade_date']).dt.strftime('%Y%m%d')
+    return sorted(dates[(dates >= start_date) & (dates <= end_date)].tolist())
+
+def last_closed_trade_date(store=None):
+    """返回今天之前最近一个交易日（YYYYMMDD）
+    
+    当天的K线在收盘前仍在变化，因此不包括今天。优先按交易日历判断（识别节假日）；
+    交易日历获取失败时取上一个工作日，如果日线存储中有该日前10天内的全市场交易日，
+    则以其中最近的一个为准（此时也无法联网补数，直接使用已存储的数据）
+    """
+    today = datetime.now()
+    try:
+        dates = get_trade_dates((today - timedelta(days=30)).strftime('%Y%m%d'),
+                                (today - timedelta(days=1)).strftime('%Y%m%d'))
+        if dates:
+            return dates[-1]
+    except Exception as e:
+        print(f"获取交易日历失败，按工作日推算: {e}")
+    estimate = (pd.Timestamp(today.date()) - pd.offsets.BDay(1)).strftime('%Y%m%d')
+    if store is not None:
+        window_start = (pd.Timestamp(estimate) - timedelta(days=10)).strftime('%Y%m%d')
+        recent = [date for date in store.market_dates() if window_start <= date <= estimate]
+        if recent:
+            return recent[-1]
+    return estimate
+
+def fetch_daily_bars_tushare(trade_date, pro=None, latest_factors=None):
+    """使用Tushare一次获取全市场某交易日的日线数据
+    
+    latest_factors: {ts_code: 最新复权因子}，提供时将价格转换为前复权，
+    与AKShare的前复权日线保持一致
+    """
+    pro = pro or get_tushare_api()
+    data = limiter.call('tushare', pro.daily, trade_date=trade_date)
+    if data is None or data.empty:
+        return None
+    
+    if latest_factors is not None:
+        factors = limiter.call('tushare', pro.adj_factor, trade_date=trade_date)
+        ratio = data['ts_code'].map(dict(zip(factors['ts_code'], factors['adj_factor'])))
+        ratio = ratio / data['ts_code'].map(latest_factors)
+        for col in ['open', 'high', 'low', 'close', 'pre_close', 'change']:
+            data[col] = data[col] * ratio.fillna(1.0)
+    
+    # 换手率需要单独的每日指标接口，权限不足时留空
+    try:
+        basic = limiter.call('tushare', pro.daily_basic, trade_date=trade_date,
+                             fields='ts_code,turnover_rate')
+        data = pd.merge(data, basic, on='ts_code', how='left')
+    except Exception:
+        data['turnover_rate'] = float('nan')
+    
+    data = standardize_columns(data)
+    data['股票代码'] = data['股票代码'].str.split('.').str[0]
+    data['交易日期'] = pd.to_datetime(data['交易日期'])
+    data['成交额'] = data['成交额'] * 1000  # 千元 -> 元
+    data['振幅'] = (data['最高价'] - data['最低价']) / data['昨收价'] * 100
+    return data
+
+# 复权因子变化时需要换算的价格列（涨跌幅、振幅等比例列不受影响）
+ADJUSTED_PRICE_COLUMNS = ['开盘价', '收盘价', '最高价', '最低价', '涨跌额']
+
+def _rebase_stored_bars(store, pro, base_factors, latest_factors):
+    """把已存储股票的前复权价格换算到新的复权基准，返回换算的股票数
+
+    base_factors: {股票代码: 新的基准复权因子}。记录了 adj_base 的股票按新旧因子之比换算；
+    其他来源（如AKShare）写入的股票按最后一根已存K线当天的Tushare前复权收盘价
+    与存储的收盘价之比换算，每个日期只需一次全市场请求
+    """
+    ratios = {}
+    unknown = {}
+    for code, factor in base_factors.items():
+        entry = store.last_bar(code)
+        if entry is None:
+            continue
+        if entry.get('adj_base') is not None:
+            if abs(entry['adj_base'] / factor - 1) > 1e-9:
+                ratios[code] = entry['adj_base'] / factor
+        elif entry['close'] and not is_provisional_date(entry['date']):
+            unknown.setdefault(entry['date'], {})[code] = entry['close']
+    
+    for date, closes in unknown.items():
+        try:
+            bars = fetch_daily_bars_tushare(date, pro, latest_factors)
+        except Exception as e:
+            print(f"Tushare获取 {date} 日线失败，无法核对复权基准: {e}")
+            continue
+        if bars is None:
+            continue
+        current = dict(zip(bars['股票代码'], bars['收盘价']))
+        for code, close in closes.items():
+            value = current.get(code)
+            if value is not None and not pd.isna(value) and abs(value / close - 1) > 1e-6:
+                ratios[code] = value / close
+    
+    if not ratios:
+        return 0
+    stored = store.load(codes=list(ratios))
+    scale = stored['股票代码'].map(ratios)
+    for col in ADJUSTED_PRICE_COLUMNS:
+        if col in stored.columns:
+            stored[col] = stored[col] * scale
+    store.append(stored, adj_base={code: base_factors[code] for code in ratios})
+    print(f"复权基准变化，已重新换算 {len(ratios)} 只股票的历史日线")
+    return len(ratios)
+
+def backfill_bar_store_tushare(start_date, end_date, store=None, batch_days=20):
+    """按交易日使用Tushare全市场接口补齐日线存储，每个交易日一次请求
+    
+    已存储的交易日会被跳过，返回写入的行数。价格以区间内最后一个交易日的复权因子
+    为基准前复权，基准记录在日线存储中；之前写入的股票基准不同（期间发生除权除息）时，
+    先把其历史日线换算到新基准，保证每只股票的序列使用同一基准
+    """
+    pro = get_tushare_api()
+    store = store or DailyBarStore()
+    trade_dates = get_trade_dates_tushare(start_date, end_date, pro)
+    pending = [date for date in trade_dates if not store.has_market_date(date)]
+    if not pending:
+        return 0
+    print(f"使用Tushare按日期补齐日线: {len(pending)}/{len(trade_dates)} 个交易日")
+    
+    # 以区间内最后一个交易日的复权因子为基准计算前复权价格
+    factors = limiter.call('tushare', pro.adj_factor, trade_date=trade_dates[-1])
+    latest_factors = dict(zip(factors['ts_code'], factors['adj_factor']))
+    base_factors = {ts_code.split('.')[0]: factor for ts_code, factor in latest_factors.items()}
+    _rebase_stored_bars(store, pro, base_factors, latest_factors)
+    
+    total_rows = 0
+    frames, dates = [], []
+    for idx, trade_date in enumerate(pending, 1):
+        try:
+            data = fetch_daily_bars_tushare(trade_date, pro, latest_factors)
+            if data is not None:
+                frames.append(data)
+                if not is_provisional_date(trade_date):
+                    dates.append(trade_date)
+        except Exception as e:
+            print(f"Tushare获取 {trade_date} 日线失败: {e}")
+        
+        if frames and (len(frames) >= batch_days or idx == len(pending)):
+            batch = pd.concat(frames, ignore_index=True)
+            codes = batch['股票代码'].unique()
+            coverage = {code: start_date for code in codes}
+            adj_base = {code: base_factors[code] for code in codes if code in base_factors}
+            total_rows += store.append(batch, coverage=coverage, market_dates=dates,
+                                       adj_base=adj_base)
+            print(f"已补齐 {idx}/{len(pending)} 个交易日")
+            frames, dates = [], []
+    return total_rows
+
+def _append_fetched_bars(store, results):
+    """将一批 fetch_missing_bars 的结果写入日线存储，返回写入的行数"""
+    new_bars = []
+    coverage = {}
+    for stock_code, (bars, covered_from) in results:
+        if bars is not None and not bars.empty:
+            new_bars.append(bars)
+            if covered_from is not None:
+                coverage[stock_code] = covered_from
+    if not new_bars:
+        return 0
+    return store.append(pd.concat(new_bars, ignore_index=True), coverage=coverage)
+
+def fill_bar_store(store, stock_codes, start_date, end_date, use_cache=True, resume=None):
+    """逐只股票补齐日线存储中 [start_date, end_date] 缺失的K线，返回写入的行数
+    
+    每完成一批股票就写入日线存储并记录断点，中断后重新运行（resume）时只获取剩余的股票。
+    use_cache 为 False 时忽略已存储的K线，重新下载整个区间
+    """
+    resume = FETCH_CONFIG['resume'] if resume is None else resume
+    checkpoint = FetchCheckpoint(f"fetch_{start_date}_{end_date}")
+    if use_cache and resume and checkpoint.load():
+        print(f"从断点继续，已完成 {len(checkpoint.completed)} 只股票")
+    
+    tasks = []
+    for stock_code in stock_codes:
+        if stock_code in checkpoint.completed:
+            continue
+        last_bar = store.last_bar(stock_code) if use_cache else None
+        if (last_bar is not None and last_bar['first'] <= start_date
+                and last_bar['date'] >= end_date
+                and not is_provisional_date(last_bar['date'])):
+            continue
+        tasks.append((stock_code, partial(fetch_missing_bars, stock_code, last_bar,
+                                          start_date, end_date)))
+    print(f"需要更新 {len(tasks)}/{len(stock_codes)} 只股票")
+    
+    saved_rows = []
+    report = None
+    if tasks:
+        def save_checkpoint(results):
+            saved_rows.append(_append_fetched_bars(store, results))
+            if use_cache:
+                checkpoint.mark(stock_code for stock_code, _ in results)
+        
+        report = FetchEngine().run(tasks, on_checkpoint=save_checkpoint)
+        print(report.summary())
+        print(f"新增 {sum(saved_rows)} 条日线数据")
+    if report is None or not report.failures:
+        checkpoint.clear()
+    return sum(saved_rows)
+
+def backfill_bar_store(start_date, end_date, store=None, stock_codes=None):
+    """补齐日线存储中 [start_date, end_date] 的全部历史K线（如回测区间），返回写入的行数
+    
+    配置了Tushare时先按交易日整体补数，每个交易日只需一次请求；之后（或没有Tushare时）
+    逐只股票补齐仍缺失的K线。stock_codes 默认为股票目录中的全部股票
+    """
+    store = store or DailyBarStore()
+    total_rows = 0
+    if tushare_available():
+        try:
+            total_rows += backfill_bar_store_tushare(start_date, end_date, store)
+        except Exception as e:
+            print(f"Tushare补数失败，改用逐只获取: {e}")
+    if stock_codes is None:
+        stock_codes = get_symbol_directory()['股票代码']
+    return total_rows + fill_bar_store(store, list(stock_codes), start_date, end_date)
+
+def get_candidate_universe(trade_date, prefilter=None):
+    """按策略条件在行情快照上预筛选股票池，返回股票代码集合；不筛选时返回 None
+    
+    行情快照只反映最近交易日，因此只对最近的日期筛选，历史日期（如回测）不筛选
+    """
+    prefilter = STRATEGY_CONFIG['prefilter'] if prefilter is None else prefilter
+    latest = (pd.Timestamp(datetime.now().date()) - pd.offsets.BDay(1)).strftime('%Y%m%d')
+    if not prefilter or trade_date < latest:
+        return None
+    try:
+        snapshot = get_market_snapshot()
+    except Exception as e:
+        print(f"获取行情快照失败，不预筛选股票池: {e}")
+        return None
+    universe = set(filter_universe(snapshot))
+    print(f"按策略条件预筛选股票池: {len(universe)}/{len(snapshot)} 只股票")
+    return universe
+
+def fetch_stock_data(trade_date, use_cache=True, resume=None, prefilter=None):
+    """获取指定日期的股票数据，包括必要的历史数据
+    
+    日线存储就是缓存：已覆盖所需区间的股票直接从存储读取，其余股票只下载缺失的K线。
+    下载过程中每完成一批股票就写入日线存储并记录断点，
+    中断后重新运行（resume）时只获取剩余的股票。
+    prefilter 为 True 时（默认取 strategy.prefilter），不满足策略价格、换手率、市值、
+    市盈率和成交额条件的股票既不下载也不从日线存储读取
+    """
+    universe = get_candidate_universe(trade_date, prefilter)
     
     print(f"正在获取股票数据，包括历史数据...")
     try:
@@ -229,100 +752,42 @@ def fetch_stock_data(trade_date, use_cache=True):
         start_date = get_start_date(trade_date)
         print(f"获取数据区间: {start_date} 至 {trade_date}")
         
-        # 使用AKShare获取股票列表
-        stock_list = ak.stock_info_a_code_name()
-        stock_list = stock_list.rename(columns={'code': '股票代码', 'name': '股票名称'})
+        # 获取股票列表（本地缓存的股票目录）
+        stock_list = get_symbol_directory()
         
         # 获取行业信息
         print("正在获取行业信息...")
-        try:
-            # 获取东方财富行业列表
-            industry_list = ak.stock_board_industry_name_em()
-            
-            # 创建行业映射字典
-            industry_dict = {}
-            total_industries = len(industry_list)
-            
-            for idx, (_, industry) in enumerate(industry_list.iterrows(), 1):
-                try:
-                    # 获取行业成分股
-                    stocks = ak.stock_board_industry_cons_em(symbol=industry['板块名称'])
-                    # 更新行业字典
-                    for _, stock in stocks.iterrows():
-                        stock_code = stock['代码'].strip()
-                        if stock_code.startswith('6'):  # 上证
-                            stock_code = f"sh{stock_code}"
-                        else:  # 深证
-                            stock_code = f"sz{stock_code}"
-                        industry_dict[stock_code] = industry['板块名称']
-                    
-                    if idx % 5 == 0:
-                        print(f"已处理 {idx}/{total_industries} 个行业")
-                        
-                except Exception as e:
-                    print(f"获取行业 {industry['板块名称']} 成分股失败: {e}")
-                    continue
-            
-            # 将行业信息添加到股票列表中
-            stock_list['所属行业'] = stock_list['股票代码'].map(industry_dict)
-            stock_list['所属行业'] = stock_list['所属行业'].fillna('其他')
-            print(f"成功获取行业信息，共 {len(industry_dict)} 只股票")
-            
-        except Exception as e:
-            print(f"获取行业信息失败: {e}")
-            stock_list['所属行业'] = '其他'
-        
-        print("行业信息处理完成")
+        industry_dict = get_industry_map()
+        stock_list['所属行业'] = stock_list['股票代码'].map(industry_dict).fillna('其他')
+        print(f"行业信息处理完成，共 {len(industry_dict)} 只股票")
+        if universe is not None:
+            stock_list = stock_list[stock_list['股票代码'].isin(universe)]
         
-        # 获取历史数据
+        # 只下载本地日线存储中缺失的交易日
         print("正在获取历史数据...")
-        all_data = []
-        total_stocks = len(stock_list)
-        for idx, (_, stock_info) in enumerate(stock_list.iterrows(), 1):
-            stock_code = stock_info['股票代码']
+        store = DailyBarStore()
+        
+        # 配置了Tushare时先按交易日整体补数，每个交易日只需一次请求
+        if use_cache and tushare_available():
             try:
-                # 获取单个股票的历史数据，使用start_date
-                hist_data = ak.stock_zh_a_hist(symbol=stock_code, period="daily", 
-                                             start_date=start_date, end_date=trade_date,
-                                             adjust="qfq")
-                if hist_data is not None and not hist_data.empty:
-                    # 添加股票信息
-                    hist_data['股票代码'] = stock_code
-                    hist_data['股票名称'] = stock_info['股票名称']
-                    hist_data['所属行业'] = stock_info['所属行业']
-                    all_data.append(hist_data)
-                
-                # 每处理100只股票显示一次进度
-                if idx % 100 == 0:
-                    print(f"已处理 {idx}/{total_stocks} 只股票")
-                    
+                backfill_bar_store_tushare(start_date, trade_date, store)
             except Exception as e:
-                print(f"获取股票 {stock_code} 的历史数据失败: {e}")
-                continue
+                print(f"Tushare补数失败，改用逐只获取: {e}")
+        
+        fill_bar_store(store, stock_list['股票代码'], start_date, trade_date, use_cache, resume)
         
-        if not all_data:
+        # 从日线存储读取完整区间
+        df = store.load(start_date, trade_date, codes=stock_list['股票代码'])
+        if df.empty:
             print("没有获取到任何数据")
             return None
         
-        print(f"成功获取 {len(all_data)} 只股票的历史数据")
-        
-        # 合并所有数据
-        df = pd.concat(all_data, ignore_index=True)
-        
-        # 重命名列
-        df = df.rename(columns={
-            '日期': '交易日期',
-            '开盘': '开盘价',
-            '收盘': '收盘价',
-            '最高': '最高价',
-            '最低': '最低价',
-            '成交量': '成交量',
-            '成交额': '成交额',
-            '振幅': '振幅',
-            '涨跌幅': '涨跌幅',
-            '涨跌额': '涨跌额',
-            '换手率': '换手率'
-        })
+        # 添加股票信息
+        stock_names = dict(zip(stock_list['股票代码'], stock_list['股票名称']))
+        stock_industries = dict(zip(stock_list['股票代码'], stock_list['所属行业']))
+        df['股票名称'] = df['股票代码'].map(stock_names)
+        df['所属行业'] = df['股票代码'].map(stock_industries)
+        print(f"成功获取 {df['股票代码'].nunique()} 只股票的历史数据")
         
         # 确保所有必要的列都存在
         required_columns = ['股票代码', '股票名称', '交易日期', '开盘价', '收盘价', '最高价', '最低价', 
@@ -344,9 +809,10 @@ def fetch_stock_data(trade_date, use_cache=True):
         # 按日期和股票代码排序
         df = df.sort_values(['股票代码', '交易日期'])
         
-        # 保存完整的历史数据到缓存
-        if use_cache:
-            save_to_cache(df, trade_date)
+        # 转换为紧凑类型以减少内存占用
+        before = memory_mb(df)
+        df = compact_frame(df)
+        print(f"面板数据 {len(df)} 行，内存占用 {before:.1f} MB -> {memory_mb(df):.1f} MB")
         
         return df
         
@@ -358,19 +824,10 @@ def fetch_fundamental_data(trade_date, use_cache=True):
     """获取财务数据"""
     # 如果使用缓存，尝试从缓存加载
     if use_cache:
-        cache_file = get_fundamental_cache_file_path(trade_date)
-        if os.path.exists(cache_file):
+        cache_file = find_cache_file(get_fundamental_cache_file_path(trade_date))
+        if cache_file is not None:
             try:
-                # 读取数据
-                data = pd.read_csv(cache_file, encoding='utf-8')
-                
-                # 转换数据类型
-                data['股票代码'] = data['股票代码'].astype(str).str.zfill(6)
-                numeric_columns = ['市盈率-动态', '归母净利润增长率']
-                for col in numeric_columns:
-                    if col in data.columns:
-                        data[col] = pd.to_numeric(data[col], errors='coerce')
-                
+                data = read_frame(cache_file)
                 print(f"从缓存加载基本面数据: {cache_file}")
                 return data
             except Exception as e:
@@ -379,7 +836,7 @@ def fetch_fundamental_data(trade_date, use_cache=True):
     try:
         print("正在获取市盈率数据...")
         # 获取实时市盈率和成长性数据
-        df = ak.stock_zh_a_spot_em()  # 获取A股实时行情
+        df = get_market_snapshot().reset_index(drop=True)  # 获取A股实时行情
         
         # 重命名列
         df = df.rename(columns={
@@ -412,10 +869,7 @@ def fetch_fundamental_data(trade_date, use_cache=True):
         
         # 保存到缓存
         if use_cache:
-            if not os.path.exists(CACHE_DIR):
-                os.makedirs(CACHE_DIR)
-            cache_file = get_fundamental_cache_file_path(trade_date)
-            result.to_csv(cache_file, index=False, encoding='utf-8')
+            cache_file = write_frame(result, get_fundamental_cache_file_path(trade_date))
             print(f"基本面数据已缓存到: {cache_file}")
         
         return result
@@ -423,4 +877,33 @@ def fetch_fundamental_data(trade_date, use_cache=True):
     except Exception as e:
         print(f"财务数据获取失败: {e}")
         # 返回空DataFrame但包含必要的列
-        return pd.DataFrame(columns=['股票代码', '归母净利润增长率', '市盈率-动态'])
\ No newline at end of file
+        return pd.DataFrame(columns=['股票代码', '归母净利润增长率', '市盈率-动态'])
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='数据缓存工具')
+    parser.add_argument('--migrate-cache', action='store_true', help='将data_cache中的CSV缓存转换为列式格式')
+    parser.add_argument('--remove-csv', action='store_true', help='转换成功后删除原CSV文件')
+    parser.add_argument('--memory-report', type=str, metavar='YYYYMMDD',
+                        help='获取指定日期的面板数据并输出紧凑类型转换前后的各列内存占用')
+    args = parser.parse_args()
+    
+    if args.migrate_cache:
+        count = migrate_csv_cache(CACHE_DIR, remove_csv=args.remove_csv)
+        count += DailyBarStore().migrate_segments(remove_old=args.remove_csv)
+        print(f"缓存迁移完成，共转换 {count} 个文件")
+    elif args.memory_report:
+        panel = fetch_stock_data(args.memory_report)
+        if panel is not None:
+            expanded = panel.astype({col: object for col in panel.columns
+                                     if isinstance(panel[col].dtype, pd.CategoricalDtype)})
+            expanded = expanded.astype({col: 'float64' for col in panel.select_dtypes('float32').columns})
+            print("转换前:")
+            print(memory_report(expanded).to_string())
+            print(f"合计 {memory_mb(expanded):.1f} MB\n")
+            print("转换后:")
+            print(memory_report(panel).to_string())
+            print(f"合计 {memory_mb(panel):.1f} MB")
+    else:
+        parser.print_help()
@@ -0,0 +1,165 @@
+import warnings
+import numpy as np
+import pandas as pd
+from config import FACTOR_CONFIG
+from indicators import GroupBlocks, rolling_mean, rolling_std
+
+# 因子列名 -> 标准化后的列名
+# 成长因子取自财报的“净利润同比增长率”列（用 StockPanel.attach 按股票代码并入日线面板）。
+# 目前没有接入全市场的季度财报数据源，该列默认不存在，成长因子全为NaN，默认权重为0；
+# fetch_fundamental_data 的“归母净利润增长率”是涨跌幅的20日均值，并非盈利增长，不作为成长因子
+FACTOR_COLUMNS = {
+    'momentum': 'Momentum',
+    'volatility': 'Volatility',
+    'turnover': 'Turnover_Avg',
+    'value': 'Value_EP',
+    'growth': 'Growth'
+}
+
+# 成长因子所用的财报列
+GROWTH_COLUMN = '净利润同比增长率'
+
+
+def _momentum(close, window):
+    """window 日收益率"""
+    result = np.full(close.shape, np.nan)
+    if close.shape[1] > window:
+        result[:, window:] = close[:, window:] / close[:, :-window] - 1
+    return result
+
+
+def _volatility(close, window):
+    """window 日收益率的标准差"""
+    returns = np.full(close.shape, np.nan)
+    returns[:, 1:] = close[:, 1:] / close[:, :-1] - 1
+    return rolling_std(returns, window)
+
+
+def _column(data, col):
+    if col not in data.columns:
+        return np.full(len(data), np.nan)
+    return pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def raw_factors(data, config=None):
+    """计算每行的原始因子值，返回 {因子名: 一维数组}
+
+    data 需按股票代码和交易日期排序（如 StockPanel.frame）；时间序列因子在每只股票的
+    二维矩阵上批量计算，估值和成长因子取自基本面列（缺少该列时为NaN）
+    """
+    config = config or FACTOR_CONFIG
+    blocks = GroupBlocks(data['股票代码'])
+    close = blocks.to_matrix(_column(data, '收盘价'))
+    turnover = blocks.to_matrix(_column(data, '换手率'))
+
+    pe = _column(data, '市盈率-动态')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        earnings_yield = np.where(pe != 0, 1.0 / pe, np.nan)
+
+    return {
+        'momentum': blocks.to_array(_momentum(close, config['momentum_window'])),
+        'volatility': blocks.to_array(_volatility(close, config['volatility_window'])),
+        'turnover': blocks.to_array(rolling_mean(turnover, config['turnover_window'])),
+        'value': earnings_yield,
+        'growth': _column(data, GROWTH_COLUMN)
+    }
+
+
+def industry_groups(data):
+    """按 (交易日期, 所属行业) 分组，返回 (GroupBlocks, 每行所在分组的股票数)
+
+    所属行业为空的股票归为同一组
+    """
+    date_keys, _ = pd.factorize(data['交易日期'])
+    industry_keys, industries = pd.factorize(data['所属行业'], use_na_sentinel=False)
+    keys, _ = pd.factorize(date_keys.astype(np.int64) * (len(industries) + 1) + industry_keys)
+    return GroupBlocks(keys), np.bincount(keys)[keys]
+
+
+def zscore_by_group(values, blocks, clip=3.0):
+    """在每个分组（如每个交易日、每个交易日内的每个行业）内去均值并标准化，截断到 [-clip, clip]
+
+    blocks 为 GroupBlocks，每行是一个分组。标准化前先按中位数绝对偏差（MAD）去极值，
+    避免个别极端值（如市盈率接近0时的1/PE）压缩其他股票的标准分。
+    缺失值和组内无差异的分组结果为NaN
+    """
+    matrix = blocks.to_matrix(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 全为NaN的分组
+        median = np.nanmedian(matrix, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(matrix - median), axis=1, keepdims=True) * 1.4826
+        bound = np.where(mad > 0, clip * mad, np.inf)  # MAD为0时不去极值
+        matrix = np.clip(matrix, median - bound, median + bound)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (matrix - np.nanmean(matrix, axis=1, keepdims=True)) / np.nanstd(matrix, axis=1, keepdims=True)
+    z[~np.isfinite(z)] = np.nan
+    return blocks.to_array(np.clip(z, -clip, clip))
+
+
+def rank_by_group(values, blocks):
+    """组内百分位排名 (0, 1]，与 groupby().rank(pct=True) 一致（并列取平均名次），缺失值为NaN"""
+    matrix = blocks.to_matrix(values)
+    width = matrix.shape[1]
+    order = np.argsort(matrix, axis=1, kind='stable')  # NaN 排在最后
+    ordered = np.take_along_axis(matrix, order, axis=1)
+    positions = np.broadcast_to(np.arange(width), matrix.shape)
+
+    # 并列值的连续区间 [first, last]，名次取区间平均
+    run_start = np.ones(matrix.shape, dtype=bool)
+    run_start[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_end = np.ones(matrix.shape, dtype=bool)
+    run_end[:, :-1] = run_start[:, 1:]
+    first = np.maximum.accumulate(np.where(run_start, positions, 0), axis=1)
+    last = np.minimum.accumulate(np.where(run_end, positions, width)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty(matrix.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+    counts = np.count_nonzero(~np.isnan(matrix), axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranks = np.where(np.isnan(matrix), np.nan, ranks / counts)
+    return blocks.to_array(ranks)
+
+
+def calculate_factors(data, config=None):
+    """计算全部因子、标准化并加权得到 Composite_Score，就地写入 data
+
+    写入的列：原始因子（Momentum、Volatility、Turnover_Avg、Value_EP、Growth）、
+    按交易日全市场标准化的 *_Z、Composite_Score 及其全市场百分位排名 Market_Rank。
+    有所属行业列时还会写入行业内标准化的 *_IndZ 和行业内百分位排名 Industry_Rank；
+    industry_neutral 为 True 时综合得分使用行业内标准分，行业内股票数少于
+    min_industry_size 的分组沿用全市场标准分。某因子缺失时按0分（组内均值）计入，
+    参与加权的原始因子全部缺失（如新股）时 Composite_Score 和排名为NaN。
+    """
+    config = config or FACTOR_CONFIG
+    date_blocks = GroupBlocks(data['交易日期'])
+    weights = config['weights']
+    clip = config['zscore_clip']
+
+    industry_blocks = None
+    if '所属行业' in data.columns:
+        industry_blocks, group_sizes = industry_groups(data)
+        small_group = group_sizes < config['min_industry_size']
+
+    score = np.zeros(len(data))
+    has_factor = np.zeros(len(data), dtype=bool)
+    for name, values in raw_factors(data, config).items():
+        column = FACTOR_COLUMNS[name]
+        z = zscore_by_group(values, date_blocks, clip)
+        data[column] = values
+        data[f'{column}_Z'] = z
+        if industry_blocks is not None:
+            industry_z = np.where(small_group, z, zscore_by_group(values, industry_blocks, clip))
+            data[f'{column}_IndZ'] = industry_z
+            if config['industry_neutral']:
+                z = industry_z
+        weight = weights.get(name, 0.0)
+        score += weight * np.nan_to_num(z)
+        if weight:
+            has_factor |= ~np.isnan(values)
+
+    score[~has_factor] = np.nan
+    data['Composite_Score'] = score
+    data['Market_Rank'] = rank_by_group(score, date_blocks)
+    if industry_blocks is not None:
+        data['Industry_Rank'] = rank_by_group(score, industry_blocks)
+    return data
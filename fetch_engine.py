@@ -0,0 +1,187 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import CACHE_DIR, FETCH_CONFIG, RATE_LIMIT_CONFIG
+from rate_limiter import backoff_delay
+
+
+class FetchReport:
+    """一次批量获取的结果汇总"""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.results = {}
+        self.failures = {}
+        self.requeued = 0
+        self.recovered = 0
+        self.elapsed = 0.0
+
+    @property
+    def ordered_results(self):
+        """按任务提交顺序返回成功结果 [(key, value), ...]"""
+        return [(key, self.results[key]) for key in self.keys if key in self.results]
+
+    @property
+    def throughput(self):
+        """吞吐量（个/秒）"""
+        return len(self.keys) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self, label='只股票'):
+        """生成运行摘要"""
+        lines = [
+            f"共 {len(self.keys)} {label}，成功 {len(self.results)}，失败 {len(self.failures)}，"
+            f"耗时 {self.elapsed:.1f} 秒，吞吐量 {self.throughput:.2f} 个/秒"
+        ]
+        if self.requeued:
+            lines.append(f"重新排队 {self.requeued} 个，其中 {self.recovered} 个重试成功")
+        if self.failures:
+            failed = list(self.failures.items())
+            preview = '；'.join(f"{key}: {error}" for key, error in failed[:10])
+            more = f" 等 {len(failed)} 个" if len(failed) > 10 else ''
+            lines.append(f"失败列表: {preview}{more}")
+        return '\n'.join(lines)
+
+
+class FetchCheckpoint:
+    """批量获取的断点记录
+
+    保存已完成的任务键（包括没有返回数据的任务），中断后重新运行时跳过这些任务
+    """
+
+    def __init__(self, name, directory=None, max_age=None):
+        directory = directory or os.path.join(CACHE_DIR, 'checkpoints')
+        self.path = os.path.join(directory, f"{name}.json")
+        self.max_age = FETCH_CONFIG['checkpoint_max_age'] if max_age is None else max_age
+        self.completed = set()
+        self.created = time.time()
+
+    def load(self):
+        """读取断点，过期或损坏的断点会被忽略，返回已完成的任务数"""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"读取断点失败: {e}")
+            return 0
+        if time.time() - state['created'] > self.max_age:
+            print("断点已过期，重新获取")
+            self.clear()
+            return 0
+        self.completed = set(state['completed'])
+        self.created = state['created']
+        return len(self.completed)
+
+    def mark(self, keys):
+        """记录完成的任务并写入磁盘"""
+        self.completed.update(keys)
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'created': self.created, 'completed': sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """全部完成后删除断点"""
+        self.completed = set()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class FetchEngine:
+    """有界线程池数据获取引擎，支持单任务重试并按提交顺序汇总结果
+
+    单个任务按指数退避重试；全部任务完成后，失败的任务等待一段时间再重新排队，
+    避免数据源限流期间的失败被直接丢弃
+    """
+
+    def __init__(self, max_workers=None, retries=None, retry_delay=None, requeue_rounds=None):
+        self.max_workers = max_workers or FETCH_CONFIG['max_workers']
+        self.retries = FETCH_CONFIG['retries'] if retries is None else retries
+        self.retry_delay = FETCH_CONFIG['retry_delay'] if retry_delay is None else retry_delay
+        self.requeue_rounds = (RATE_LIMIT_CONFIG['requeue_rounds']
+                               if requeue_rounds is None else requeue_rounds)
+
+    def _run_task(self, func):
+        """执行单个任务，失败后按带抖动的指数退避重试"""
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                time.sleep(backoff_delay(attempt, base=self.retry_delay))
+
+    def run(self, tasks, progress_every=100, label='只股票', on_checkpoint=None,
+            checkpoint_every=None):
+        """并发执行任务
+
+        tasks: [(key, callable), ...]，callable 无参数，返回获取到的数据
+        on_checkpoint: 每完成 checkpoint_every 个任务时以 [(key, value), ...] 调用一次，
+                       用于分批持久化结果；每轮结束或中断时会处理剩余的结果
+        返回 FetchReport，其中 ordered_results 与 tasks 顺序一致
+        """
+        checkpoint = (on_checkpoint, checkpoint_every or FETCH_CONFIG['checkpoint_every'])
+        tasks = list(tasks)
+        report = FetchReport(key for key, _ in tasks)
+        start_time = time.time()
+
+        self._run_round(tasks, report, progress_every, label, start_time, checkpoint)
+        for _ in range(self.requeue_rounds):
+            if not report.failures:
+                break
+            pending = [(key, func) for key, func in tasks if key in report.failures]
+            report.requeued += len(pending)
+            print(f"{len(pending)} {label}获取失败，{RATE_LIMIT_CONFIG['requeue_delay']} 秒后重新排队...")
+            time.sleep(RATE_LIMIT_CONFIG['requeue_delay'])
+            for key, _ in pending:
+                del report.failures[key]
+            self._run_round(pending, report, progress_every, label, start_time, checkpoint)
+            report.recovered += len(pending) - len(report.failures)
+
+        report.elapsed = time.time() - start_time
+        return report
+
+    def _run_round(self, tasks, report, progress_every, label, start_time, checkpoint):
+        """执行一轮任务，结果写入report
+
+        checkpoint 为 (on_checkpoint, checkpoint_every)。中断（Ctrl+C）时取消尚未开始的任务，
+        不等待排队中的下载完成，已完成的结果仍会交给 on_checkpoint
+        """
+        on_checkpoint, checkpoint_every = checkpoint
+        total = len(tasks)
+        batch = []
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {executor.submit(self._run_task, func): key for key, func in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                key = futures[future]
+                try:
+                    report.results[key] = future.result()
+                    batch.append((key, report.results[key]))
+                except Exception as e:
+                    report.failures[key] = str(e)
+
+                if on_checkpoint and len(batch) >= checkpoint_every:
+                    ready, batch = batch, []
+                    on_checkpoint(ready)
+
+                if progress_every and done % progress_every == 0:
+                    elapsed = time.time() - start_time
+                    print(f"已处理 {done}/{total} {label}（{done / elapsed:.2f} 个/秒）")
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        else:
+            executor.shutdown(wait=True)
+        finally:
+            if on_checkpoint and batch:
+                on_checkpoint(batch)
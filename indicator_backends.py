@@ -0,0 +1,290 @@
+"""技术指标计算后端
+
+所有后端使用相同的输入格式：二维矩阵，每行一只股票，右侧以NaN补齐（见 indicators.GroupBlocks），
+并实现相同的指标种类：
+
+    sma   简单移动平均
+    std   移动标准差（ddof=1）
+    ema   指数移动平均
+    macd  MACD、信号线
+    rsi   RSI
+
+numpy 后端是参考实现（与原 pandas rolling/ewm 写法一致）；talib 的 EMA/MACD 以简单平均为初值、
+RSI 使用 Wilder 平滑，结果与参考实现不同，parity 检查会标记这些差异。
+
+用法:
+    python indicator_backends.py --parity      检查各后端与参考实现的数值差异
+    python indicator_backends.py --benchmark   测试各后端速度，并为 auto 模式选择最快的一致后端
+"""
+import json
+import os
+import platform
+import time
+import numpy as np
+import pandas as pd
+import indicators as kernels
+from config import CACHE_DIR, INDICATOR_CONFIG
+
+try:
+    import talib
+    HAS_TALIB = True
+except ImportError:
+    HAS_TALIB = False
+
+INDICATOR_KINDS = ('sma', 'std', 'ema', 'macd', 'rsi')
+BENCHMARK_FILE = os.path.join(CACHE_DIR, 'indicator_backends.json')
+
+
+class NumpyBackend:
+    """分组矩阵上的 NumPy 批量计算（参考实现）"""
+    name = 'numpy'
+
+    def sma(self, matrix, window):
+        return kernels.rolling_mean(matrix, window)
+
+    def std(self, matrix, window):
+        return kernels.rolling_std(matrix, window)
+
+    def ema(self, matrix, span):
+        return kernels.ema(matrix, span)
+
+    def macd(self, matrix, fast=12, slow=26, signal=9):
+        line = self.ema(matrix, fast) - self.ema(matrix, slow)
+        return line, self.ema(line, signal)
+
+    def rsi(self, matrix, period=14):
+        return kernels.rsi(matrix, period)
+
+
+class PandasBackend(NumpyBackend):
+    """pandas rolling/ewm，按列同时计算所有股票"""
+    name = 'pandas'
+
+    @staticmethod
+    def _frame(matrix):
+        return pd.DataFrame(matrix.T)
+
+    def sma(self, matrix, window):
+        return self._frame(matrix).rolling(window).mean().to_numpy().T
+
+    def std(self, matrix, window):
+        return self._frame(matrix).rolling(window).std().to_numpy().T
+
+    def ema(self, matrix, span):
+        return self._frame(matrix).ewm(span=span, adjust=False).mean().to_numpy().T
+
+    def rsi(self, matrix, period=14):
+        delta = self._frame(matrix).diff()
+        gain = delta.where(delta > 0, 0).rolling(period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(period).mean()
+        return (100 - 100 / (1 + gain / loss)).to_numpy().T
+
+
+class TalibBackend(NumpyBackend):
+    """TA-Lib，逐只股票计算
+
+    标准差按 ddof=1 换算以与其他后端一致；EMA/MACD/RSI 保留 TA-Lib 自身的定义
+    """
+    name = 'talib'
+
+    @staticmethod
+    def _apply(matrix, func, outputs=1):
+        results = [np.full(matrix.shape, np.nan) for _ in range(outputs)]
+        valid = ~np.isnan(matrix)
+        lengths = np.where(valid.any(axis=1), matrix.shape[1] - np.argmax(valid[:, ::-1], axis=1), 0)
+        for row, length in enumerate(lengths):
+            if length == 0:
+                continue
+            values = func(np.ascontiguousarray(matrix[row, :length]))
+            for result, value in zip(results, values if outputs > 1 else (values,)):
+                result[row, :length] = value
+        return results if outputs > 1 else results[0]
+
+    def sma(self, matrix, window):
+        return self._apply(matrix, lambda row: talib.SMA(row, timeperiod=window))
+
+    def std(self, matrix, window):
+        scale = np.sqrt(window / (window - 1))
+        return self._apply(matrix, lambda row: talib.STDDEV(row, timeperiod=window) * scale)
+
+    def ema(self, matrix, span):
+        return self._apply(matrix, lambda row: talib.EMA(row, timeperiod=span))
+
+    def macd(self, matrix, fast=12, slow=26, signal=9):
+        line, signal_line, _ = self._apply(
+            matrix, lambda row: talib.MACD(row, fast, slow, signal), outputs=3)
+        return line, signal_line
+
+    def rsi(self, matrix, period=14):
+        return self._apply(matrix, lambda row: talib.RSI(row, timeperiod=period))
+
+
+BACKENDS = {backend.name: backend for backend in (NumpyBackend(), PandasBackend())}
+if HAS_TALIB:
+    BACKENDS['talib'] = TalibBackend()
+
+_selected = None
+
+
+def get_backend(name):
+    """按名称返回后端，未安装 TA-Lib 时 talib 回退到 numpy"""
+    if name not in BACKENDS:
+        print(f"指标后端 {name} 不可用，使用 numpy")
+        name = 'numpy'
+    return BACKENDS[name]
+
+
+def select_backends():
+    """按配置返回 {指标种类: 后端}
+
+    indicators.backend 可以是后端名称、按指标种类配置的字典，或 'auto'
+    （使用 --benchmark 在本机测得的结果，没有结果时使用 numpy）
+    """
+    global _selected
+    if _selected is None:
+        setting = INDICATOR_CONFIG['backend']
+        if setting == 'auto':
+            setting = load_benchmark_choice() or 'numpy'
+        if isinstance(setting, dict):
+            _selected = {kind: get_backend(setting.get(kind, 'numpy')) for kind in INDICATOR_KINDS}
+        else:
+            backend = get_backend(setting)
+            _selected = {kind: backend for kind in INDICATOR_KINDS}
+    return _selected
+
+
+def _run(backend, kind, matrix):
+    """以默认参数计算一种指标，返回矩阵列表"""
+    if kind == 'sma':
+        return [backend.sma(matrix, 20)]
+    if kind == 'std':
+        return [backend.std(matrix, 20)]
+    if kind == 'ema':
+        return [backend.ema(matrix, 12)]
+    if kind == 'macd':
+        return list(backend.macd(matrix))
+    return [backend.rsi(matrix, 14)]
+
+
+def make_price_matrix(stocks=500, days=250, seed=0):
+    """生成长度不一的模拟收盘价矩阵（右侧以NaN补齐）"""
+    rng = np.random.default_rng(seed)
+    matrix = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(stocks, days)), axis=1))
+    lengths = rng.integers(days // 2, days + 1, size=stocks)
+    matrix[np.arange(days)[None, :] >= lengths[:, None]] = np.nan
+    return matrix
+
+
+def check_parity(stocks=500, days=250, rtol=1e-6, atol=1e-8):
+    """比较各后端与 numpy 参考实现的结果
+
+    返回 {(后端, 指标种类): {'ok', 'max_abs', 'max_rel', 'nan_mismatch'}}
+    """
+    matrix = make_price_matrix(stocks, days)
+    reference = {kind: _run(BACKENDS['numpy'], kind, matrix) for kind in INDICATOR_KINDS}
+    report = {}
+    for name, backend in BACKENDS.items():
+        if name == 'numpy':
+            continue
+        for kind in INDICATOR_KINDS:
+            max_abs = max_rel = 0.0
+            nan_mismatch = 0
+            ok = True
+            for expected, actual in zip(reference[kind], _run(backend, kind, matrix)):
+                both = ~np.isnan(expected) & ~np.isnan(actual)
+                nan_mismatch += int(np.count_nonzero(np.isnan(expected) != np.isnan(actual)))
+                error = np.abs(expected[both] - actual[both])
+                if error.size:
+                    max_abs = max(max_abs, float(error.max()))
+                    max_rel = max(max_rel, float((error / np.maximum(np.abs(expected[both]), atol)).max()))
+                    ok &= bool(np.all(error <= atol + rtol * np.abs(expected[both])))
+            report[(name, kind)] = {'ok': ok and nan_mismatch == 0, 'max_abs': max_abs,
+                                    'max_rel': max_rel, 'nan_mismatch': nan_mismatch}
+    return report
+
+
+def benchmark_backends(stocks=5000, days=250, repeat=3):
+    """测试各后端计算每种指标的耗时（秒，取最小值），返回 {(后端, 指标种类): 秒}"""
+    matrix = make_price_matrix(stocks, days)
+    timings = {}
+    for name, backend in BACKENDS.items():
+        for kind in INDICATOR_KINDS:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _run(backend, kind, matrix)
+                best = min(best, time.perf_counter() - start)
+            timings[(name, kind)] = best
+    return timings
+
+
+def choose_backends(timings, parity):
+    """为每种指标选择与参考实现一致的最快后端"""
+    choice = {}
+    for kind in INDICATOR_KINDS:
+        candidates = [name for name in BACKENDS
+                      if name == 'numpy' or parity.get((name, kind), {}).get('ok')]
+        choice[kind] = min(candidates, key=lambda name: timings[(name, kind)])
+    return choice
+
+
+def save_benchmark_choice(choice, timings):
+    """保存本机的后端选择结果"""
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    with open(BENCHMARK_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'machine': platform.node(),
+            'backends': sorted(BACKENDS),
+            'choice': choice,
+            'timings': {f"{name}.{kind}": seconds for (name, kind), seconds in timings.items()}
+        }, f, ensure_ascii=False, indent=2)
+
+
+def load_benchmark_choice():
+    """读取本机的后端选择结果，不是本机生成的结果会被忽略"""
+    if not os.path.exists(BENCHMARK_FILE):
+        return None
+    try:
+        with open(BENCHMARK_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"读取指标后端测试结果失败: {e}")
+        return None
+    if data.get('machine') != platform.node():
+        return None
+    return data['choice']
+
+
+def print_parity_report(report):
+    for (name, kind), result in report.items():
+        status = '一致' if result['ok'] else '存在差异'
+        print(f"{name:>7} {kind:<5} {status:<5} 最大绝对误差 {result['max_abs']:.3g}，"
+              f"最大相对误差 {result['max_rel']:.3g}，NaN位置不一致 {result['nan_mismatch']}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='技术指标计算后端工具')
+    parser.add_argument('--parity', action='store_true', help='检查各后端与numpy参考实现的差异')
+    parser.add_argument('--benchmark', action='store_true', help='测试各后端速度并保存auto模式的选择')
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=250)
+    args = parser.parse_args()
+
+    if not HAS_TALIB:
+        print("未安装TA-Lib，跳过talib后端")
+    if args.parity or args.benchmark:
+        parity = check_parity()
+        print_parity_report(parity)
+    if args.benchmark:
+        timings = benchmark_backends(args.stocks, args.days)
+        print(f"\n{args.stocks} 只股票 × {args.days} 个交易日:")
+        for (name, kind), seconds in timings.items():
+            print(f"{name:>7} {kind:<5} {seconds:.4f} 秒")
+        choice = choose_backends(timings, parity)
+        save_benchmark_choice(choice, timings)
+        print(f"\nauto 模式选择: {choice}（已保存到 {BENCHMARK_FILE}）")
+    if not (args.parity or args.benchmark):
+        parser.print_help()
@@ -0,0 +1,387 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import INDICATOR_CONFIG
+
+
+class GroupBlocks:
+    """将按股票代码分组的一维数据排列为二维矩阵（每行一只股票，右侧以NaN补齐）
+
+    数据需按股票代码连续排列、组内按交易日期排序；若股票代码不连续，
+    会先按股票代码稳定排序再排列，结果仍按原顺序返回。
+    """
+
+    def __init__(self, codes):
+        keys, _ = pd.factorize(codes)
+        n = len(keys)
+        if n and np.count_nonzero(keys[1:] != keys[:-1]) + 1 != keys.max() + 1:
+            self.order = np.argsort(keys, kind='stable')
+            keys = keys[self.order]
+        else:
+            self.order = None
+
+        change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        self.starts = np.concatenate([[0], change]).astype(np.int64) if n else np.zeros(0, np.int64)
+        self.lengths = np.diff(np.append(self.starts, n))
+        self.rows = np.repeat(np.arange(len(self.starts)), self.lengths)
+        self.cols = np.arange(n) - np.repeat(self.starts, self.lengths)
+        self.width = int(self.lengths.max()) if n else 0
+
+    def to_matrix(self, values):
+        """一维数组 -> 二维矩阵"""
+        values = np.asarray(values, dtype=np.float64)
+        if self.order is not None:
+            values = values[self.order]
+        matrix = np.full((len(self.starts), self.width), np.nan)
+        matrix[self.rows, self.cols] = values
+        return matrix
+
+    def to_array(self, matrix):
+        """二维矩阵 -> 与输入顺序一致的一维数组"""
+        values = matrix[self.rows, self.cols]
+        if self.order is None:
+            return values
+        result = np.empty_like(values)
+        result[self.order] = values
+        return result
+
+
+def rolling_mean(matrix, window):
+    """按行计算简单移动平均，与 Series.rolling(window).mean() 一致（窗口内有NaN时为NaN）"""
+    result = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] < window:
+        return result
+    valid = ~np.isnan(matrix)
+    zero = np.zeros((matrix.shape[0], 1))
+    sums = np.concatenate([zero, np.cumsum(np.where(valid, matrix, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([zero, np.cumsum(valid, axis=1)], axis=1)
+    window_sum = sums[:, window:] - sums[:, :-window]
+    window_count = counts[:, window:] - counts[:, :-window]
+    result[:, window - 1:] = np.where(window_count == window, window_sum / window, np.nan)
+    return result
+
+
+def ema(matrix, span):
+    """按行计算指数移动平均，与 Series.ewm(span, adjust=False).mean() 一致
+
+    逐列递推，每一步同时处理所有股票；缺失值沿用上一期的均值
+    """
+    alpha = 2.0 / (span + 1.0)
+    result = np.empty(matrix.shape)
+    prev = np.full(matrix.shape[0], np.nan)
+    for col in range(matrix.shape[1]):
+        x = matrix[:, col]
+        current = np.where(np.isnan(prev), x, alpha * x + (1 - alpha) * prev)
+        prev = np.where(np.isnan(x), prev, current)
+        result[:, col] = prev
+    return result
+
+
+def rolling_std(matrix, window):
+    """按行计算移动标准差（ddof=1），与 Series.rolling(window).std() 一致"""
+    result = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] < window:
+        return result
+    # 减去每行首个值以减小累加误差，不影响方差
+    centered = matrix - np.nan_to_num(matrix[:, :1])
+    mean = rolling_mean(centered, window)
+    mean_sq = rolling_mean(centered ** 2, window)
+    variance = np.maximum(mean_sq - mean ** 2, 0.0) * window / (window - 1)
+    result[:] = np.sqrt(variance)
+    return result
+
+
+def diff(matrix):
+    """按行计算一阶差分，每行第一个值为NaN"""
+    result = np.full(matrix.shape, np.nan)
+    result[:, 1:] = matrix[:, 1:] - matrix[:, :-1]
+    return result
+
+
+def rsi(close, period=14):
+    """以简单移动平均计算的RSI"""
+    delta = diff(close)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), period)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + gain / loss)
+
+
+class IndicatorCache:
+    """指标计算结果的LRU缓存，统计命中/未命中次数"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+_cache = IndicatorCache(INDICATOR_CONFIG['cache_size'])
+# 整个面板的结果（5000只股票×250日约70MB）单独缓存，只保留最近几份
+_panel_cache = IndicatorCache(INDICATOR_CONFIG['panel_cache_size'])
+
+
+# 常用指标名 -> 带参数的节点名
+INDICATOR_ALIASES = {
+    'MACD': 'MACD_12_26',
+    'SIGNAL': 'SIGNAL_12_26_9',
+    'MACD_HIST': 'MACD_HIST_12_26_9',
+    'RSI': 'RSI14',
+    'BB_upper': 'BB_upper_20_2',
+    'BB_middle': 'BB_middle_20_2',
+    'BB_lower': 'BB_lower_20_2'
+}
+
+_NODES = []
+
+
+def _node(pattern):
+    """注册指标节点：节点名匹配 pattern 时以 (图, *参数字符串) 调用被装饰的函数"""
+    def register(func):
+        _NODES.append((re.compile(pattern), func))
+        return func
+    return register
+
+
+class IndicatorGraph:
+    """惰性求值的指标依赖图
+
+    节点按名称请求（如 MA20、EMA12、STD20、MACD_12_26、SIGNAL_12_26_9、RSI14、
+    BB_upper_20_2，或 INDICATOR_ALIASES 中的简称），只计算所需的节点及其依赖，
+    结果保存在图中：同一序列的后续请求直接复用已计算的节点，
+    例如 MACD 的不同信号线周期共享 EMA12/EMA26，布林带中轨与 MA20 共享同一结果。
+    """
+
+    def __init__(self, close, backends=None):
+        from indicator_backends import select_backends
+        self.close = close
+        self.backends = backends or select_backends()
+        self.values = {}
+        self.lock = threading.RLock()
+
+    def __getitem__(self, name):
+        name = INDICATOR_ALIASES.get(name, name)
+        with self.lock:
+            if name not in self.values:
+                for pattern, func in _NODES:
+                    match = pattern.fullmatch(name)
+                    if match:
+                        self.values[name] = func(self, *match.groups())
+                        break
+                else:
+                    raise KeyError(f"未知的技术指标: {name}")
+            return self.values[name]
+
+    def evaluate(self, names):
+        """计算一组节点，返回 {名称: 矩阵}"""
+        return {name: self[name] for name in names}
+
+    def _shared_macd(self):
+        """MACD 与 EMA 使用同一后端时由 EMA 节点组合，否则使用后端自身的 MACD"""
+        return self.backends['macd'] is self.backends['ema']
+
+
+@_node(r'MA(\d+)')
+def _ma(graph, window):
+    return graph.backends['sma'].sma(graph.close, int(window))
+
+
+@_node(r'EMA(\d+)')
+def _ema(graph, span):
+    return graph.backends['ema'].ema(graph.close, int(span))
+
+
+@_node(r'STD(\d+)')
+def _std(graph, window):
+    return graph.backends['std'].std(graph.close, int(window))
+
+
+@_node(r'MACD_(\d+)_(\d+)')
+def _macd(graph, fast, slow):
+    if graph._shared_macd():
+        return graph[f'EMA{fast}'] - graph[f'EMA{slow}']
+    return graph.backends['macd'].macd(graph.close, int(fast), int(slow))[0]
+
+
+@_node(r'SIGNAL_(\d+)_(\d+)_(\d+)')
+def _signal(graph, fast, slow, signal):
+    if graph._shared_macd():
+        return graph.backends['ema'].ema(graph[f'MACD_{fast}_{slow}'], int(signal))
+    return graph.backends['macd'].macd(graph.close, int(fast), int(slow), int(signal))[1]
+
+
+@_node(r'MACD_HIST_(\d+)_(\d+)_(\d+)')
+def _macd_hist(graph, fast, slow, signal):
+    return graph[f'MACD_{fast}_{slow}'] - graph[f'SIGNAL_{fast}_{slow}_{signal}']
+
+
+@_node(r'RSI(\d+)')
+def _rsi(graph, period):
+    return graph.backends['rsi'].rsi(graph.close, int(period))
+
+
+@_node(r'BB_(upper|middle|lower)_(\d+)_([\d.]+)')
+def _bollinger(graph, band, window, width):
+    middle = graph[f'MA{window}']
+    if band == 'middle':
+        return middle
+    offset = float(width) * graph[f'STD{window}']
+    return middle + offset if band == 'upper' else middle - offset
+
+
+def is_indicator_name(name):
+    """是否为 IndicatorGraph 可以计算的指标名"""
+    name = INDICATOR_ALIASES.get(name, name)
+    return any(pattern.fullmatch(name) for pattern, _ in _NODES)
+
+
+def indicator_columns(ma_windows=(5, 10, 20), macd_params=(12, 26, 9), rsi_period=14,
+                      bollinger_window=None, bollinger_width=2, ema_spans=()):
+    """按参数返回 {输出列名: 节点名}"""
+    columns = {f'MA{window}': f'MA{window}' for window in ma_windows}
+    for span in ema_spans:
+        columns[f'EMA{span}'] = f'EMA{span}'
+    if macd_params:
+        fast, slow, signal = macd_params
+        columns['MACD'] = f'MACD_{fast}_{slow}'
+        columns['SIGNAL'] = f'SIGNAL_{fast}_{slow}_{signal}'
+        columns['MACD_HIST'] = f'MACD_HIST_{fast}_{slow}_{signal}'
+    if rsi_period:
+        columns['RSI'] = f'RSI{rsi_period}'
+    if bollinger_window:
+        for band in ('upper', 'middle', 'lower'):
+            columns[f'BB_{band}'] = f'BB_{band}_{bollinger_window}_{bollinger_width:g}'
+    return columns
+
+
+def _compute(close, ma_windows, macd_params, rsi_period, bollinger_window, bollinger_width=2,
+             ema_spans=(), columns=None, graph=None):
+    """在二维矩阵上使用配置的计算后端计算一组指标，返回 {列名: 矩阵}
+
+    columns 为需要的列名（节点名或简称）列表，指定时忽略其他参数；
+    graph 为已有的 IndicatorGraph 时复用其中已计算的节点
+    """
+    if columns is None:
+        wanted = indicator_columns(ma_windows, macd_params, rsi_period, bollinger_window,
+                                   bollinger_width, ema_spans)
+    else:
+        wanted = {name: name for name in columns}
+    graph = graph or IndicatorGraph(close)
+    return {column: graph[name] for column, name in wanted.items()}
+
+
+def series_indicators(data, symbol=None, price_col='close', date_col='date',
+                      ma_windows=(5, 10, 20), macd_params=(12, 26, 9), rsi_period=14,
+                      bollinger_window=None, bollinger_width=2, ema_spans=(), columns=None):
+    """计算单只股票（或指数）按日期排序的日线数据的技术指标
+
+    返回与 data 索引对齐的 DataFrame，列为 MA{n}、MACD/SIGNAL/MACD_HIST、RSI，
+    以及可选的 EMA{n} 和 BB_upper/BB_middle/BB_lower。指定 columns（如
+    ['MA5', 'MACD', 'SIGNAL']，可使用 IndicatorGraph 的任意节点名）时只计算这些列及其依赖。
+
+    指定 symbol 时该序列的指标依赖图会被缓存，键为 (代码, 首末K线日期, K线数量, 最新价)，
+    同一会话内菜单、监控和策略对同一序列的请求只计算尚未计算过的节点；
+    最新价用于区分盘中仍在变化的当日K线。
+    """
+    graph = None
+    key = None
+    if symbol is not None and len(data):
+        dates = data[date_col] if date_col in data.columns else data.index.to_series()
+        key = (symbol, str(dates.iloc[0]), str(dates.iloc[-1]), len(data),
+               float(data[price_col].iloc[-1]), price_col)
+        graph = _cache.get(key)
+
+    if graph is None:
+        graph = IndicatorGraph(np.asarray(data[price_col], dtype=np.float64)[None, :])
+        if key is not None:
+            _cache.put(key, graph)
+    values = _compute(graph.close, ma_windows, macd_params, rsi_period, bollinger_window,
+                      bollinger_width, ema_spans, columns=columns, graph=graph)
+    return pd.DataFrame({name: matrix[0] for name, matrix in values.items()}, index=data.index)
+
+
+def panel_indicators(data, price_col='收盘价', code_col='股票代码', ma_windows=(5, 10, 20),
+                     macd_params=(12, 26, 9), rsi_period=14, bollinger_window=None,
+                     bollinger_width=2, ema_spans=(), columns=None):
+    """在多只股票的面板上一次性计算技术指标，参数和列与 series_indicators 相同
+
+    data 需在每只股票内按交易日期排序，返回与 data 索引对齐的 DataFrame
+    """
+    blocks = GroupBlocks(data[code_col])
+    close = blocks.to_matrix(data[price_col].to_numpy(dtype=np.float64))
+    matrices = _compute(close, ma_windows, macd_params, rsi_period, bollinger_window,
+                        bollinger_width, ema_spans, columns=columns)
+    return pd.DataFrame({name: blocks.to_array(matrix) for name, matrix in matrices.items()},
+                        index=data.index)
+
+
+BASIC_COLUMNS = ['MA5', 'MA10', 'MA20', 'MACD', 'SIGNAL', 'RSI']
+
+
+def calculate_basic_indicators(data, price_col='收盘价'):
+    """为多只股票的面板数据计算 MA5/MA10/MA20、MACD/SIGNAL 和 RSI
+
+    data 需按股票代码和交易日期排序（如 StockPanel.frame），
+    各指标只在每只股票自身的序列内计算，返回添加了指标列的 data
+    """
+    blocks = GroupBlocks(data['股票代码'])
+    prices = data[price_col].to_numpy(dtype=np.float64)
+
+    # 整个面板的缓存键：股票分组、交易日期和价格序列的摘要
+    digest = hashlib.sha1()
+    for array in (blocks.starts, prices, data['交易日期'].to_numpy().view('int64')):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    key = ('panel', digest.hexdigest(), price_col)
+    values = _panel_cache.get(key)
+    if values is None:
+        indicators = _compute(blocks.to_matrix(prices), None, None, None, None,
+                              columns=BASIC_COLUMNS)
+        values = {name: blocks.to_array(matrix) for name, matrix in indicators.items()}
+        _panel_cache.put(key, values)
+
+    for name, array in values.items():
+        data[name] = array.copy()
+    return data
+
+
+def get_indicator_cache_stats():
+    """返回指标缓存（单只序列和整个面板合计）的命中统计 {'hits': n, 'misses': n, 'entries': n}"""
+    caches = (_cache, _panel_cache)
+    return {'hits': sum(cache.hits for cache in caches),
+            'misses': sum(cache.misses for cache in caches),
+            'entries': sum(len(cache.entries) for cache in caches)}
+
+
+def format_indicator_cache_stats():
+    """生成指标缓存命中统计摘要"""
+    stats = get_indicator_cache_stats()
+    total = stats['hits'] + stats['misses']
+    if total == 0:
+        return "指标缓存: 暂无调用"
+    return f"指标缓存: 命中 {stats['hits']}，未命中 {stats['misses']}，命中率 {stats['hits'] / total:.1%}"
@@ -6,6 +6,7 @@ from strategy import BasicStrategy, EnhancedQuantStrategy
 from report_generator import generate_report
 from market_analysis import MarketAnalyzer
 from main_menu import MainMenu
+from panel import StockPanel
 
 def parse_args():
     parser = argparse.ArgumentParser(description='股票交易策略系统')
@@ -28,8 +29,8 @@ def main():
             print("未获取到股票数据")
             return
             
-        # 确保股票代码为字符串类型
-        stock_data['股票代码'] = stock_data['股票代码'].astype(str).str.zfill(6)
+        # fetch_stock_data 返回的数据已按股票代码和交易日期排序
+        panel = StockPanel(stock_data, presorted=True)
         
         # 获取基本面数据
         fund_data = fetch_fundamental_data(args.date, use_cache=not args.no_cache)
@@ -40,28 +41,21 @@ def main():
         # 确保两边的股票代码都是字符串类型
         fund_data['股票代码'] = fund_data['股票代码'].astype(str).str.zfill(6)
         
-        # 只合并目标日期的数据
+        # 只将基本面数据写入目标日期的行
         target_date = pd.to_datetime(args.date)
-        target_data = stock_data[stock_data['交易日期'] == target_date].copy()
-        target_data = pd.merge(target_data, fund_data, on='股票代码', how='left')
-        
-        # 将合并后的数据更新回原始数据框
-        stock_data = stock_data[stock_data['交易日期'] != target_date]
-        stock_data = pd.concat([stock_data, target_data])
-        stock_data = stock_data.sort_values(['股票代码', '交易日期'])
+        panel.attach(fund_data, date=target_date)
         
         # 选择并运行策略
         if args.strategy == 'enhanced':
             print("使用增强策略分析...")
             strategy = EnhancedQuantStrategy()
-            stock_data = strategy.calculate_advanced_factors(stock_data)
+            strategy.calculate_advanced_factors(panel)
             # 只对目标日期的数据生成信号
-            target_data = stock_data[stock_data['交易日期'] == target_date].copy()
-            signals = strategy.generate_enhanced_signals(target_data)
+            signals = strategy.generate_enhanced_signals(panel.cross_section(target_date).copy())
         else:
             print("使用基础策略分析...")
             strategy = BasicStrategy()
-            stock_data = strategy.analyze(stock_data)
+            stock_data = strategy.analyze(panel)
             signals = strategy.generate_signals(stock_data)
         
         if signals is not None and not signals.empty:
@@ -1,11 +1,17 @@
 from rich.console import Console
-from rich.prompt import Prompt
+from rich.prompt import Prompt, Confirm
 from rich.panel import Panel
 from rich.table import Table
 from strategy import BasicStrategy, EnhancedQuantStrategy
 from market_analysis import MarketAnalyzer
 from monitor import analyze_market_trend
 from market_trend_analyzer import MarketTrendAnalyzer
+from bar_store import DailyBarStore
+from data_fetcher import backfill_bar_store
+from panel import StockPanel
+from backtest import run_backtest
+from simulator import run_simulation
+from config import QUANT_CONFIG
 import sys
 import argparse
 import pandas as pd
@@ -80,11 +86,20 @@ class MainMenu:
     def _handle_enhanced_analysis(self):
         """处理增强策略分析"""
         self.console.print("\n增强策略分析", style="bold green")
-        stock_code = Prompt.ask("请输入股票代码")
+        stock_code = Prompt.ask("请输入股票代码（多只用逗号或空格分隔）")
         try:
             strategy = EnhancedQuantStrategy()
-            analysis_result = strategy.analyze_stock(stock_code)  # Changed from analyze to analyze_stock
-            self.console.print(analysis_result)
+            symbols = stock_code.replace('，', ',').replace(',', ' ').split()
+            if len(symbols) > 1:
+                # 批量分析，按完成顺序逐只输出
+                for symbol, report, error in strategy.analyze_stocks(symbols):
+                    if error:
+                        self.console.print(f"[red]{symbol} 分析出错: {error}[/red]")
+                    else:
+                        self.console.print(report + "\n")
+            else:
+                analysis_result = strategy.analyze_stock(stock_code.strip())  # Changed from analyze to analyze_stock
+                self.console.print(analysis_result)
         except Exception as e:
             self.console.print(f"[red]分析出错: {str(e)}[/red]")
         
@@ -132,9 +147,74 @@ class MainMenu:
         input("\n按回车键返回主菜单...")
 
     def _show_backtest_results(self):
-        self.console.print("[yellow]回测结果查看功能开发中...[/yellow]")
+        """用日线存储中的数据回测基础策略的买卖信号"""
+        self.console.print("[bold green]回测结果查看[/bold green]")
+        default_start, default_end = QUANT_CONFIG['backtest_range']
+        start_date = Prompt.ask("开始日期", default=default_start)
+        end_date = Prompt.ask("结束日期", default=default_end)
+        mode = Prompt.ask("回测方式（1: 向量化回测  2: A股规则模拟，含T+1、涨跌停和停牌）",
+                          choices=["1", "2"], default="2")
+        try:
+            start_date = pd.to_datetime(start_date).strftime('%Y%m%d')
+            end_date = pd.to_datetime(end_date).strftime('%Y%m%d')
+            store = DailyBarStore()
+            # 日线存储没有覆盖回测区间时默认先补齐历史K线（已存储的K线不会重复下载）
+            stored = store.date_range()
+            covered = stored is not None and stored[0] <= start_date and stored[1] >= end_date
+            if Confirm.ask("是否补齐回测区间的历史日线", default=not covered):
+                backfill_bar_store(start_date, end_date, store)
+            bars = store.load(start_date, end_date)
+            if bars.empty:
+                self.console.print("[yellow]日线存储中没有回测区间的数据，请先补齐历史日线[/yellow]")
+            else:
+                self.console.print(f"正在回测 {bars['股票代码'].nunique()} 只股票...")
+                panel = StockPanel(bars, presorted=True)
+                strategy = BasicStrategy()
+                analyzed = strategy.analyze(panel)
+                if mode == "1":
+                    result = run_backtest(panel, analyzed)
+                else:
+                    result = run_simulation(panel, strategy.generate_signals(analyzed))
+                self._display_backtest(result)
+        except Exception as e:
+            self.console.print(f"[red]回测出错: {str(e)}[/red]")
         input("\n按回车键返回主菜单...")
 
+    def _display_backtest(self, result):
+        summary = result['summary']
+        table = Table(title="回测汇总")
+        table.add_column("指标", style="cyan")
+        table.add_column("数值", style="white")
+        percent = ('累计收益率', '年化收益率', '年化波动率', '最大回撤', '平均换手率', '胜率', '平均每笔收益率')
+        for name, value in summary.items():
+            if name in percent:
+                text = f"{value:.2%}"
+            elif isinstance(value, pd.Timestamp):
+                text = value.strftime('%Y-%m-%d')
+            elif isinstance(value, float):
+                text = f"{value:.2f}"
+            else:
+                text = str(value)
+            table.add_row(name, text)
+        self.console.print(table)
+
+        trades = result['trades']
+        if not trades.empty:
+            trade_table = Table(title="最近交易")
+            for col in ['股票代码', '买入日期', '买入价', '卖出日期', '卖出价', '收益率', '退出原因']:
+                trade_table.add_column(col)
+            for _, trade in trades.sort_values('卖出日期').tail(10).iterrows():
+                trade_table.add_row(
+                    trade['股票代码'],
+                    trade['买入日期'].strftime('%Y-%m-%d'),
+                    f"{trade['买入价']:.2f}",
+                    trade['卖出日期'].strftime('%Y-%m-%d'),
+                    f"{trade['卖出价']:.2f}",
+                    f"{trade['收益率']:.2%}",
+                    trade['退出原因']
+                )
+            self.console.print(trade_table)
+
     def _show_settings(self):
         self.console.print("[yellow]系统设置功能开发中...[/yellow]")
         input("\n按回车键返回主菜单...")
@@ -2,9 +2,11 @@ import os
 import json
 import requests
 from datetime import datetime, timedelta
-import akshare as ak
+from ak_cache import ak
 import pandas as pd
 from config import DEEPSEEK_API_KEY, MARKET_ANALYSIS_CONFIG, DEEPSEEK_API_ENDPOINT
+from data_fetcher import get_market_snapshot
+from indicators import series_indicators
 
 class StockAnalyzer:
     def __init__(self):
@@ -24,8 +26,10 @@ class StockAnalyzer:
             daily_data = self.api.stock_zh_a_hist(symbol=symbol, period="daily", 
                                                 adjust="qfq").tail(30)
             
-            # 获取实时行情
-            realtime_data = self.api.stock_zh_a_spot_em().query(f"代码 == '{symbol}'")
+            # 获取实时行情（共享的全市场快照，按代码直接查找）
+            snapshot = get_market_snapshot()
+            code = symbol[:6]
+            realtime_data = snapshot.loc[[code]] if code in snapshot.index else snapshot.iloc[0:0]
             
             # 获取主力资金流向
             capital_flow = self.api.stock_individual_fund_flow(symbol)
@@ -39,19 +43,15 @@ class StockAnalyzer:
         except Exception as e:
             raise Exception(f"获取股票数据失败: {str(e)}")
 
-    def analyze_technical_indicators(self, daily_data):
+    def analyze_technical_indicators(self, daily_data, symbol=None):
         """分析技术指标"""
         try:
-            # 计算MA5, MA10, MA20
-            daily_data['MA5'] = daily_data['收盘'].rolling(window=5).mean()
-            daily_data['MA10'] = daily_data['收盘'].rolling(window=10).mean()
-            daily_data['MA20'] = daily_data['收盘'].rolling(window=20).mean()
-            
-            # 计算MACD
-            exp1 = daily_data['收盘'].ewm(span=12, adjust=False).mean()
-            exp2 = daily_data['收盘'].ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=9, adjust=False).mean()
+            # 计算MA5, MA10, MA20和MACD
+            indicators = series_indicators(daily_data, symbol=symbol, price_col='收盘',
+                                           date_col='日期', columns=['MA5', 'MA10', 'MACD', 'SIGNAL'])
+            daily_data = daily_data.join(indicators)
+            macd = daily_data['MACD']
+            signal = daily_data['SIGNAL']
             
             # 获取最新数据
             latest = daily_data.iloc[-1]
@@ -72,7 +72,7 @@ class StockAnalyzer:
                 analysis.append("MACD死叉，注意下跌风险")
                 
             # 分析成交量
-            vol_ma5 = daily_data['成交量'].rolling(window=5).mean()
+            vol_ma5 = series_indicators(daily_data, price_col='成交量', columns=['MA5'])['MA5']
             if latest['成交量'] > vol_ma5.iloc[-1] * 1.5:
                 analysis.append("成交量显著放大，需密切关注")
                 
@@ -322,23 +322,9 @@ class MarketAnalyzer:
             # 按日期排序，确保数据顺序正确
             df = df.sort_values('date')
             
-            # 计算技术指标
-            df['MA5'] = df['close'].rolling(window=5).mean()
-            df['MA10'] = df['close'].rolling(window=10).mean()
-            df['MA20'] = df['close'].rolling(window=20).mean()
-            
-            # 计算MACD
-            exp1 = df['close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['close'].ewm(span=26, adjust=False).mean()
-            df['MACD'] = exp1 - exp2
-            df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-            
-            # 计算RSI
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['RSI'] = 100 - (100 / (1 + rs))
+            # 计算技术指标（均线、MACD、RSI）
+            df = df.join(series_indicators(df, symbol=symbol,
+                                           columns=['MA5', 'MA10', 'MA20', 'RSI', 'MACD', 'SIGNAL']))
             
             # 获取最新数据进行分析
             latest = df.iloc[-1]
@@ -355,7 +341,7 @@ class MarketAnalyzer:
                 'ma20': latest['MA20'],
                 'rsi': latest['RSI'],
                 'macd': latest['MACD'],
-                'macd_signal': latest['Signal'],
+                'macd_signal': latest['SIGNAL'],
                 'volume': latest['volume'],
                 'date': latest['date']
             }
@@ -387,9 +373,9 @@ class MarketAnalyzer:
             trend.append("整体偏弱")
             
         # MACD趋势
-        if latest['MACD'] > latest['Signal']:
+        if latest['MACD'] > latest['SIGNAL']:
             trend.append("MACD金叉形成")
-        elif latest['MACD'] < latest['Signal']:
+        elif latest['MACD'] < latest['SIGNAL']:
             trend.append("MACD死叉形成")
             
         # RSI分析
@@ -568,9 +554,9 @@ class MarketAnalyzer:
             cyb_index = ak.stock_zh_index_daily(symbol="sz399006")
             
             indices_analysis = {
-                '上证指数': self._analyze_index(sh_index),
-                '深证成指': self._analyze_index(sz_index),
-                '创业板指': self._analyze_index(cyb_index)
+                '上证指数': self._analyze_index(sh_index, 'sh000001'),
+                '深证成指': self._analyze_index(sz_index, 'sz399001'),
+                '创业板指': self._analyze_index(cyb_index, 'sz399006')
             }
             
             # 获取资金流向数据
@@ -585,7 +571,7 @@ class MarketAnalyzer:
             print(f"获取市场指标失败: {str(e)}")
             return None
 
-    def _analyze_index(self, df):
+    def _analyze_index(self, df, symbol=None):
         """分析指数数据"""
         try:
             if df.empty or len(df) < 20:
@@ -601,19 +587,11 @@ class MarketAnalyzer:
                 '成交量': 'volume'
             })
             
-            # 计算技术指标
-            # MACD
-            exp1 = df['close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['close'].ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=9, adjust=False).mean()
-            
-            # RSI
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
+            # 计算技术指标（MACD、RSI）
+            indicators = series_indicators(df, symbol=symbol, columns=['MACD', 'SIGNAL', 'RSI'])
+            macd = indicators['MACD']
+            signal = indicators['SIGNAL']
+            rsi = indicators['RSI']
             
             # 获取最新数据
             latest = df.iloc[-1]
@@ -1,8 +1,11 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import akshare as ak
-import talib
+from ak_cache import ak
+from data_fetcher import get_market_snapshot
+from config import SIGNAL_RULES
+from indicators import series_indicators, is_indicator_name
+from rules import compile_rule, rule_columns
 
 class MarketTrendAnalyzer:
     """市场趋势分析器"""
@@ -59,16 +62,12 @@ class MarketTrendAnalyzer:
                 # 确保列名统一
                 df.columns = [col.lower() for col in df.columns]
                 
-                # 计算技术指标
-                df['ma5'] = df['close'].rolling(5).mean()
-                df['ma10'] = df['close'].rolling(10).mean()
-                df['ma20'] = df['close'].rolling(20).mean()
-                
-                # 计算MACD
-                df['macd'], df['signal'], df['hist'] = talib.MACD(df['close'])
-                
-                # 计算RSI
-                df['rsi'] = talib.RSI(df['close'])
+                # 计算技术指标（均线、MACD、RSI）
+                indicators = series_indicators(df, symbol=symbol)
+                df['ma5'], df['ma10'], df['ma20'] = indicators['MA5'], indicators['MA10'], indicators['MA20']
+                df['macd'], df['signal'], df['hist'] = (indicators['MACD'], indicators['SIGNAL'],
+                                                        indicators['MACD_HIST'])
+                df['rsi'] = indicators['RSI']
                 
                 # 识别支撑压力位
                 recent_data = df.tail(20)
@@ -167,7 +166,7 @@ class MarketTrendAnalyzer:
         """分析市场情绪"""
         try:
             # 获取涨跌停数据（使用备用接口）
-            stock_data = ak.stock_zh_a_spot_em()  # 获取A股实时行情
+            stock_data = get_market_snapshot()  # 获取A股实时行情
             
             # 计算涨跌停数量
             up_limit = len(stock_data[stock_data['涨跌幅'] >= 9.9])
@@ -369,7 +368,8 @@ class MarketTrendAnalyzer:
             if stocks is not None and not stocks.empty:
                 return stocks['股票代码'].tolist()
             return []
-        except:
+        except Exception as e:
+            print(f"获取行业 {industry_name} 成分股失败: {e}")
             return []
             
     def _analyze_stock(self, stock_code):
@@ -395,38 +395,18 @@ class MarketTrendAnalyzer:
             '成交量': 'volume'
         })
         
-        # 计算技术指标
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        
-        # 计算MACD
-        exp1 = df['close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        
-        # 计算RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        # 计算技术指标（均线、MACD、RSI）
+        columns = ['MA5', 'MA10', 'MA20', 'MACD', 'SIGNAL', 'RSI']
+        columns += [col for col in rule_columns(SIGNAL_RULES['qualify'])
+                    if col not in columns and is_indicator_name(col)]
+        df = df.join(series_indicators(df, symbol=stock_code, columns=columns))
         
         return df.iloc[-1]
         
     def _is_stock_qualified(self, analysis):
-        """判断股票是否符合选股条件"""
-        # 价格趋势
-        price_trend = analysis['close'] > analysis['MA5'] > analysis['MA10'] > analysis['MA20']
-        
-        # MACD金叉
-        macd_cross = analysis['MACD'] > analysis['Signal']
-        
-        # RSI不过高
-        rsi_good = 30 < analysis['RSI'] < 70
-        
-        return price_trend and macd_cross and rsi_good
+        """判断股票是否符合选股条件（规则见 SIGNAL_RULES['qualify']，默认为
+        均线多头排列、MACD金叉且RSI处于30-70）"""
+        return compile_rule(SIGNAL_RULES['qualify'])(analysis)
         
     def _generate_selection_reason(self, analysis):
         """生成选股理由"""
@@ -437,7 +417,7 @@ class MarketTrendAnalyzer:
             reasons.append("多头排列，趋势向上")
         
         # MACD分析
-        if analysis['MACD'] > analysis['Signal']:
+        if analysis['MACD'] > analysis['SIGNAL']:
             reasons.append("MACD金叉形成")
         
         # RSI分析
@@ -3,14 +3,22 @@ import signal
 import sys
 import time
 from apscheduler.schedulers.background import BackgroundScheduler
-from data_fetcher import fetch_stock_data, fetch_fundamental_data
+from data_fetcher import fetch_stock_data, fetch_fundamental_data, invalidate_market_snapshot
 from strategy import EnhancedQuantStrategy
+from ak_cache import format_cache_stats
+from indicators import format_indicator_cache_stats
 from market_trend_analyzer import MarketTrendAnalyzer
+from panel import StockPanel
+from streaming import IndicatorStateStore
 import pandas as pd
 
 # 全局调度器
 scheduler = None
 market_analyzer = MarketTrendAnalyzer()
+# 增量技术指标状态，跨轮次和跨进程保留
+indicator_states = IndicatorStateStore()
+# 监控报告中列出的技术指标（来自增量状态）
+REPORT_INDICATORS = ['MA20', 'MACD', 'SIGNAL', 'RSI']
 
 def handle_shutdown(signum, frame):
     """处理退出信号"""
@@ -81,6 +89,9 @@ def job():
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
+        # 每轮监控只获取一次全市场行情快照
+        invalidate_market_snapshot()
+        
         # 分析市场趋势
         analyze_market_trend()
         
@@ -93,22 +104,31 @@ def job():
             
         # 获取基本面数据
         print("\n正在获取基本面数据...")
+        panel = StockPanel(data, presorted=True)
         fund_data = fetch_fundamental_data(date_str)
         if not fund_data.empty:
-            data = pd.merge(data, fund_data, on='股票代码', how='left')
+            panel.attach(fund_data)
         
         # 执行策略分析
         strategy = EnhancedQuantStrategy()
-        data = strategy.calculate_advanced_factors(data)
-        signals = strategy.generate_enhanced_signals(data)
+        strategy.calculate_advanced_factors(panel)
+        signals = strategy.generate_enhanced_signals(panel.frame)
+        
+        # 增量更新技术指标：只写入新完成的K线，当日未收盘的K线只计算不写入
+        latest = indicator_states.refresh(panel, pd.Timestamp(date_str))
+        indicator_states.save()
         
         if signals.empty:
             print("没有发现符合条件的股票")
             return
             
-        # 输出结果
+        # 输出结果，附上增量状态给出的盘中技术指标
         print("\n【策略选股结果】")
-        result_df = signals[['股票代码', '股票名称', '收盘价', '涨跌幅', '换手率', 'Composite_Score']].sort_values('Composite_Score', ascending=False)
+        columns = ['股票代码', '股票名称', '收盘价', '涨跌幅', '换手率', 'Composite_Score']
+        if not latest.empty:
+            signals = signals.merge(latest[['股票代码'] + REPORT_INDICATORS], on='股票代码', how='left')
+            columns += REPORT_INDICATORS
+        result_df = signals[columns].sort_values('Composite_Score', ascending=False)
         print(result_df.head(3).to_string(index=False))
         
         # 保存结果
@@ -118,6 +138,9 @@ def job():
         
     except Exception as e:
         print(f"监控任务执行出错: {e}")
+    finally:
+        print(format_cache_stats())
+        print(format_indicator_cache_stats())
 
 def main():
     global scheduler
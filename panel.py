@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+class StockPanel:
+    """按 (股票代码, 交易日期) 排序的面板数据
+
+    数据只在创建时排序一次，之后记录每只股票的连续行区间和每个交易日的行位置：
+    时间序列切片是连续区间，横截面切片按位置取行，新列可以按交易日就地写入，
+    策略直接使用 frame 时无需再次排序。
+    """
+
+    def __init__(self, data, presorted=False):
+        if not presorted:
+            data = data.sort_values(['股票代码', '交易日期'], kind='stable')
+        self.frame = data.reset_index(drop=True)
+        self._build_index()
+
+    def _build_index(self):
+        n = len(self.frame)
+        keys, codes = pd.factorize(self.frame['股票代码'])
+        dates = self.frame['交易日期'].to_numpy()
+
+        # 每只股票的行区间 [start, end)
+        change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        starts = np.concatenate([[0], change]) if n else np.array([], dtype=int)
+        ends = np.concatenate([change, [n]]) if n else np.array([], dtype=int)
+        self._code_slices = {str(codes[key]): (int(start), int(end))
+                             for key, start, end in zip(keys[starts], starts, ends)}
+
+        # 每个交易日的行位置（按股票代码顺序）
+        order = np.argsort(dates, kind='stable')
+        unique_dates, first = np.unique(dates[order], return_index=True)
+        bounds = np.append(first, n)
+        self._date_positions = {pd.Timestamp(date): order[bounds[i]:bounds[i + 1]]
+                                for i, date in enumerate(unique_dates)}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def codes(self):
+        """面板中的股票代码（已排序）"""
+        return list(self._code_slices)
+
+    @property
+    def dates(self):
+        """面板中的交易日期（已排序）"""
+        return sorted(self._date_positions)
+
+    def code_range(self, code):
+        """某只股票在 frame 中的行区间 (start, end)，不存在时为 (0, 0)"""
+        return self._code_slices.get(code, (0, 0))
+
+    def positions(self, date):
+        """某交易日在 frame 中的行位置，不存在时返回空数组"""
+        return self._date_positions.get(pd.Timestamp(date), np.array([], dtype=int))
+
+    def cross_section(self, date):
+        """某交易日全部股票的数据"""
+        return self.frame.iloc[self.positions(date)]
+
+    def history(self, code, start_date=None, end_date=None):
+        """某只股票在区间内的数据（按交易日期排序）"""
+        start, end = self.code_range(code)
+        if start_date is not None or end_date is not None:
+            dates = self.frame['交易日期'].to_numpy()[start:end]
+            if start_date is not None:
+                start += int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), 'left'))
+            if end_date is not None:
+                end = (end - len(dates)) + int(np.searchsorted(
+                    dates, np.datetime64(pd.Timestamp(end_date)), 'right'))
+        return self.frame.iloc[start:max(start, end)]
+
+    def attach(self, data, date=None, on='股票代码'):
+        """按股票代码将 data 的其余列就地写入面板
+
+        date 不为空时只写入该交易日的行（例如将基本面数据并入目标日），
+        否则写入该股票的所有行；没有匹配的行保持为空值
+        """
+        rows = self.positions(date) if date is not None else np.arange(len(self.frame))
+        keys = self.frame[on].iloc[rows].astype(str)
+        lookup = data.drop_duplicates(on, keep='last').copy()
+        lookup.index = lookup.pop(on).astype(str)
+        for col in lookup.columns:
+            values = keys.map(lookup[col]).to_numpy()
+            if col not in self.frame.columns:
+                dtype = 'float64' if lookup[col].dtype.kind in 'iuf' else object
+                self.frame[col] = pd.Series(np.nan, index=self.frame.index, dtype=dtype)
+            self.frame.iloc[rows, self.frame.columns.get_loc(col)] = values
+        return self
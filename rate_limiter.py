@@ -0,0 +1,132 @@
+import fnmatch
+import random
+import threading
+import time
+from collections import deque
+from config import RATE_LIMIT_CONFIG
+
+# 接口名到数据源主机的映射，先匹配先生效
+ENDPOINT_HOSTS = [
+    ('*_em', 'eastmoney'),
+    ('stock_board_*', 'eastmoney'),
+    ('stock_zh_a_hist*', 'eastmoney'),
+    ('stock_sector_detail', 'sina'),
+    ('stock_zh_a_spot', 'sina'),
+    ('stock_zh_a_daily', 'sina'),
+    ('stock_zh_index_daily', 'sina'),
+    ('*_sina', 'sina'),
+    ('*_ths', 'ths'),
+    ('stock_margin_*', 'exchange'),
+]
+
+
+def host_for_endpoint(name):
+    """根据akshare接口名判断请求的数据源主机"""
+    for pattern, host in ENDPOINT_HOSTS:
+        if fnmatch.fnmatch(name, pattern):
+            return host
+    return 'default'
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """指数退避并加入随机抖动（full jitter），attempt从1开始"""
+    base = RATE_LIMIT_CONFIG['backoff_base'] if base is None else base
+    cap = RATE_LIMIT_CONFIG['backoff_cap'] if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class TokenBucket:
+    """令牌桶：每秒补充rate个令牌，最多积累capacity个"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，不足时等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """熔断器：最近window次请求的错误率达到阈值后暂停请求cooldown秒"""
+
+    def __init__(self, host, window, error_rate, cooldown, min_calls=10):
+        self.host = host
+        self.results = deque(maxlen=window)
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait_until_closed(self):
+        """熔断期间阻塞，冷却结束后进入半开状态放行请求"""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, success):
+        with self.lock:
+            self.results.append(success)
+            if success:
+                return
+            failures = self.results.count(False)
+            if (len(self.results) >= self.min_calls
+                    and failures / len(self.results) >= self.error_rate
+                    and time.monotonic() >= self.open_until):
+                self.open_until = time.monotonic() + self.cooldown
+                self.results.clear()
+                print(f"数据源 {self.host} 错误率过高，暂停请求 {self.cooldown} 秒")
+
+
+class RateLimiter:
+    """按数据源主机限流和熔断的中央调度器"""
+
+    def __init__(self, config=None):
+        self.config = config or RATE_LIMIT_CONFIG
+        self.buckets = {}
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def _get(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                hosts = self.config['hosts']
+                limits = hosts.get(host) or hosts['default']
+                self.buckets[host] = TokenBucket(limits['rate'], limits['burst'])
+                circuit = self.config['circuit']
+                self.breakers[host] = CircuitBreaker(host, circuit['window'],
+                                                     circuit['error_rate'], circuit['cooldown'])
+            return self.buckets[host], self.breakers[host]
+
+    def call(self, host, func, *args, **kwargs):
+        """限流后执行请求，并记录成功/失败用于熔断判断"""
+        bucket, breaker = self._get(host)
+        breaker.wait_until_closed()
+        bucket.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        return result
+
+
+# 全局限流器，所有出站数据请求共享
+limiter = RateLimiter()
@@ -0,0 +1,194 @@
+"""信号规则表达式
+
+规则以类 Python 的表达式书写，例如::
+
+    MACD > SIGNAL and RSI < 70 and 涨跌幅 > -3
+    close > MA5 > MA10 > MA20 and 30 < RSI < 70
+    `市盈率-动态` > 0 and 所属行业 != '银行'
+
+支持 and/or/not、比较（可连写）、+ - * / 运算、abs/min/max 函数和数字、字符串常量；
+列名不是合法标识符时用反引号括起来。表达式只编译一次，之后在整个面板的
+列数组上一次性求值，得到每行的布尔结果（缺失值参与的比较结果为 False）。
+"""
+import ast
+import re
+from functools import lru_cache, reduce
+import numpy as np
+import pandas as pd
+
+_COMPARE = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal
+}
+
+_ARITHMETIC = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide
+}
+
+_FUNCTIONS = {
+    'abs': np.abs,
+    'min': np.fmin,
+    'max': np.fmax
+}
+
+
+class Rule:
+    """编译后的规则，调用时传入 DataFrame（返回布尔数组）或单行 Series/字典（返回 bool）"""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.columns = []
+        quoted = {}
+
+        def quote(match):
+            name = f"__col{len(quoted)}"
+            quoted[name] = match.group(1)
+            return name
+
+        source = re.sub(r'`([^`]+)`', quote, expression.strip())
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"规则语法错误: {expression}（{e.msg}）")
+        self._quoted = quoted
+        self._evaluate = self._compile(tree.body)
+
+    def __repr__(self):
+        return f"Rule({self.expression!r})"
+
+    def __call__(self, data, env=None):
+        """env 为列数组缓存，多条规则在同一数据上求值时可共享"""
+        env = {} if env is None else env
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.asarray(self._evaluate(data, env), dtype=bool)
+        if isinstance(data, pd.DataFrame):
+            return np.broadcast_to(result, (len(data),)).copy()
+        return bool(result)
+
+    def _compile(self, node):
+        if isinstance(node, ast.BoolOp):
+            parts = [self._compile(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            # 逐对合并，列数组和常量（如 `x > 0 and True`）可以按广播规则混合
+            return lambda data, env: reduce(combine, [part(data, env) for part in parts])
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda data, env: np.logical_not(operand(data, env))
+            if isinstance(node.op, ast.USub):
+                return lambda data, env: np.negative(operand(data, env))
+            if isinstance(node.op, ast.UAdd):
+                return operand
+
+        if isinstance(node, ast.Compare):
+            # a < b < c 等价于 a < b and b < c，b 只求值一次
+            operands = [self._compile(node.left)] + [self._compile(c) for c in node.comparators]
+            ops = [self._operator(_COMPARE, op) for op in node.ops]
+
+            def compare(data, env):
+                values = [operand(data, env) for operand in operands]
+                return reduce(np.logical_and, [op(values[i], values[i + 1])
+                                               for i, op in enumerate(ops)])
+            return compare
+
+        if isinstance(node, ast.BinOp):
+            left, right = self._compile(node.left), self._compile(node.right)
+            op = self._operator(_ARITHMETIC, node.op)
+            return lambda data, env: op(left(data, env), right(data, env))
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _FUNCTIONS and not node.keywords:
+            func = _FUNCTIONS[node.func.id]
+            args = [self._compile(arg) for arg in node.args]
+            if func is np.abs:
+                if len(args) != 1:
+                    raise ValueError(f"abs 需要1个参数: {self.expression}")
+                return lambda data, env: func(args[0](data, env))
+            if len(args) < 2:
+                raise ValueError(f"{node.func.id} 至少需要2个参数: {self.expression}")
+            return lambda data, env: reduce(func, [arg(data, env) for arg in args])
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+            value = node.value
+            return lambda data, env: value
+
+        if isinstance(node, ast.Name):
+            column = self._quoted.get(node.id, node.id)
+            if column not in self.columns:
+                self.columns.append(column)
+            return lambda data, env: _column(data, column, env)
+
+        raise ValueError(f"不支持的规则语法 {ast.dump(node)[:40]}: {self.expression}")
+
+    def _operator(self, table, op):
+        if type(op) not in table:
+            raise ValueError(f"不支持的运算符 {type(op).__name__}: {self.expression}")
+        return table[type(op)]
+
+
+def _column(data, column, env):
+    """读取列的值（数值列转为 float64，缺失值为NaN），同一数据的列只转换一次"""
+    if column in env:
+        return env[column]
+    try:
+        values = data[column]
+    except KeyError:
+        raise KeyError(f"规则引用了不存在的列: {column}")
+    if isinstance(values, pd.Series):
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = values.to_numpy(dtype=object)
+    elif values is None or values is pd.NA:
+        values = np.nan
+    env[column] = values
+    return values
+
+
+@lru_cache(maxsize=256)
+def compile_rule(expression):
+    """编译规则表达式（相同表达式只编译一次）"""
+    return Rule(expression)
+
+
+def evaluate_rules(data, rules):
+    """在同一份数据上求值多条规则 {名称: 表达式}，返回以规则名为列的布尔 DataFrame
+
+    各规则共享列数组缓存，每列只转换一次
+    """
+    env = {}
+    return pd.DataFrame({name: compile_rule(expression)(data, env)
+                         for name, expression in rules.items()}, index=data.index)
+
+
+def score_rules(data, scoring):
+    """按评分规则 [{'rule': 表达式, 'score': 分值, 'reason': 说明}, ...] 计算每行得分
+
+    返回 (得分数组, 命中掩码的布尔 DataFrame，列为各规则的说明)
+    """
+    env = {}
+    masks = {}
+    scores = np.zeros(len(data), dtype=np.result_type(0, *[item['score'] for item in scoring]))
+    for item in scoring:
+        mask = compile_rule(item['rule'])(data, env)
+        masks[item['reason']] = mask
+        scores += item['score'] * mask
+    return scores, pd.DataFrame(masks, index=data.index)
+
+
+def rule_columns(*expressions):
+    """规则引用的全部列名（按出现顺序）"""
+    columns = []
+    for expression in expressions:
+        for column in compile_rule(expression).columns:
+            if column not in columns:
+                columns.append(column)
+    return columns
@@ -0,0 +1,213 @@
+"""A股交易规则模拟
+
+按交易日推进的事件驱动回测，在 VectorBacktester 的基础上加入A股的成交约束：
+
+- T+1：当日买入的股票当日不能卖出（止损、止盈从下一个交易日开始检查）；
+- 开盘即涨停（一字板）时买不进，买入委托作废；
+- 开盘即跌停时卖不出，卖出委托顺延到下一个交易日开盘；全天封死跌停
+  （最高价也在跌停价）时盘中止损、止盈无法成交，同样顺延；
+- 停牌（无行情或成交量为0）的交易日不能买卖，持仓收益按0计，卖出委托顺延；
+- 涨跌停幅度按板块区分：主板10%，创业板（300/301）和科创板（688/689）20%，
+  北交所30%；上市首日没有前收盘价，不受涨跌停限制。
+
+涨跌停判断用前收盘价计算涨跌幅后与限制幅度比较（日线为前复权价格，无法按
+“前收盘价×(1±幅度) 四舍五入到分”精确还原涨跌停价），tolerance 为允许的误差。
+所有涨跌停、停牌掩码在进入逐日循环前按矩阵一次算好，每个交易日只对全市场的
+股票做一次数组运算，不逐笔委托检查。
+"""
+import numpy as np
+import pandas as pd
+from backtest import (VectorBacktester, EXIT_REASONS, STOP_LOSS, TAKE_PROFIT,
+                      SELL_SIGNAL, END_OF_DATA, summarize)
+
+# 代码前缀 -> 涨跌停幅度（其余为主板10%）
+PRICE_LIMITS = {
+    ('300', '301', '688', '689'): 0.2,
+    ('4', '8', '92'): 0.3
+}
+MAIN_BOARD_LIMIT = 0.1
+
+
+def price_limits(codes):
+    """每只股票的涨跌停幅度"""
+    codes = pd.Series(codes).astype(str)
+    limits = np.full(len(codes), MAIN_BOARD_LIMIT)
+    for prefixes, limit in PRICE_LIMITS.items():
+        limits[codes.str.startswith(prefixes).to_numpy()] = limit
+    return limits
+
+
+class AShareSimulator(VectorBacktester):
+    def __init__(self, config=None, take_profit=None, stop_loss=None,
+                 commission=None, stamp_tax=None, tolerance=0.002):
+        super().__init__(config, take_profit, stop_loss, commission, stamp_tax)
+        self.tolerance = tolerance
+
+    def run(self, prices, signals=None):
+        """运行模拟
+
+        prices 为日线（DataFrame 或 StockPanel），signals 为 BasicStrategy.generate_signals
+        输出的信号表（只含有信号的行，需要股票代码、交易日期、buy_signal、sell_signal 列），
+        也可以是 BasicStrategy.analyze 的完整结果。返回格式与 VectorBacktester.run 相同，
+        summary 中额外给出各类约束阻止成交的次数。
+        """
+        grid = self._load(prices, signals)
+        masks = self._limit_masks(grid)
+        trades, daily, blocked = self._simulate(grid, masks)
+
+        trade_frame = pd.DataFrame({
+            '股票代码': grid.codes[trades['row']],
+            '买入日期': grid.dates[trades['entry']],
+            '买入价': trades['entry_price'],
+            '卖出日期': grid.dates[trades['exit']],
+            '卖出价': trades['exit_price'],
+            '收益率': trades['return'],
+            '持有天数': trades['exit'] - trades['entry'] + 1,
+            '退出原因': np.asarray(EXIT_REASONS, dtype=object)[trades['reason']]
+        })
+        summary = summarize(daily, trade_frame)
+        summary.update(blocked)
+        return {'daily': daily, 'trades': trade_frame, 'summary': summary}
+
+    def _limit_masks(self, grid):
+        """预先计算 交易日×股票 的涨跌停掩码（转置为按交易日连续存放，便于逐日取行）"""
+        limit = price_limits(grid.codes)[:, None] - self.tolerance
+        previous = np.full_like(self.last_close, np.nan)
+        previous[:, 1:] = self.last_close[:, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            open_change = self.open / previous - 1
+            high_change = self.high / previous - 1
+        return {
+            'tradable': self.valid.T.copy(),
+            'limit_up_open': (open_change >= limit).T.copy(),      # 开盘涨停，买不进
+            'limit_down_open': (open_change <= -limit).T.copy(),   # 开盘跌停，开盘卖不出
+            'limit_down_day': (high_change <= -limit).T.copy(),    # 全天跌停，盘中卖不出
+            'previous': previous.T.copy()
+        }
+
+    def _simulate(self, grid, masks):
+        n_stocks, n_days = grid.shape
+        open_, high, low, close = (m.T.copy() for m in (self.open, self.high, self.low, self.close))
+        buy, sell = self.buy.T, self.sell.T
+        tradable = masks['tradable']
+        previous = masks['previous']
+        sell_cost = self.commission + self.stamp_tax
+
+        holding = np.zeros(n_stocks, dtype=bool)
+        entry_day = np.zeros(n_stocks, dtype=np.int64)
+        entry_price = np.zeros(n_stocks)
+        want_buy = np.zeros(n_stocks, dtype=bool)
+        want_sell = np.zeros(n_stocks, dtype=bool)
+        sell_reason = np.full(n_stocks, SELL_SIGNAL)
+
+        positions = np.zeros(n_days, dtype=np.int64)
+        daily_return = np.zeros(n_days)
+        turnover = np.zeros(n_days)
+        blocked = {'涨停未能买入': 0, '跌停未能卖出': 0, 'T+1未能卖出': 0, '停牌顺延卖出': 0}
+        exits = []
+
+        for t in range(n_days):
+            can_trade = tradable[t]
+            returns = np.where(holding & can_trade, close[t] / previous[t] - 1, 0.0)
+            held_today = holding.copy()
+
+            # 开盘：执行前一交易日收盘后产生（或顺延下来）的卖出委托
+            pending = holding & want_sell
+            sold_open = pending & can_trade & ~masks['limit_down_open'][t]
+            blocked['跌停未能卖出'] += int(np.count_nonzero(pending & can_trade & ~sold_open))
+            blocked['停牌顺延卖出'] += int(np.count_nonzero(pending & ~can_trade))
+            returns[sold_open] = open_[t, sold_open] / previous[t, sold_open] - 1 - sell_cost
+            exits.append(self._close_positions(sold_open, t, open_[t], sell_reason,
+                                               entry_day, entry_price))
+            holding &= ~sold_open
+            want_sell &= holding
+
+            # 开盘：执行买入委托，开盘涨停或停牌时委托作废
+            orders = want_buy & ~holding
+            bought = orders & can_trade & ~masks['limit_up_open'][t]
+            blocked['涨停未能买入'] += int(np.count_nonzero(orders & can_trade & ~bought))
+            holding |= bought
+            entry_day[bought] = t
+            entry_price[bought] = open_[t, bought]
+            returns[bought] = close[t, bought] / open_[t, bought] - 1 - self.commission
+            want_buy[:] = False
+
+            # 盘中：止损、止盈（T+1：当日买入的不检查），全天跌停时顺延到下一交易日开盘卖出
+            checked = holding & can_trade & ~want_sell
+            stop_level = entry_price * self.stop_loss
+            take_level = entry_price * self.take_profit
+            hit_stop = checked & (low[t] <= stop_level)
+            hit_take = checked & (high[t] >= take_level) & ~hit_stop
+            hit = hit_stop | hit_take
+            blocked['T+1未能卖出'] += int(np.count_nonzero(hit & bought))
+            hit &= ~bought
+            locked = hit & masks['limit_down_day'][t]
+            blocked['跌停未能卖出'] += int(np.count_nonzero(locked))
+            filled = hit & ~locked
+            fill_price = np.where(hit_stop, np.minimum(open_[t], stop_level),
+                                  np.maximum(open_[t], take_level))
+            reason = np.where(hit_stop, STOP_LOSS, TAKE_PROFIT)
+            returns[filled] = fill_price[filled] / previous[t, filled] - 1 - sell_cost
+            sell_reason[hit] = reason[hit]
+            exits.append(self._close_positions(filled, t, fill_price, sell_reason,
+                                               entry_day, entry_price))
+            holding &= ~filled
+            want_sell |= locked
+
+            # 收盘：根据当日信号生成下一交易日的委托
+            signal_sell = holding & sell[t] & ~want_sell
+            sell_reason[signal_sell] = SELL_SIGNAL
+            want_sell |= signal_sell
+            want_buy = buy[t] & ~holding
+
+            day_positions = held_today | bought
+            count = np.count_nonzero(day_positions)
+            positions[t] = count
+            if count:
+                daily_return[t] = returns[day_positions].mean()
+                turnover[t] = (np.count_nonzero(bought) + np.count_nonzero(sold_open | filled)) / (2 * count)
+
+        # 期末仍持有的按最后收盘价平仓（扣除卖出费用）
+        if holding.any():
+            last_close = self.last_close[:, -1]
+            last_day = n_days - 1 - np.argmax(self.valid[:, ::-1], axis=1)
+            sell_reason[holding] = END_OF_DATA
+            exits.append(self._close_positions(holding, last_day, last_close, sell_reason,
+                                               entry_day, entry_price))
+            daily_return[-1] -= sell_cost * np.count_nonzero(holding) / max(positions[-1], 1)
+
+        keys = ['row', 'entry', 'entry_price', 'exit', 'exit_price', 'reason']
+        trades = {key: np.concatenate([part[key] for part in exits]) if exits
+                  else np.zeros(0) for key in keys}
+        for key in ('row', 'entry', 'exit', 'reason'):
+            trades[key] = trades[key].astype(np.int64)
+        trades['return'] = trades['exit_price'] / trades['entry_price'] - 1 \
+            - 2 * self.commission - self.stamp_tax
+
+        equity = np.cumprod(1 + daily_return)
+        daily = pd.DataFrame({
+            '交易日期': grid.dates,
+            '持仓数': positions,
+            '日收益率': daily_return,
+            '换手率': turnover,
+            '净值': equity,
+            '回撤': equity / np.maximum.accumulate(equity) - 1
+        })
+        return trades, daily, blocked
+
+    @staticmethod
+    def _close_positions(mask, day, price, reason, entry_day, entry_price):
+        rows = np.flatnonzero(mask)
+        return {
+            'row': rows,
+            'entry': entry_day[rows],
+            'entry_price': entry_price[rows],
+            'exit': np.broadcast_to(day, mask.shape)[rows],
+            'exit_price': price[rows],
+            'reason': reason[rows]
+        }
+
+
+def run_simulation(prices, signals=None, config=None):
+    """用默认参数运行A股规则模拟，参数含义见 AShareSimulator.run"""
+    return AShareSimulator(config).run(prices, signals)
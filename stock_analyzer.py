@@ -1,9 +1,66 @@
 # stock_analyzer.py
-import akshare as ak
+from ak_cache import ak
+import numpy as np
 import pandas as pd
-import talib
 import time
 from functools import lru_cache
+from data_fetcher import get_spot_quote
+from config import SIGNAL_RULES
+from indicators import series_indicators, is_indicator_name
+from rules import score_rules, rule_columns
+
+try:
+    import talib
+    HAS_TALIB = True
+except ImportError:
+    HAS_TALIB = False
+
+# 布林带周期；沿用 talib.BBANDS 的总体标准差（ddof=0）
+BOLLINGER_WINDOW = 5
+
+
+def _with_indicators(hist_data, columns):
+    """在原始日线（stock_zh_a_daily）上补齐 columns 中缺少的技术指标列，返回新的 DataFrame
+
+    指标名与信号规则相同（如 MA20、RSI、BB_upper 为20日布林带），非指标列（如 close）忽略
+    """
+    missing = [col for col in columns if col not in hist_data.columns and is_indicator_name(col)]
+    if not missing:
+        return hist_data
+    return hist_data.join(series_indicators(hist_data, columns=missing))
+
+def _stochastic(high, low, close, window=5, smooth=3):
+    """慢速随机指标 (K, D)，参数与 talib.STOCH 默认值相同"""
+    if HAS_TALIB:
+        return talib.STOCH(high, low, close)
+    lowest, highest = low.rolling(window).min(), high.rolling(window).max()
+    fast_k = (close - lowest) / (highest - lowest) * 100
+    slow_k = fast_k.rolling(smooth).mean()
+    return slow_k, slow_k.rolling(smooth).mean()
+
+
+def _obv(close, volume):
+    """能量潮，与 talib.OBV 一致（首日为当日成交量）"""
+    if HAS_TALIB:
+        return talib.OBV(close, volume)
+    direction = np.sign(close.diff()).fillna(1.0)
+    return (direction * volume.astype(float)).cumsum()
+
+
+def _atr(high, low, close, period=14):
+    """平均真实波幅，与 talib.ATR 一致（以前 period 个真实波幅的均值为初值，之后 Wilder 平滑）"""
+    if HAS_TALIB:
+        return talib.ATR(high, low, close, timeperiod=period)
+    previous = close.shift(1)
+    true_range = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()],
+                           axis=1).max(axis=1, skipna=False).to_numpy()
+    result = np.full(len(close), np.nan)
+    if len(close) > period:
+        result[period] = true_range[1:period + 1].mean()
+        for i in range(period + 1, len(close)):
+            result[i] = (result[i - 1] * (period - 1) + true_range[i]) / period
+    return pd.Series(result, index=close.index)
+
 
 class StockAnalyzer:
     def __init__(self):
@@ -22,8 +79,7 @@ class StockAnalyzer:
                 
                 # 实时数据（备用接口）
                 try:
-                    spot_data = ak.stock_zh_a_spot_em()
-                    spot = spot_data[spot_data['代码'] == symbol].iloc[0].to_dict()
+                    spot = get_spot_quote(symbol).to_dict()
                 except:
                     spot = ak.stock_zh_a_spot(symbol=symbol).iloc[0].to_dict()
                 
@@ -58,23 +114,19 @@ class StockAnalyzer:
 
     def analyze_technical(self, hist_data):
         """增强技术分析"""
-        df = hist_data.copy()
-        # 趋势指标
-        df['MA5'] = df['close'].rolling(5).mean()
-        df['MA20'] = df['close'].rolling(20).mean()
-        df['EMA12'] = talib.EMA(df['close'], timeperiod=12)
-        df['EMA26'] = talib.EMA(df['close'], timeperiod=26)
-        
-        # 动量指标
-        df['MACD'], df['MACD_Signal'], _ = talib.MACD(df['close'])
-        df['RSI'] = talib.RSI(df['close'])
-        df['STOCH_K'], df['STOCH_D'] = talib.STOCH(df['high'], df['low'], df['close'])
-        
-        # 波动率指标
-        df['BB_upper'], df['BB_middle'], df['BB_lower'] = talib.BBANDS(df['close'])
+        # 趋势、动量和波动率指标（均线、EMA、MACD、RSI、5日布林带）
+        indicators = series_indicators(hist_data, ma_windows=(5, 20), ema_spans=(12, 26),
+                                       bollinger_window=BOLLINGER_WINDOW)
+        # 指标图的标准差为样本标准差（ddof=1），换算为总体标准差，与原 talib.BBANDS 一致
+        offset = (indicators['BB_upper'] - indicators['BB_middle']) \
+            * np.sqrt((BOLLINGER_WINDOW - 1) / BOLLINGER_WINDOW)
+        indicators['BB_upper'] = indicators['BB_middle'] + offset
+        indicators['BB_lower'] = indicators['BB_middle'] - offset
+        df = hist_data.join(indicators.rename(columns={'SIGNAL': 'MACD_Signal'}))
+        df['STOCH_K'], df['STOCH_D'] = _stochastic(df['high'], df['low'], df['close'])
         
         # 成交量分析
-        df['OBV'] = talib.OBV(df['close'], df['vol'])
+        df['OBV'] = _obv(df['close'], df['vol'])
         
         latest = df.iloc[-1]
         return {
@@ -86,7 +138,7 @@ class StockAnalyzer:
             },
             'volatility': {
                 'bollinger_band': (latest['BB_upper'], latest['BB_middle'], latest['BB_lower']),
-                'atr': talib.ATR(df['high'], df['low'], df['close']).iloc[-1]
+                'atr': _atr(df['high'], df['low'], df['close']).iloc[-1]
             },
             'volume_analysis': {
                 'obv_trend': '上升' if df['OBV'].iloc[-1] > df['OBV'].iloc[-5] else '下降',
@@ -147,36 +199,15 @@ class StockAnalyzer:
         }
 
     def _evaluate_technical(self, hist_data):
-        """技术面量化评分"""
-        score = 0
-        factors = []
-        
-        # 趋势评分（0-15分）
-        if self._get_trend_status(hist_data).startswith('上涨'):
-            score += 10
-            factors.append('处于上升趋势')
-            if '金叉' in self._get_trend_status(hist_data):
-                score += 5
-                factors.append('EMA金叉形成')
-        
-        # 动量评分（0-15分）
-        rsi = hist_data['RSI'].iloc[-1]
-        if 30 < rsi < 70:
-            score += 5
-            factors.append('RSI处于合理区间')
-        elif rsi > 70:
-            score -= 5
-            factors.append('RSI超买')
-        
-        # 波动率评分（0-10分）
-        if hist_data['close'].iloc[-1] > hist_data['BB_upper'].iloc[-1]:
-            score -= 3
-            factors.append('突破布林带上轨')
-        elif hist_data['close'].iloc[-1] < hist_data['BB_lower'].iloc[-1]:
-            score += 5
-            factors.append('触及布林带下轨')
-        
-        return min(max(score, 0), 40), factors
+        """技术面量化评分（评分规则见 SIGNAL_RULES['technical_score']）
+
+        hist_data 为原始日线，规则引用的指标先在完整序列上计算，再对最后一根K线评分
+        """
+        scoring = SIGNAL_RULES['technical_score']
+        hist_data = _with_indicators(hist_data, rule_columns(*[item['rule'] for item in scoring]))
+        scores, hits = score_rules(hist_data.iloc[[-1]], scoring)
+        factors = [reason for reason in hits.columns if hits[reason].iloc[0]]
+        return min(max(scores[0], 0), 40), factors
 
     def _get_recommendation(self, score):
         """根据总分生成建议"""
@@ -192,7 +223,8 @@ class StockAnalyzer:
     def _get_risk_warning(self, stock_data):
         """风险提示"""
         warnings = []
-        if stock_data['historical']['close'].iloc[-1] < stock_data['historical']['MA20'].iloc[-1]:
+        historical = _with_indicators(stock_data['historical'], ['MA20'])
+        if historical['close'].iloc[-1] < historical['MA20'].iloc[-1]:
             warnings.append('股价处于年线下方')
         if stock_data['financial'].get('资产负债率', 0) > 60:
             warnings.append('资产负债率偏高')
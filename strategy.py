@@ -1,62 +1,85 @@
+import queue
+import threading
 import pandas as pd
 import numpy as np
-from config import STRATEGY_CONFIG
-from data_fetcher import fetch_fundamental_data
+from config import STRATEGY_CONFIG, FACTOR_CONFIG, SIGNAL_RULES
+from data_fetcher import (fetch_fundamental_data, fetch_missing_bars, _append_fetched_bars,
+                          last_closed_trade_date)
 from datetime import datetime, timedelta
-import akshare as ak
+from ak_cache import ak
+from bar_store import DailyBarStore
+from fetch_engine import FetchEngine
+from panel import StockPanel
+from indicators import (calculate_basic_indicators, series_indicators, panel_indicators,
+                        is_indicator_name)
+from rules import compile_rule, rule_columns
+from factors import calculate_factors
+from universe import bar_predicates, evaluate
+
+# 买入理由查找表：下标按位编码 (换手率>3, 涨跌幅>0, MACD>SIGNAL) 三个条件
+BUY_REASON_PARTS = ('换手活跃', '势头向上', 'MACD金叉')
+BUY_REASONS = np.array([
+    '、'.join(part for bit, part in enumerate(BUY_REASON_PARTS) if code >> bit & 1) or '技术面改善'
+    for code in range(1 << len(BUY_REASON_PARTS))
+], dtype=object)
+
+
+def build_reasons(signals):
+    """按条件掩码和查找表生成建议理由，结果与逐行判断相同
+
+    买入行按三个条件的组合查表；卖出行依次判断 跌幅过大、RSI超买，否则为 技术面转弱
+    """
+    def values(col):
+        return signals[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    change, rsi = values('涨跌幅'), values('RSI')
+    code = ((values('换手率') > 3).astype(np.int64)
+            | (change > 0).astype(np.int64) << 1
+            | (values('MACD') > values('SIGNAL')).astype(np.int64) << 2)
+    sell_reasons = np.select([change < -5, rsi > 80],
+                             np.array(['跌幅过大', 'RSI超买'], dtype=object), '技术面转弱')
+    buy = signals['buy_signal'].to_numpy() == 1
+    return pd.Series(np.where(buy, BUY_REASONS[code], sell_reasons), index=signals.index,
+                     dtype=object)
+
 
 class BasicStrategy:
-    def __init__(self):
+    def __init__(self, rules=None):
         self.config = STRATEGY_CONFIG
+        rules = rules or SIGNAL_RULES
+        self.buy_rule = compile_rule(rules['buy'])
+        self.sell_rule = compile_rule(rules['sell'])
 
     def calculate_technical_indicators(self, df):
-        """计算技术指标"""
-        # 计算5日、10日、20日均线
-        df['MA5'] = df['收盘价'].rolling(window=5).mean()
-        df['MA10'] = df['收盘价'].rolling(window=10).mean()
-        df['MA20'] = df['收盘价'].rolling(window=20).mean()
-        
-        # 计算MACD
-        exp12 = df['收盘价'].ewm(span=12, adjust=False).mean()
-        exp26 = df['收盘价'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp12 - exp26
-        df['SIGNAL'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        
-        # 计算RSI
-        delta = df['收盘价'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        return df
+        """计算技术指标（MA5/MA10/MA20、MACD、RSI），按股票分别计算"""
+        return calculate_basic_indicators(df)
 
     def analyze(self, data):
+        """data 可以是 StockPanel 或已按股票代码、交易日期排序的 DataFrame"""
         if data is None:
             return pd.DataFrame()  # 返回空DataFrame如果数据获取失败
+        if isinstance(data, StockPanel):
+            data = data.frame
             
-        # 数据预处理
-        data = data[
-            (data['成交额'] >= self.config['min_turnover'])
-        ].copy()
-        
-        # 计算技术指标
-        data = self.calculate_technical_indicators(data)
+        # 先在完整的日线序列上计算技术指标，再按换手率和成交额过滤，避免过滤造成序列断档
+        data = self.calculate_technical_indicators(data.copy())
+        # 规则引用的其他指标（如 MA60、BB_upper）按需计算
+        extra = [col for col in rule_columns(self.buy_rule.expression, self.sell_rule.expression)
+                 if col not in data.columns and is_indicator_name(col)]
+        if extra:
+            for col, values in panel_indicators(data, columns=extra).items():
+                data[col] = values
+        if self.config['min_industry_rank']:
+            # 行业内排名（Industry_Rank）供 generate_signals 过滤买入信号
+            data = calculate_factors(data)
+        # min_turnover 作用于换手率（%），min_volume 作用于成交额（元），与股票池预筛选一致
+        data = data[evaluate(data, bar_predicates(self.config), keep_missing=False)].copy()
         
-        # 生成买入信号
-        data['buy_signal'] = np.where(
-            (data['MACD'] > data['SIGNAL']) &  # MACD金叉
-            (data['RSI'] < 70) &               # RSI未超买
-            (data['涨跌幅'] > -3) &            # 当日跌幅不大
-            (data['换手率'] > 1),              # 换手率大于1%
-            1, 0)
-        
-        # 生成卖出信号
-        data['sell_signal'] = np.where(
-            (data['MACD'] < data['SIGNAL']) |  # MACD死叉
-            (data['RSI'] > 80) |               # RSI超买
-            (data['涨跌幅'] < -5),             # 当日跌幅过大
-            1, 0)
+        # 按配置的规则生成买入/卖出信号（默认：MACD金叉、RSI未超买、当日跌幅不大且换手率大于1%时买入；
+        # MACD死叉、RSI超买或当日跌幅过大时卖出）
+        env = {}
+        data['buy_signal'] = self.buy_rule(data, env).astype(np.int64)
+        data['sell_signal'] = self.sell_rule(data, env).astype(np.int64)
         
         return data
 
@@ -68,11 +91,21 @@ class BasicStrategy:
         if '所属行业' not in analyzed_data.columns:
             analyzed_data['所属行业'] = '其他'
             
+        columns = ['股票代码', '股票名称', '收盘价', 'buy_signal', 'sell_signal', 
+                   '所属行业', '涨跌幅', '换手率', 'MACD', 'SIGNAL', 'RSI', '交易日期']
+        min_rank = self.config['min_industry_rank']
+        if min_rank and 'Industry_Rank' in analyzed_data.columns:
+            # 只保留行业内综合得分排名达到阈值的买入信号
+            analyzed_data = analyzed_data.assign(buy_signal=np.where(
+                analyzed_data['Industry_Rank'] >= min_rank, analyzed_data['buy_signal'], 0))
+            columns.append('Industry_Rank')
+            
+        # 日线存储中的历史数据没有股票名称等列，只输出存在的列
+        columns = [col for col in columns if col in analyzed_data.columns]
         signals = analyzed_data[
             (analyzed_data['buy_signal'] == 1) | 
             (analyzed_data['sell_signal'] == 1)
-        ][['股票代码', '股票名称', '收盘价', 'buy_signal', 'sell_signal', 
-           '所属行业', '涨跌幅', '换手率', 'MACD', 'SIGNAL', 'RSI']]
+        ][columns]
         
         signals['操作建议'] = np.where(
             signals['buy_signal'] == 1, '买入', '卖出')
@@ -83,35 +116,70 @@ class BasicStrategy:
         )
         
         # 添加建议理由
-        def get_reason(row):
-            if row['buy_signal'] == 1:
-                reasons = []
-                if row['换手率'] > 3:
-                    reasons.append('换手活跃')
-                if row['涨跌幅'] > 0:
-                    reasons.append('势头向上')
-                if row['MACD'] > row['SIGNAL']:
-                    reasons.append('MACD金叉')
-                return '、'.join(reasons) if reasons else '技术面改善'
-            else:
-                if row['涨跌幅'] < -5:
-                    return '跌幅过大'
-                if row['RSI'] > 80:
-                    return 'RSI超买'
-                return '技术面转弱'
-                
-        signals['建议理由'] = signals.apply(get_reason, axis=1)
+        signals['建议理由'] = build_reasons(signals)
         
         return signals
 
 class EnhancedQuantStrategy:
     def __init__(self):
         self.config = STRATEGY_CONFIG
+        self.factor_config = FACTOR_CONFIG
+        
+    def calculate_advanced_factors(self, data):
+        """计算全市场的多因子得分（动量、波动率、换手率、估值、成长）
+        
+        data 为 StockPanel 时因子列就地写入 panel.frame；也可以是按股票代码、
+        交易日期排序的 DataFrame（就地写入并返回）
+        """
+        frame = data.frame if isinstance(data, StockPanel) else data
+        calculate_factors(frame, self.factor_config)
+        return data
+        
+    def generate_enhanced_signals(self, data):
+        """按综合得分从最新交易日的横截面中选股
+        
+        data 可以是整个面板（只取最后一个交易日）或单日横截面，需已包含 Composite_Score
+        """
+        if data is None or data.empty:
+            return pd.DataFrame()
+        if 'Composite_Score' not in data.columns:
+            data = calculate_factors(data.copy(), self.factor_config)
+            
+        latest = data[data['交易日期'] == data['交易日期'].max()]
+        candidates = latest[
+            (latest['收盘价'] >= self.config['min_price']) &
+            (latest['收盘价'] <= self.config['max_price']) &
+            latest['Composite_Score'].notna()
+        ]
+        if '市盈率-动态' in candidates.columns:
+            pe = candidates['市盈率-动态']
+            candidates = candidates[pe.isna() | ((pe > 0) & (pe <= self.config['max_pe']))]
+            
+        signals = candidates.nlargest(self.factor_config['top_n'], 'Composite_Score').copy()
+        signals['操作建议'] = '买入'
+        signals['目标价格'] = signals['收盘价'] * self.config['take_profit']
+        return signals
+        
+    VALID_PREFIXES = ('600', '601', '602', '603', '605', '688', '000', '002', '300')
+    
+    # 分析报告用到的指标（布林带中轨与MA20为同一节点）
+    REPORT_INDICATORS = ['MA5', 'MA10', 'MA20', 'MA60', 'RSI', 'MACD', 'SIGNAL', 'MACD_HIST',
+                         'BB_upper', 'BB_middle', 'BB_lower']
+    
+    # 日线存储列名 -> 单只股票分析使用的列名
+    BAR_RENAME = {
+        '交易日期': 'date',
+        '开盘价': 'open',
+        '收盘价': 'close',
+        '最高价': 'high',
+        '最低价': 'low',
+        '成交量': 'volume'
+    }
         
     def analyze_stock(self, symbol):
         try:
             # 确保股票代码格式正确
-            if not symbol.startswith(('600', '601', '602', '603', '605', '688', '000', '002', '300')):
+            if not symbol.startswith(self.VALID_PREFIXES):
                 raise ValueError("无效的股票代码格式")
             
             # 获取更长时间范围的历史数据
@@ -140,7 +208,7 @@ class EnhancedQuantStrategy:
             df = df.sort_values('date')
             
             # 计算技术指标
-            analysis = self._calculate_indicators(df)
+            analysis = self._calculate_indicators(df, symbol)
             
             # 生成分析报告
             report = self._generate_analysis_report(analysis, symbol)
@@ -149,33 +217,86 @@ class EnhancedQuantStrategy:
         except Exception as e:
             raise Exception(f"增强策略分析失败: {str(e)}")
     
-    def _calculate_indicators(self, df):
-        """计算各种技术指标"""
-        # 计算移动平均线
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        df['MA60'] = df['close'].rolling(window=60).mean()
+    def analyze_stocks(self, symbols, store=None, batch_size=50):
+        """批量分析多只股票，按完成顺序逐只返回 (股票代码, 分析报告, 错误信息)
+        
+        使用日线存储中截至上一个已收盘交易日的180天数据：存储已是最新的股票直接读取，
+        其余股票并发补齐缺失的K线并写回存储，每完成 batch_size 只就批量计算一次指标
+        并返回这一批的报告。成功时错误信息为 None，失败时分析报告为 None。
+        """
+        store = store or DailyBarStore()
+        # 当天的K线在收盘前仍在变化，只使用到上一个交易日（按交易日历跳过节假日）
+        end_date = last_closed_trade_date(store)
+        end = pd.Timestamp(end_date)
+        start_date = (end - timedelta(days=180)).strftime('%Y%m%d')
+        
+        symbols = list(dict.fromkeys(str(symbol).strip().zfill(6) for symbol in symbols))
+        fresh, stale = [], []
+        for symbol in symbols:
+            if not symbol.startswith(self.VALID_PREFIXES):
+                yield symbol, None, "无效的股票代码格式"
+                continue
+            bar = store.last_bar(symbol)
+            if bar and bar['first'] <= start_date and bar['date'] >= end_date:
+                fresh.append(symbol)
+            else:
+                stale.append(symbol)
         
-        # 计算MACD
-        exp1 = df['close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['MACD_Hist'] = df['MACD'] - df['Signal']
+        if fresh:
+            yield from self._analyze_batch(store.load(start_date, end_date, codes=fresh), fresh)
+        if not stale:
+            return
         
-        # 计算RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        # 在后台线程中并发补齐K线，每完成一批放入队列；写入和读取存储都在当前线程进行
+        batches = queue.Queue()
+        engine = FetchEngine()
+        tasks = [(symbol, lambda symbol=symbol: fetch_missing_bars(
+                    symbol, store.last_bar(symbol), start_date, end_date)) for symbol in stale]
+        reports = []
         
-        # 计算布林带
-        df['BB_middle'] = df['close'].rolling(window=20).mean()
-        df['BB_upper'] = df['BB_middle'] + 2 * df['close'].rolling(window=20).std()
-        df['BB_lower'] = df['BB_middle'] - 2 * df['close'].rolling(window=20).std()
+        def run():
+            try:
+                reports.append(engine.run(tasks, progress_every=0, on_checkpoint=batches.put,
+                                          checkpoint_every=batch_size))
+            finally:
+                batches.put(None)
         
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            _append_fetched_bars(store, batch)
+            codes = [symbol for symbol, _ in batch]
+            yield from self._analyze_batch(store.load(start_date, end_date, codes=codes), codes)
+        
+        failures = reports[0].failures if reports else {symbol: "获取数据失败" for symbol in stale}
+        for symbol, error in failures.items():
+            yield symbol, None, f"获取历史数据失败: {error}"
+    
+    def _analyze_batch(self, bars, symbols):
+        """对一批股票的日线一次性计算指标，逐只生成报告"""
+        bars = bars.rename(columns=self.BAR_RENAME)
+        bars['股票代码'] = bars['股票代码'].astype(str)
+        bars = bars.join(panel_indicators(bars, price_col='close', columns=self.REPORT_INDICATORS))
+        groups = {code: df for code, df in bars.groupby('股票代码', sort=False)}
+        for symbol in symbols:
+            df = groups.get(symbol)
+            if df is None or len(df) < 30:
+                yield symbol, None, "获取不到足够的历史数据"
+                continue
+            try:
+                yield symbol, self._generate_analysis_report(self._latest_values(df), symbol), None
+            except Exception as e:
+                yield symbol, None, str(e)
+    
+    def _calculate_indicators(self, df, symbol=None):
+        """计算各种技术指标（均线、MACD、RSI、布林带）"""
+        df = df.join(series_indicators(df, symbol=symbol, columns=self.REPORT_INDICATORS))
+        return self._latest_values(df)
+    
+    def _latest_values(self, df):
+        """从带指标列的日线数据中取最新一根K线的分析数据"""
         # 获取最新数据
         latest = df.iloc[-1]
         prev = df.iloc[-2]
@@ -191,8 +312,8 @@ class EnhancedQuantStrategy:
             'ma60': latest['MA60'],
             'rsi': latest['RSI'],
             'macd': latest['MACD'],
-            'macd_signal': latest['Signal'],
-            'macd_hist': latest['MACD_Hist'],
+            'macd_signal': latest['SIGNAL'],
+            'macd_hist': latest['MACD_HIST'],
             'bb_upper': latest['BB_upper'],
             'bb_middle': latest['BB_middle'],
             'bb_lower': latest['BB_lower'],
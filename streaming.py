@@ -0,0 +1,368 @@
+import json
+import math
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+from config import CACHE_DIR
+
+NAN = float('nan')
+
+
+class EMAState:
+    """指数移动平均的增量状态，与 Series.ewm(span, adjust=False).mean() 一致"""
+
+    def __init__(self, span, value=None):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = value
+
+    def _next(self, x):
+        if self.value is None:
+            return x
+        return self.alpha * x + (1 - self.alpha) * self.value
+
+    def update(self, x):
+        """加入一根已完成的K线，返回新的均值"""
+        self.value = self._next(x)
+        return self.value
+
+    def peek(self, x):
+        """以盘中价格计算当前值，不改变状态"""
+        return self._next(x)
+
+    def to_dict(self):
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['span'], data['value'])
+
+
+class RollingState:
+    """固定窗口的移动平均和标准差（ddof=1），窗口未满时为NaN
+
+    只保存最近 window 个值，均值和离差平方和在窗口两端增减值时按 Welford 算法更新，
+    每次更新的开销为常数，与窗口长度和历史长度都无关
+    """
+
+    def __init__(self, window, values=None):
+        self.window = window
+        self.values = deque(values or [], maxlen=window)
+        self.count, self.mean, self.m2 = self._exact(self.values)
+
+    @staticmethod
+    def _exact(values):
+        """逐个值重新计算 (数量, 均值, 离差平方和)"""
+        n = len(values)
+        if n == 0:
+            return 0, 0.0, 0.0
+        mean = math.fsum(values) / n
+        return n, mean, math.fsum((v - mean) ** 2 for v in values)
+
+    def _push(self, x):
+        """返回加入 x（窗口已满时同时移出最早的值）之后的 (数量, 均值, 离差平方和)，不改变状态"""
+        n, mean, m2 = self.count, self.mean, self.m2
+        if n < self.window:
+            if not math.isfinite(x):
+                return self._exact(list(self.values) + [x])
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+        else:
+            old = self.values[0]
+            if not (math.isfinite(x) and math.isfinite(old)):
+                # 窗口中移入或移出缺失值时无法增量更新，按窗口重新计算
+                return self._exact(list(self.values)[1:] + [x])
+            new_mean = mean + (x - old) / n
+            m2 += (x - old) * (x - new_mean + old - mean)
+            mean = new_mean
+        return n, mean, max(m2, 0.0)
+
+    def _stats(self, n, mean, m2):
+        if n < self.window:
+            return NAN, NAN
+        if self.window < 2:
+            return mean, NAN
+        return mean, math.sqrt(m2 / (self.window - 1))
+
+    def update(self, x):
+        """加入一根已完成的K线，返回 (均值, 标准差)"""
+        self.count, self.mean, self.m2 = self._push(x)
+        self.values.append(x)
+        return self._stats(self.count, self.mean, self.m2)
+
+    def peek(self, x):
+        """以盘中价格计算 (均值, 标准差)，不改变状态"""
+        return self._stats(*self._push(x))
+
+    def to_dict(self):
+        return {'window': self.window, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['window'], data['values'])
+
+
+class MACDState:
+    """MACD 和信号线的增量状态"""
+
+    def __init__(self, fast=12, slow=26, signal=9, states=None):
+        self.fast, self.slow, self.signal = states or (EMAState(fast), EMAState(slow), EMAState(signal))
+
+    def update(self, x):
+        """返回 (MACD, SIGNAL)"""
+        line = self.fast.update(x) - self.slow.update(x)
+        return line, self.signal.update(line)
+
+    def peek(self, x):
+        line = self.fast.peek(x) - self.slow.peek(x)
+        return line, self.signal.peek(line)
+
+    def to_dict(self):
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(),
+                'signal': self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(states=(EMAState.from_dict(data['fast']), EMAState.from_dict(data['slow']),
+                           EMAState.from_dict(data['signal'])))
+
+
+class RSIState:
+    """RSI 的增量状态
+
+    method='sma' 与 indicators.rsi 一致（涨跌幅的简单移动平均，首根K线计为0）；
+    method='wilder' 为 Wilder 平滑，以前 period 个涨跌幅的均值为初值（与 talib.RSI 一致）
+    """
+
+    def __init__(self, period=14, method='sma', prev=None, count=0, avg_gain=0.0, avg_loss=0.0,
+                 gains=None, losses=None):
+        self.period = period
+        self.method = method
+        self.prev = prev
+        self.count = count
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.gains = RollingState(period, gains)
+        self.losses = RollingState(period, losses)
+
+    @staticmethod
+    def _rsi(gain, loss):
+        if math.isnan(gain) or math.isnan(loss):
+            return NAN
+        if loss == 0:
+            return NAN if gain == 0 else 100.0
+        return 100 - 100 / (1 + gain / loss)
+
+    def _step(self, x, commit):
+        delta = 0.0 if self.prev is None else x - self.prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+
+        if self.method == 'sma':
+            if commit:
+                avg_gain, avg_loss = self.gains.update(gain)[0], self.losses.update(loss)[0]
+            else:
+                avg_gain, avg_loss = self.gains.peek(gain)[0], self.losses.peek(loss)[0]
+            result = self._rsi(avg_gain, avg_loss)
+        else:
+            count = self.count + (1 if self.prev is not None else 0)
+            if self.prev is None:
+                avg_gain, avg_loss = 0.0, 0.0
+            elif count <= self.period:
+                # 初值阶段累加，达到 period 个涨跌幅时取均值
+                avg_gain, avg_loss = self.avg_gain + gain, self.avg_loss + loss
+                if count == self.period:
+                    avg_gain, avg_loss = avg_gain / self.period, avg_loss / self.period
+            else:
+                avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+            result = self._rsi(avg_gain, avg_loss) if count >= self.period else NAN
+            if commit:
+                self.count, self.avg_gain, self.avg_loss = count, avg_gain, avg_loss
+
+        if commit:
+            self.prev = x
+        return result
+
+    def update(self, x):
+        return self._step(x, commit=True)
+
+    def peek(self, x):
+        return self._step(x, commit=False)
+
+    def to_dict(self):
+        return {'period': self.period, 'method': self.method, 'prev': self.prev,
+                'count': self.count, 'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss,
+                'gains': list(self.gains.values), 'losses': list(self.losses.values)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class BollingerState:
+    """布林带的增量状态"""
+
+    def __init__(self, window=20, width=2, rolling=None):
+        self.width = width
+        self.rolling = rolling or RollingState(window)
+
+    def _bands(self, mean, std):
+        return mean + self.width * std, mean, mean - self.width * std
+
+    def update(self, x):
+        """返回 (上轨, 中轨, 下轨)"""
+        return self._bands(*self.rolling.update(x))
+
+    def peek(self, x):
+        return self._bands(*self.rolling.peek(x))
+
+    def to_dict(self):
+        return {'width': self.width, 'rolling': self.rolling.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(width=data['width'], rolling=RollingState.from_dict(data['rolling']))
+
+
+class SymbolIndicatorState:
+    """单只股票的全部增量指标状态（MA5/MA10/MA20、MACD、RSI、布林带）
+
+    已完成的K线通过 update 写入状态，盘中价格通过 peek 计算当前指标值
+    """
+
+    MA_WINDOWS = (5, 10, 20)
+
+    def __init__(self, last_date=None, last_close=None, ma=None, macd=None, rsi=None,
+                 bollinger=None):
+        self.last_date = last_date
+        self.last_close = last_close
+        self.ma = ma or {window: RollingState(window) for window in self.MA_WINDOWS}
+        self.macd = macd or MACDState()
+        self.rsi = rsi or RSIState()
+        self.bollinger = bollinger or BollingerState()
+
+    def _values(self, x, commit):
+        step = (lambda state: state.update(x)) if commit else (lambda state: state.peek(x))
+        values = {f'MA{window}': step(state)[0] for window, state in self.ma.items()}
+        values['MACD'], values['SIGNAL'] = step(self.macd)
+        values['RSI'] = step(self.rsi)
+        values['BB_upper'], values['BB_middle'], values['BB_lower'] = step(self.bollinger)
+        return values
+
+    def update(self, date, close):
+        """加入一根已完成的K线（date 为 'YYYYMMDD'），返回更新后的指标值"""
+        self.last_date = date
+        self.last_close = close
+        return self._values(close, commit=True)
+
+    def peek(self, close):
+        """以盘中价格计算当前指标值，不改变状态"""
+        return self._values(close, commit=False)
+
+    def to_dict(self):
+        return {
+            'last_date': self.last_date,
+            'last_close': self.last_close,
+            'ma': {str(window): state.to_dict() for window, state in self.ma.items()},
+            'macd': self.macd.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'bollinger': self.bollinger.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            last_date=data['last_date'],
+            last_close=data['last_close'],
+            ma={int(window): RollingState.from_dict(state) for window, state in data['ma'].items()},
+            macd=MACDState.from_dict(data['macd']),
+            rsi=RSIState.from_dict(data['rsi']),
+            bollinger=BollingerState.from_dict(data['bollinger'])
+        )
+
+
+class IndicatorStateStore:
+    """全市场的增量指标状态，保存在 data_cache/indicator_state.json
+
+    每次刷新只把上次之后新完成的K线写入状态，当日未收盘的K线只做 peek，
+    因此盘中重复刷新的开销与股票数量成正比，而与历史长度无关。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, 'indicator_state.json')
+        self.states = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.states = {code: SymbolIndicatorState.from_dict(state)
+                                   for code, state in json.load(f).items()}
+            except Exception as e:
+                print(f"读取指标状态失败，将重新计算: {e}")
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({code: state.to_dict() for code, state in self.states.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, panel, as_of):
+        """用面板数据更新状态，返回每只股票在 as_of 的指标值（含股票代码列）
+
+        as_of 当日的K线视为盘中数据，只计算不写入状态；如果已存的最后一根K线
+        不在面板中或收盘价已变化（如复权调整），该股票的状态会用面板历史重建
+        """
+        as_of = pd.Timestamp(as_of)
+        dates = panel.frame['交易日期'].to_numpy()
+        closes = panel.frame['收盘价'].to_numpy(dtype=np.float64)
+        cutoff = np.datetime64(as_of)
+        rows = []
+        for code in panel.codes:
+            start, end = panel.code_range(code)
+            code_dates, code_closes = dates[start:end], closes[start:end]
+            completed = int(np.searchsorted(code_dates, cutoff, 'left'))
+
+            state = self.states.get(code)
+            begin = self._resume_position(state, code_dates, code_closes, completed)
+            if begin is None:
+                state = SymbolIndicatorState()
+                self.states[code] = state
+                begin = 0
+
+            values = None
+            for i in range(begin, completed):
+                values = state.update(pd.Timestamp(code_dates[i]).strftime('%Y%m%d'),
+                                      float(code_closes[i]))
+            if completed < len(code_dates):
+                values = state.peek(float(code_closes[completed]))
+            elif values is None:
+                continue
+            rows.append({'股票代码': code, **values})
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def _resume_position(state, dates, closes, completed):
+        """返回需要从哪一根K线开始写入状态，状态无法续接时返回 None"""
+        if state is None or state.last_date is None:
+            return None
+        last = np.datetime64(pd.Timestamp(state.last_date))
+        pos = int(np.searchsorted(dates, last, 'left'))
+        if pos >= completed or dates[pos] != last:
+            # 最后一根K线不在面板的已完成部分中，无法续接
+            return None
+        if not math.isclose(float(closes[pos]), state.last_close, rel_tol=1e-6):
+            # 收盘价变化（复权调整），需要重建
+            return None
+        return pos + 1
+
+    def update_quotes(self, prices):
+        """用实时价格 {股票代码: 最新价} 计算盘中指标值，不改变状态"""
+        rows = [{'股票代码': code, **self.states[code].peek(float(price))}
+                for code, price in prices.items()
+                if code in self.states and not pd.isna(price)]
+        return pd.DataFrame(rows)
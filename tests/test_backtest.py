@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import VectorBacktester
+
+TAKE_PROFIT, STOP_LOSS = 1.1, 0.95
+
+
+def _backtester(window=32):
+    return VectorBacktester(take_profit=TAKE_PROFIT, stop_loss=STOP_LOSS,
+                            commission=0.0, stamp_tax=0.0, window=window)
+
+
+def _bars(closes, opens=None, highs=None, lows=None, code='600000', start='2024-01-01'):
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        '股票代码': code,
+        '交易日期': pd.bdate_range(start, periods=len(closes)),
+        '开盘价': closes if opens is None else opens,
+        '收盘价': closes,
+        '最高价': closes if highs is None else highs,
+        '最低价': closes if lows is None else lows,
+        '成交量': 1000.0,
+        'buy_signal': 0,
+        'sell_signal': 0
+    })
+
+
+def _random_market(seed=7, n_stocks=30, n_days=200):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=n_days)
+    frames = []
+    for i in range(n_stocks):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.03, n_days)))
+        open_ = close * np.exp(rng.normal(0, 0.01, n_days))
+        frame = pd.DataFrame({
+            '股票代码': f'{600000 + i:06d}',
+            '交易日期': dates,
+            '开盘价': open_,
+            '收盘价': close,
+            '最高价': np.maximum(open_, close) * (1 + rng.uniform(0, 0.03, n_days)),
+            '最低价': np.minimum(open_, close) * (1 - rng.uniform(0, 0.03, n_days)),
+            '成交量': np.where(rng.random(n_days) < 0.03, 0.0, 1000.0),
+            'buy_signal': (rng.random(n_days) < 0.08).astype(int),
+            'sell_signal': (rng.random(n_days) < 0.05).astype(int)
+        })
+        # 部分交易日没有行情
+        frames.append(frame[rng.random(n_days) > 0.03])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _reference_trades(data):
+    """逐只股票、逐个交易日模拟的参考实现"""
+    dates = pd.DatetimeIndex(sorted(data['交易日期'].unique()))
+    trades = []
+    for code, bars in data.groupby('股票代码'):
+        bars = bars.set_index('交易日期').reindex(dates)
+        valid = (bars['收盘价'].notna() & (bars['成交量'] != 0)).to_numpy()
+        o, h, l, c = (bars[col].to_numpy() for col in ('开盘价', '最高价', '最低价', '收盘价'))
+        buy = bars['buy_signal'].fillna(0).to_numpy() == 1
+        sell = bars['sell_signal'].fillna(0).to_numpy() == 1
+
+        holding = want_buy = want_sell = False
+        entry = entry_price = last_valid = signal_day = None
+        for t in range(len(dates)):
+            if not valid[t]:
+                continue
+            last_valid = t
+            if holding and want_sell:
+                trades.append((code, entry, entry_price, t, o[t], '卖出信号'))
+                holding = want_sell = False
+            elif want_buy:
+                holding, want_buy = True, False
+                entry, entry_price = t, o[t]
+            if holding and not want_sell:
+                stop, take = entry_price * STOP_LOSS, entry_price * TAKE_PROFIT
+                if l[t] <= stop:
+                    trades.append((code, entry, entry_price, t, min(o[t], stop), '止损'))
+                    holding = False
+                elif h[t] >= take:
+                    trades.append((code, entry, entry_price, t, max(o[t], take), '止盈'))
+                    holding = False
+                elif sell[t]:
+                    want_sell, signal_day = True, t
+            if not holding and buy[t]:
+                want_buy = True
+        if holding:
+            day = signal_day if want_sell else last_valid
+            trades.append((code, entry, entry_price, day, c[day], '期末'))
+
+    frame = pd.DataFrame(trades, columns=['股票代码', '买入日期', '买入价', '卖出日期', '卖出价', '退出原因'])
+    frame['买入日期'] = dates[frame['买入日期'].to_numpy(dtype=int)]
+    frame['卖出日期'] = dates[frame['卖出日期'].to_numpy(dtype=int)]
+    return frame
+
+
+@pytest.mark.parametrize('window', [3, 32])
+def test_trades_match_reference_loop(window):
+    data = _random_market()
+    trades = _backtester(window).run(data)['trades']
+    expected = _reference_trades(data)
+    assert len(trades) > 100
+
+    columns = list(expected.columns)
+    actual = trades[columns].sort_values(['股票代码', '买入日期']).reset_index(drop=True)
+    expected = expected.sort_values(['股票代码', '买入日期']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_stop_loss_wins_over_take_profit_on_the_same_day():
+    bars = _bars([10, 10, 10, 10], highs=[10, 10, 11.5, 10], lows=[10, 10, 9.0, 10])
+    bars.loc[0, 'buy_signal'] = 1
+    trade = _backtester().run(bars)['trades'].iloc[0]
+    assert trade['退出原因'] == '止损'
+    assert trade['卖出价'] == pytest.approx(10 * STOP_LOSS)
+
+
+def test_gap_below_stop_fills_at_open():
+    bars = _bars([10, 10, 9, 9], opens=[10, 10, 9, 9])
+    bars.loc[0, 'buy_signal'] = 1
+    trade = _backtester().run(bars)['trades'].iloc[0]
+    assert trade['退出原因'] == '止损'
+    assert trade['卖出价'] == 9
+
+
+def test_signals_fill_at_next_open():
+    bars = _bars([10, 10.2, 10.4, 10.3, 10.5], opens=[10, 10.1, 10.3, 10.35, 10.45])
+    bars.loc[0, 'buy_signal'] = 1
+    bars.loc[2, 'sell_signal'] = 1
+    trade = _backtester().run(bars)['trades'].iloc[0]
+    assert trade['买入日期'] == bars.loc[1, '交易日期']
+    assert trade['买入价'] == 10.1
+    assert trade['卖出日期'] == bars.loc[3, '交易日期']
+    assert trade['卖出价'] == 10.35
+    assert trade['退出原因'] == '卖出信号'
+
+
+def test_open_position_closes_at_last_traded_close():
+    bars = _bars([10, 10.2, 10.3, 10.4, 10.4])
+    bars.loc[0, 'buy_signal'] = 1
+    bars.loc[4, '成交量'] = 0  # 最后一天停牌
+    trade = _backtester().run(bars)['trades'].iloc[0]
+    assert trade['退出原因'] == '期末'
+    assert trade['卖出日期'] == bars.loc[3, '交易日期']
+    assert trade['卖出价'] == 10.4
+
+
+def test_single_stock_equity_compounds_trade_returns():
+    # 不计费用时，单只股票的净值等于逐笔交易收益率的连乘（含停牌日和期末平仓）
+    data = _random_market(seed=3, n_stocks=1, n_days=300)
+    result = _backtester().run(data)
+    expected = np.prod(1 + result['trades']['收益率'])
+    assert result['daily']['净值'].iloc[-1] == pytest.approx(expected)
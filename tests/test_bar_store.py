@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+from bar_store import DailyBarStore
+
+
+def _bars(code, dates, closes):
+    return pd.DataFrame({
+        '股票代码': code,
+        '交易日期': pd.to_datetime(dates),
+        '开盘价': closes,
+        '收盘价': closes,
+        '最高价': closes,
+        '最低价': closes,
+        '成交量': 100.0,
+        '成交额': 1000.0
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DailyBarStore(str(tmp_path / 'bars'))
+
+
+def test_append_load_round_trip(store):
+    assert store.date_range() is None
+    store.append(pd.concat([_bars('000001', ['2024-01-02', '2024-01-03'], [10.0, 10.5]),
+                            _bars('600000', ['2024-01-02'], [7.0])], ignore_index=True))
+    store.append(_bars('1', ['2024-01-04'], [10.8]))  # 代码补齐为6位
+
+    assert store.date_range() == ('20240102', '20240104')
+    data = store.load()
+    assert data['股票代码'].tolist() == ['000001', '000001', '000001', '600000']
+    assert data['收盘价'].tolist() == [10.0, 10.5, 10.8, 7.0]
+
+    subset = store.load('20240103', '20240104', codes=['000001'], columns=['收盘价'])
+    assert list(subset.columns) == ['股票代码', '交易日期', '收盘价']
+    assert subset['收盘价'].tolist() == [10.5, 10.8]
+
+
+def test_later_segments_overwrite_earlier_rows(store):
+    store.append(_bars('000001', ['2024-01-02', '2024-01-03'], [10.0, 10.5]))
+    store.append(_bars('000001', ['2024-01-03'], [10.6]))
+    assert store.load()['收盘价'].tolist() == [10.0, 10.6]
+    assert store.last_bar('000001')['close'] == 10.6
+
+
+def test_last_bar_tracks_coverage_and_adj_base(store):
+    assert store.last_bar('000001') is None
+    store.append(_bars('000001', ['2024-01-03', '2024-01-04'], [10.0, 10.5]),
+                 coverage={'000001': '20240101'}, adj_base={'000001': 2.0})
+    assert store.last_bar('000001') == {'date': '20240104', 'close': 10.5,
+                                        'first': '20240101', 'adj_base': 2.0}
+    # 较早的K线不改变最后一根K线，但会扩展覆盖的起始日期
+    store.append(_bars('000001', ['2023-12-29'], [9.5]))
+    bar = store.last_bar('000001')
+    assert (bar['date'], bar['close'], bar['first']) == ('20240104', 10.5, '20231229')
+    # 重新下载整个区间且没有复权基准时清除原有基准
+    store.append(_bars('000001', ['2024-01-04'], [5.25]), coverage={'000001': '20231229'})
+    assert 'adj_base' not in store.last_bar('000001')
+    assert store.last_date('000001') == '20240104'
+
+
+def test_manifest_persists_and_compacts(tmp_path):
+    root = str(tmp_path / 'bars')
+    store = DailyBarStore(root, max_segments=2)
+    for day, close in zip(['2024-01-02', '2024-01-03', '2024-01-03'], [10.0, 10.5, 10.6]):
+        store.append(_bars('000001', [day], [close]), market_dates=[day.replace('-', '')])
+    assert len(store.manifest['segments']) == 1
+
+    reopened = DailyBarStore(root)
+    assert reopened.load()['收盘价'].tolist() == [10.0, 10.6]
+    assert reopened.market_dates() == ['20240102', '20240103']
+    assert reopened.has_market_date('20240103')
+    assert reopened.last_bar('000001')['close'] == 10.6
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+from functools import partial
+
+# data_fetcher 导入时依赖行情数据源
+for module in ('akshare', 'tushare', 'baostock'):
+    pytest.importorskip(module)
+
+import data_fetcher  # noqa: E402
+from bar_store import DailyBarStore  # noqa: E402
+from fetch_engine import FetchCheckpoint  # noqa: E402
+
+
+def _fake_hist(closes, requests):
+    """按 {日期: 收盘价} 返回区间内K线的 fetch_stock_hist 替身，记录请求的区间"""
+    def fetch_stock_hist(stock_code, start_date, end_date):
+        requests.append((start_date, end_date))
+        dates = [date for date in sorted(closes) if start_date <= date <= end_date]
+        return pd.DataFrame({'股票代码': stock_code, '交易日期': pd.to_datetime(dates),
+                             '收盘价': [closes[date] for date in dates]})
+    return fetch_stock_hist
+
+
+def test_adjustment_change_refetches_whole_stored_history(monkeypatch, tmp_path):
+    store = DailyBarStore(str(tmp_path / 'bars'))
+    old = {'20230103': 8.0, '20240102': 10.0, '20240103': 10.5}
+    store.append(pd.DataFrame({'股票代码': '000001', '交易日期': pd.to_datetime(list(old)),
+                               '收盘价': list(old.values())}), coverage={'000001': '20230101'})
+
+    # 除权后前复权价格整体下调
+    requests = []
+    current = {date: close * 0.5 for date, close in old.items()}
+    current['20240104'] = 5.5
+    monkeypatch.setattr(data_fetcher, 'fetch_stock_hist', _fake_hist(current, requests))
+    bars, covered_from = data_fetcher.fetch_missing_bars(
+        '000001', store.last_bar('000001'), '20240101', '20240104')
+
+    assert requests == [('20240103', '20240104'), ('20230101', '20240104')]
+    assert covered_from == '20230101'
+    data_fetcher._append_fetched_bars(store, [('000001', (bars, covered_from))])
+    assert store.load()['收盘价'].tolist() == [4.0, 5.0, 5.25, 5.5]
+
+
+def test_backfill_extends_history_before_stored_range(monkeypatch, tmp_path):
+    store = DailyBarStore(str(tmp_path / 'bars'))
+    closes = {'20200102': 9.0, '20200103': 9.5, '20240102': 10.0}
+    store.append(pd.DataFrame({'股票代码': '000001', '交易日期': pd.to_datetime(['20240102']),
+                               '收盘价': [10.0]}))
+
+    requests = []
+    monkeypatch.setattr(data_fetcher, 'fetch_stock_hist', _fake_hist(closes, requests))
+    monkeypatch.setattr(data_fetcher, 'tushare_available', lambda: False)
+    monkeypatch.setattr(data_fetcher, 'FetchCheckpoint',
+                        partial(FetchCheckpoint, directory=str(tmp_path / 'checkpoints')))
+    rows = data_fetcher.backfill_bar_store('20200101', '20201231', store,
+                                           stock_codes=['000001'])
+
+    # 存储区间在回测区间之后：整体重新下载，保证同一复权基准
+    assert requests == [('20200101', '20240102')]
+    assert rows == 3
+    assert store.last_bar('000001')['first'] == '20200101'
+    assert store.load('20200101', '20201231')['收盘价'].tolist() == [9.0, 9.5]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from factors import zscore_by_group, rank_by_group, calculate_factors
+from indicators import GroupBlocks
+
+
+def test_zscore_clips_outliers_by_mad():
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 1000.0, 7.0, 7.0, 7.0, np.nan])
+    keys = np.array([0, 0, 0, 0, 0, 0, 1, 1, 1, 1])
+    z = zscore_by_group(values, GroupBlocks(keys), clip=3.0)
+
+    # 极端值先按中位数±3倍MAD截断，其余股票的标准分不会被压缩到0附近
+    first = z[:6]
+    assert np.all(np.abs(first) <= 3.0)
+    assert first[5] == first.max()
+    assert first[4] - first[0] > 1.0
+    assert abs(np.mean(first)) < 1e-12
+    # 组内无差异或缺失的结果为NaN
+    assert np.isnan(z[6:]).all()
+
+
+def test_zscore_matches_plain_standardization_without_outliers():
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=40)
+    keys = np.repeat([0, 1], 20)
+    z = zscore_by_group(values, GroupBlocks(keys), clip=10.0)
+    expected = pd.Series(values).groupby(keys).transform(lambda s: (s - s.mean()) / s.std(ddof=0))
+    np.testing.assert_allclose(z, expected.to_numpy())
+
+
+def test_rank_matches_pandas_pct_rank():
+    rng = np.random.default_rng(5)
+    keys = rng.integers(0, 6, size=300)
+    values = rng.integers(0, 8, size=300).astype(float)  # 大量并列值
+    values[rng.random(300) < 0.1] = np.nan
+    ranks = rank_by_group(values, GroupBlocks(keys))
+    expected = pd.Series(values).groupby(keys).rank(pct=True).to_numpy()
+    np.testing.assert_allclose(ranks, expected)
+
+
+def test_rows_without_weighted_factors_are_unscored():
+    dates = pd.bdate_range('2024-01-01', periods=30)
+    rng = np.random.default_rng(9)
+    frames = []
+    for i in range(6):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        frames.append(pd.DataFrame({'股票代码': f'{600000 + i:06d}', '交易日期': dates,
+                                    '收盘价': close, '换手率': rng.uniform(1, 5, len(dates))}))
+    data = pd.concat(frames, ignore_index=True)
+    config = {'momentum_window': 5, 'volatility_window': 5, 'turnover_window': 5,
+              'zscore_clip': 3.0, 'industry_neutral': False, 'min_industry_size': 5,
+              'weights': {'momentum': 0.5, 'volatility': -0.5, 'growth': 0.0}}
+    calculate_factors(data, config)
+
+    warmup = data['交易日期'] < dates[5]
+    assert data.loc[warmup, 'Composite_Score'].isna().all()
+    assert data.loc[warmup, 'Market_Rank'].isna().all()
+    assert data.loc[~warmup, 'Composite_Score'].notna().all()
+    # 没有财报增长数据时成长因子为NaN，权重为0不影响打分
+    assert data['Growth'].isna().all()
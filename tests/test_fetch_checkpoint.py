@@ -0,0 +1,42 @@
+import fetch_engine
+from fetch_engine import FetchCheckpoint
+
+
+def test_checkpoint_saves_and_resumes(tmp_path):
+    checkpoint = FetchCheckpoint('fetch_a', directory=str(tmp_path), max_age=3600)
+    assert checkpoint.load() == 0
+    checkpoint.mark(['000001', '000002'])
+    checkpoint.mark(['000003'])
+
+    resumed = FetchCheckpoint('fetch_a', directory=str(tmp_path), max_age=3600)
+    assert resumed.load() == 3
+    assert resumed.completed == {'000001', '000002', '000003'}
+    assert resumed.created == checkpoint.created
+
+    # 断点按名称区分
+    assert FetchCheckpoint('fetch_b', directory=str(tmp_path)).load() == 0
+
+
+def test_checkpoint_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fetch_engine.time, 'time', lambda: now[0])
+    checkpoint = FetchCheckpoint('fetch_a', directory=str(tmp_path), max_age=60)
+    checkpoint.mark(['000001'])
+
+    now[0] += 30
+    assert FetchCheckpoint('fetch_a', directory=str(tmp_path), max_age=60).load() == 1
+    now[0] += 31
+    expired = FetchCheckpoint('fetch_a', directory=str(tmp_path), max_age=60)
+    assert expired.load() == 0
+    assert not (tmp_path / 'fetch_a.json').exists()
+
+
+def test_checkpoint_clear_and_corrupt_file(tmp_path):
+    checkpoint = FetchCheckpoint('fetch_a', directory=str(tmp_path))
+    checkpoint.mark(['000001'])
+    checkpoint.clear()
+    assert checkpoint.completed == set()
+    assert not (tmp_path / 'fetch_a.json').exists()
+
+    (tmp_path / 'fetch_a.json').write_text('{broken', encoding='utf-8')
+    assert FetchCheckpoint('fetch_a', directory=str(tmp_path)).load() == 0
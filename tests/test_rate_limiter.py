@@ -0,0 +1,92 @@
+import pytest
+import rate_limiter
+from rate_limiter import TokenBucket, CircuitBreaker, RateLimiter, host_for_endpoint
+
+
+class FakeClock:
+    """替代 time.monotonic / time.sleep，sleep 只推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_token_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+    # 空闲很久后最多积累 capacity 个令牌
+    clock.now += 100
+    for _ in range(3):
+        bucket.acquire()
+    assert len(clock.sleeps) == 1
+    bucket.acquire()
+    assert clock.sleeps[-1] == pytest.approx(0.5)
+
+
+def test_circuit_breaker_opens_and_recovers(clock):
+    breaker = CircuitBreaker('eastmoney', window=10, error_rate=0.5, cooldown=30, min_calls=4)
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.open_until == 0.0  # 请求数不足 min_calls
+
+    breaker.record(False)  # 4次中失败2次，达到错误率
+    assert breaker.open_until == pytest.approx(clock.now + 30)
+    assert len(breaker.results) == 0
+
+    breaker.wait_until_closed()
+    assert clock.sleeps == [pytest.approx(30)]
+
+    # 冷却结束后半开：统计重新开始，失败次数不足 min_calls 时不会再次熔断
+    opened = breaker.open_until
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.open_until == opened
+    breaker.record(False)
+    assert breaker.open_until == pytest.approx(clock.now + 30)
+
+
+def test_rate_limiter_records_results_per_host(clock):
+    config = {
+        'hosts': {'default': {'rate': 1, 'burst': 1}, 'sina': {'rate': 10, 'burst': 2}},
+        'circuit': {'window': 4, 'error_rate': 0.5, 'cooldown': 60}
+    }
+    limiter = RateLimiter(config)
+    assert limiter.call('sina', lambda x: x * 2, 21) == 42
+
+    def fail():
+        raise RuntimeError('boom')
+    with pytest.raises(RuntimeError):
+        limiter.call('sina', fail)
+    assert list(limiter.breakers['sina'].results) == [True, False]
+
+    # 未配置的主机使用 default 的速率
+    limiter.call('ths', lambda: None)
+    assert limiter.buckets['ths'].rate == 1
+    assert limiter.buckets['sina'].capacity == 2
+
+
+def test_host_for_endpoint():
+    assert host_for_endpoint('stock_zh_a_spot_em') == 'eastmoney'
+    assert host_for_endpoint('stock_zh_a_daily') == 'sina'
+    assert host_for_endpoint('stock_margin_sse') == 'exchange'
+    assert host_for_endpoint('unknown_api') == 'default'
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from rules import compile_rule, evaluate_rules
+
+
+def _frame():
+    return pd.DataFrame({
+        'MACD': [0.5, -0.2, 0.1, np.nan, 0.3, -1.0],
+        'SIGNAL': [0.1, 0.1, 0.2, 0.0, 0.3, -2.0],
+        'RSI': [50.0, 85.0, 65.0, 40.0, np.nan, 69.9],
+        '涨跌幅': [1.0, -6.0, -2.9, 0.0, 2.0, -3.0],
+        '换手率': [2.0, 0.5, 1.5, 3.0, np.nan, 1.01],
+        '所属行业': ['银行', '电子', None, '银行', '电子', '医药']
+    })
+
+
+def _default_rules():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.example.yml')
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)['rules']
+
+
+def test_default_rules_match_original_expressions():
+    data = _frame()
+    rules = _default_rules()
+    buy = np.where((data['MACD'] > data['SIGNAL']) & (data['RSI'] < 70) &
+                   (data['涨跌幅'] > -3) & (data['换手率'] > 1), 1, 0)
+    sell = np.where((data['MACD'] < data['SIGNAL']) | (data['RSI'] > 80) |
+                    (data['涨跌幅'] < -5), 1, 0)
+    np.testing.assert_array_equal(compile_rule(rules['buy'])(data).astype(np.int64), buy)
+    np.testing.assert_array_equal(compile_rule(rules['sell'])(data).astype(np.int64), sell)
+
+
+def test_min_max_mix_columns_and_constants():
+    data = _frame()
+    result = evaluate_rules(data, {
+        'min': "min(RSI, 60) >= 50",
+        'max': "max(0, 涨跌幅) > 0",
+        'nested': "max(MACD, SIGNAL, 0.25) > 0.25"
+    })
+    # fmin/fmax 跳过缺失值：RSI 为NaN 时 min(RSI, 60) 为60
+    np.testing.assert_array_equal(result['min'], [True, True, True, False, True, True])
+    np.testing.assert_array_equal(result['max'], [True, False, False, False, True, False])
+    np.testing.assert_array_equal(result['nested'], [True, False, False, False, True, False])
+
+
+def test_bool_ops_and_chained_compare_with_constants():
+    data = _frame()
+    result = evaluate_rules(data, {
+        'and_true': "RSI < 70 and True",
+        'or_false': "False or 涨跌幅 > 0",
+        'chain': "0 < 1 < RSI < 70"
+    })
+    rsi_ok = (data['RSI'] < 70).to_numpy()
+    np.testing.assert_array_equal(result['and_true'], rsi_ok)
+    np.testing.assert_array_equal(result['or_false'], (data['涨跌幅'] > 0).to_numpy())
+    np.testing.assert_array_equal(result['chain'], rsi_ok)
+
+
+def test_missing_values_and_strings():
+    data = _frame()
+    np.testing.assert_array_equal(compile_rule("not RSI > 60")(data),
+                                  [True, False, False, True, True, False])
+    np.testing.assert_array_equal(compile_rule("所属行业 != '银行' and 换手率 > 1")(data),
+                                  [False, False, True, False, False, True])
+
+
+def test_single_row_and_errors():
+    row = _frame().iloc[0]
+    assert compile_rule("MACD > SIGNAL and min(RSI, 60) == 50")(row) is True
+    with pytest.raises(KeyError):
+        compile_rule("不存在的列 > 0")(_frame())
+    with pytest.raises(ValueError):
+        compile_rule("RSI ** 2 > 0")
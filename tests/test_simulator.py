@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from simulator import AShareSimulator, price_limits
+
+TAKE_PROFIT, STOP_LOSS = 1.2, 0.95
+
+
+def _simulator():
+    return AShareSimulator(take_profit=TAKE_PROFIT, stop_loss=STOP_LOSS,
+                           commission=0.0, stamp_tax=0.0)
+
+
+def _bars(code, opens, closes=None, highs=None, lows=None, volumes=None):
+    opens = np.asarray(opens, dtype=float)
+    closes = opens if closes is None else np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        '股票代码': code,
+        '交易日期': pd.bdate_range('2024-03-01', periods=len(opens)),
+        '开盘价': opens,
+        '收盘价': closes,
+        '最高价': np.maximum(opens, closes) if highs is None else highs,
+        '最低价': np.minimum(opens, closes) if lows is None else lows,
+        '成交量': 1000.0 if volumes is None else volumes,
+        'buy_signal': 0,
+        'sell_signal': 0
+    })
+
+
+def test_price_limits_by_board():
+    np.testing.assert_allclose(
+        price_limits(['600000', '000001', '300750', '301001', '688981', '430047', '832000', '920001']),
+        [0.1, 0.1, 0.2, 0.2, 0.2, 0.3, 0.3, 0.3])
+
+
+def test_limit_up_open_blocks_main_board_buy_only():
+    # 前收盘10元，次日开盘11.5元（+15%）：主板已涨停买不进，创业板未涨停可以买入
+    prices = [10, 11.5, 11.6, 11.7]
+    bars = pd.concat([_bars('600000', prices), _bars('300001', prices)], ignore_index=True)
+    bars.loc[bars['交易日期'] == bars['交易日期'].min(), 'buy_signal'] = 1
+    result = _simulator().run(bars)
+
+    trades = result['trades']
+    assert trades['股票代码'].tolist() == ['300001']
+    assert trades['买入价'].iloc[0] == 11.5
+    assert result['summary']['涨停未能买入'] == 1
+
+
+def test_same_day_stop_is_deferred_under_t_plus_one():
+    # 买入当日最低价跌破止损价（9.5），T+1 下次日开盘后才能止损
+    bars = _bars('600000', opens=[10, 10, 9.8, 9.6], closes=[10, 9.7, 9.6, 9.6],
+                 lows=[10, 9.0, 9.4, 9.6])
+    bars.loc[0, 'buy_signal'] = 1
+    result = _simulator().run(bars)
+
+    trade = result['trades'].iloc[0]
+    assert trade['买入日期'] == bars.loc[1, '交易日期']
+    assert trade['卖出日期'] == bars.loc[2, '交易日期']
+    assert trade['卖出价'] == pytest.approx(10 * STOP_LOSS)
+    assert trade['退出原因'] == '止损'
+    assert result['summary']['T+1未能卖出'] == 1
+
+
+def test_limit_down_open_defers_sell_to_next_session():
+    # 卖出信号次日开盘跌停（-10%）卖不出，顺延到再下一个交易日开盘
+    bars = _bars('600000', opens=[10, 10, 10, 9, 9.2, 9.3],
+                 closes=[10, 10, 10, 9, 9.3, 9.3], highs=[10, 10, 10, 9, 9.4, 9.3])
+    bars.loc[0, 'buy_signal'] = 1
+    bars.loc[2, 'sell_signal'] = 1
+    simulator = AShareSimulator(take_profit=TAKE_PROFIT, stop_loss=0.5,
+                                commission=0.0, stamp_tax=0.0)
+    result = simulator.run(bars)
+
+    trade = result['trades'].iloc[0]
+    assert trade['卖出日期'] == bars.loc[4, '交易日期']
+    assert trade['卖出价'] == 9.2
+    assert trade['退出原因'] == '卖出信号'
+    assert result['summary']['跌停未能卖出'] == 1
+
+
+def test_suspension_defers_sell_and_cancels_buy():
+    bars = _bars('600000', opens=[10, 10, 10, 10, 10.1, 10.2], volumes=[1000, 1000, 1000, 0, 1000, 1000])
+    bars.loc[0, 'buy_signal'] = 1
+    bars.loc[2, 'sell_signal'] = 1
+    suspended = _bars('000001', opens=[10, 10, 10, 10], volumes=[1000, 0, 1000, 1000])
+    suspended.loc[0, 'buy_signal'] = 1
+    result = _simulator().run(pd.concat([bars, suspended], ignore_index=True))
+
+    trades = result['trades']
+    # 停牌日不能买入，委托作废
+    assert trades['股票代码'].tolist() == ['600000']
+    trade = trades.iloc[0]
+    assert trade['卖出日期'] == bars.loc[4, '交易日期']
+    assert trade['卖出价'] == 10.1
+    assert result['summary']['停牌顺延卖出'] == 1
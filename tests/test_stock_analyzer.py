@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+# stock_analyzer 经 data_fetcher 依赖行情数据源
+for module in ('akshare', 'tushare', 'baostock'):
+    pytest.importorskip(module)
+
+from stock_analyzer import StockAnalyzer  # noqa: E402
+
+
+def _daily(closes):
+    """stock_zh_a_daily 格式的原始日线，不含任何指标列"""
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        'date': pd.bdate_range('2024-01-01', periods=len(closes)),
+        'open': closes,
+        'high': closes * 1.01,
+        'low': closes * 0.99,
+        'close': closes,
+        'volume': 1e6
+    })
+
+
+def test_evaluate_technical_on_plain_ohlcv():
+    analyzer = StockAnalyzer.__new__(StockAnalyzer)
+    rising = _daily(10 * 1.01 ** np.arange(60))
+    score, factors = analyzer._evaluate_technical(rising)
+    assert '处于上升趋势' in factors and 'EMA金叉形成' in factors
+    assert 'RSI超买' in factors
+    assert 0 <= score <= 40
+    assert list(rising.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+
+    # 最后一天大跌到布林带下轨以下（规则中的 BB_lower 为20日布林带）
+    falling = _daily(np.r_[np.full(40, 10.0) + np.sin(np.arange(40)) * 0.1, 8.0])
+    score, factors = analyzer._evaluate_technical(falling)
+    assert factors == ['触及布林带下轨']
+    assert score == 5
+
+
+def test_risk_warning_computes_ma20():
+    analyzer = StockAnalyzer.__new__(StockAnalyzer)
+    stock_data = {'historical': _daily(10 * 0.99 ** np.arange(40)), 'financial': {'资产负债率': 70}}
+    assert analyzer._get_risk_warning(stock_data) == ['股价处于年线下方', '资产负债率偏高']
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import IndicatorGraph
+from indicator_backends import NumpyBackend, INDICATOR_KINDS
+from panel import StockPanel
+from streaming import RollingState, SymbolIndicatorState, IndicatorStateStore
+
+COLUMNS = ['MA5', 'MA10', 'MA20', 'MACD', 'SIGNAL', 'RSI', 'BB_upper', 'BB_middle', 'BB_lower']
+
+
+def _closes(n=150, seed=0):
+    rng = np.random.default_rng(seed)
+    return 20 + np.cumsum(rng.normal(0, 0.3, n))
+
+
+def _batch_last_row(closes):
+    backend = NumpyBackend()
+    graph = IndicatorGraph(np.asarray(closes, dtype=np.float64)[None, :],
+                           backends={kind: backend for kind in INDICATOR_KINDS})
+    return {name: graph[name][0, -1] for name in COLUMNS}
+
+
+def _dates(n):
+    return [d.strftime('%Y%m%d') for d in pd.bdate_range('2024-01-01', periods=n)]
+
+
+def test_streaming_matches_batch_graph():
+    closes = _closes()
+    state = SymbolIndicatorState()
+    for date, close in zip(_dates(len(closes)), closes):
+        values = state.update(date, float(close))
+    expected = _batch_last_row(closes)
+    for name in COLUMNS:
+        assert values[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+
+def test_peek_does_not_change_state_and_round_trips():
+    closes = _closes()
+    state = SymbolIndicatorState()
+    for date, close in zip(_dates(len(closes) - 1), closes[:-1]):
+        state.update(date, float(close))
+    peeked = state.peek(float(closes[-1]))
+    restored = SymbolIndicatorState.from_dict(state.to_dict())
+    assert state.peek(float(closes[-1])) == peeked
+
+    expected = _batch_last_row(closes)
+    for name in COLUMNS:
+        assert peeked[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+        assert restored.peek(float(closes[-1]))[name] == pytest.approx(peeked[name], rel=1e-12)
+
+
+def test_rolling_state_matches_pandas_with_missing_values():
+    values = _closes(80)
+    values[[10, 11, 40]] = np.nan
+    state = RollingState(5)
+    result = np.array([state.update(float(v)) for v in values])
+    rolling = pd.Series(values).rolling(5)
+    np.testing.assert_allclose(result[:, 0], rolling.mean(), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(result[:, 1], rolling.std(), rtol=1e-7, equal_nan=True)
+
+
+def test_state_store_resumes_and_rebuilds(tmp_path):
+    closes = _closes(60)
+    dates = pd.bdate_range('2024-01-01', periods=60)
+    frame = pd.DataFrame({'股票代码': '000001', '交易日期': dates, '收盘价': closes})
+    path = str(tmp_path / 'state.json')
+
+    store = IndicatorStateStore(path)
+    store.refresh(StockPanel(frame.iloc[:50], presorted=True), dates[49])
+    store.save()
+    assert store.states['000001'].last_date == dates[48].strftime('%Y%m%d')
+
+    # 重新加载后只写入新完成的K线，当日K线只计算不写入
+    resumed = IndicatorStateStore(path)
+    latest = resumed.refresh(StockPanel(frame, presorted=True), dates[-1])
+    assert resumed.states['000001'].last_date == dates[-2].strftime('%Y%m%d')
+    expected = _batch_last_row(closes)
+    assert latest['MA20'].iloc[0] == pytest.approx(expected['MA20'])
+    assert latest['RSI'].iloc[0] == pytest.approx(expected['RSI'])
+
+    # 复权后历史收盘价变化，状态用面板历史重建
+    adjusted = frame.assign(收盘价=closes * 0.5)
+    latest = resumed.refresh(StockPanel(adjusted, presorted=True), dates[-1])
+    assert latest['MA20'].iloc[0] == pytest.approx(expected['MA20'] * 0.5)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from universe import bar_predicates, evaluate, filter_universe
+
+CONFIG = {'min_price': 5.0, 'max_price': 100.0, 'min_turnover': 1.0,
+          'min_market_cap': 1e9, 'max_pe': 100.0, 'min_volume': 1e7}
+
+
+def test_snapshot_and_bar_filters_share_turnover_meaning():
+    snapshot = pd.DataFrame({
+        '代码': ['1', '600000', '300750', '000002'],
+        '最新价': [10.0, 10.0, 10.0, np.nan],
+        '换手率': [0.5, 2.0, 3.0, 2.0],        # %
+        '成交额': [5e8, 5e8, 5e6, 5e8],        # 元
+        '总市值': [5e10, 5e10, 5e10, 5e10],
+        '市盈率-动态': [20.0, 20.0, 20.0, 20.0]
+    })
+    # 换手率不足或成交额不足的被排除，行情缺失的保留
+    assert filter_universe(snapshot, CONFIG) == ['600000', '000002']
+
+    bars = snapshot.rename(columns={'代码': '股票代码'})[['股票代码', '换手率', '成交额']]
+    bars.loc[3, '换手率'] = np.nan
+    assert bar_predicates(CONFIG) == [('换手率', '>=', 1.0), ('成交额', '>=', 1e7)]
+    mask = evaluate(bars, bar_predicates(CONFIG), keep_missing=False)
+    assert mask.tolist() == [False, True, False, False]
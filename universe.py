@@ -0,0 +1,81 @@
+"""选股条件下推
+
+把 STRATEGY_CONFIG 中的价格、换手率、市值、市盈率和成交额阈值转换为
+(列名, 运算符, 值) 形式的条件，在全市场行情快照上预先筛选股票池，
+日线的读取（parquet 按条件过滤）和下载计划只处理股票池内的股票。
+"""
+import operator
+import numpy as np
+import pandas as pd
+from config import STRATEGY_CONFIG
+
+# 配置项 -> (行情快照列名, 运算符)
+# min_turnover 为换手率（%），min_volume 的默认值 1e7 对应成交额（元），因此作用于成交额；
+# 基础策略在日线上按同样的含义逐行过滤（见 bar_predicates）
+STRATEGY_PREDICATES = {
+    'min_price': ('最新价', '>='),
+    'max_price': ('最新价', '<='),
+    'min_turnover': ('换手率', '>='),
+    'min_market_cap': ('总市值', '>='),
+    'max_pe': ('市盈率-动态', '<='),
+    'min_volume': ('成交额', '>=')
+}
+
+# 日线中也有的列，策略分析时逐行过滤
+BAR_PREDICATE_KEYS = ('min_turnover', 'min_volume')
+
+_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+
+def strategy_predicates(config=None):
+    """由策略配置生成条件列表 [(列名, 运算符, 值), ...]，未配置的阈值会被忽略"""
+    config = config or STRATEGY_CONFIG
+    return [(column, op, config[key]) for key, (column, op) in STRATEGY_PREDICATES.items()
+            if config.get(key) is not None]
+
+
+def bar_predicates(config=None):
+    """适用于日线每一行的条件（换手率、成交额），与行情快照上的预筛选含义相同"""
+    config = config or STRATEGY_CONFIG
+    return [STRATEGY_PREDICATES[key] + (config[key],) for key in BAR_PREDICATE_KEYS
+            if config.get(key) is not None]
+
+
+def evaluate(data, predicates, keep_missing=True):
+    """返回满足全部条件的行掩码
+
+    运算符支持 >=、<=、>、<、==、!=、in、not in。keep_missing 为 True 时，
+    缺少该列或值为空的行视为满足条件（无法确定不满足的股票不会被排除）
+    """
+    mask = np.ones(len(data), dtype=bool)
+    for column, op, value in predicates:
+        if column not in data.columns:
+            continue
+        if op in ('in', 'not in'):
+            matched = data[column].isin(list(value)).to_numpy()
+            mask &= matched if op == 'in' else ~matched
+            continue
+        values = data[column]
+        if isinstance(value, (int, float)):
+            values = pd.to_numeric(values, errors='coerce')
+        missing = values.isna().to_numpy()
+        matched = _OPERATORS[op](values, value).to_numpy(dtype=bool) & ~missing
+        if keep_missing:
+            matched |= missing
+        mask &= matched
+    return mask
+
+
+def filter_universe(snapshot, config=None):
+    """在行情快照（stock_zh_a_spot_em）上应用策略条件，返回满足条件的股票代码列表"""
+    predicates = strategy_predicates(config)
+    mask = evaluate(snapshot, predicates)
+    codes = snapshot['代码'].astype(str).str.zfill(6)[mask]
+    return codes.tolist()